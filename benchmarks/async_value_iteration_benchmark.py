@@ -0,0 +1,129 @@
+import sys
+sys.path.insert(0, '..')
+
+import argparse
+import time
+import numpy as np
+from rl_envs.gridworld import GridWorldEnv
+from rl_envs.compiled_model import compile_model
+from rl_utils import bellman
+from rl_utils.history import HistoryRecorder
+from env_construction_benchmark import scaled_windy_env
+
+
+def check_positive_int(value):
+    """ Check if the given string value represents α positive integer.
+        If so, return the integer value. Otherwise, raise an error with an informative message.
+
+    :param value: The command line input string.
+    :return: The integer the input string represents.
+    """
+    num = int(value)
+    if num <= 0:
+        raise argparse.ArgumentTypeError("%s is an invalid positive int value" % value)
+    return num
+
+
+def check_positive_float(value):
+    """ Check if the given string value represents α positive decimal number.
+        If so, return the float value. Otherwise, raise an error with an informative message.
+
+    :param value: The command line input string.
+    :return: The float the input string represents.
+    """
+    num = float(value)
+    if num <= 0.0:
+        raise argparse.ArgumentTypeError("%s is an invalid positive float value" % value)
+    return num
+
+
+def parse_args():
+    """ Create a help menu with informative messages.
+        Parse the arguments given in the command line and return the given or the default values.
+
+    :return: The sizes of the (square) GridWorld grids, the scale factors of the Windy grids, the discount factor
+             gamma and the sensitivity epsilon.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+
+    parser.add_argument("--sizes", type=check_positive_int, nargs='+', default=[25, 50],
+                        help="The height (and width) of the benchmarked GridWorld grids. (DEFAULT=25 50)")
+
+    parser.add_argument("--scales", type=check_positive_int, nargs='+', default=[1, 5],
+                        help="The Windy grids (with king moves) are scaled by these factors in both dimensions. "
+                             "(DEFAULT=1 5)")
+
+    parser.add_argument("--gamma", type=check_positive_float, default=1.0,
+                        help="The discount factor. (DEFAULT=1.0)")
+
+    parser.add_argument("--epsilon", type=check_positive_float, default=1e-6,
+                        help="The sensitivity factor of the sweeps and the smallest priority of prioritized "
+                             "sweeping. (DEFAULT=1e-6)")
+
+    parser.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
+                        help='Show this help message and exit.')
+
+    args = parser.parse_args()
+    return args.sizes, args.scales, args.gamma, args.epsilon
+
+
+def report(name, init, n_backups, elapsed, error):
+    """ Print the cost of a run.
+
+    :param name: The name of the algorithm
+    :param init: The name of the initial value function
+    :param n_backups: The number of (single state) backups
+    :param elapsed: The run time in seconds
+    :param error: The largest difference from the value function of synchronous value iteration
+    """
+    print(f"{name:>24} {init:>12} {n_backups:>12} {elapsed:>8.3f}s {error:>9.1e}")
+
+
+def compare(name, env, gamma, eps):
+    """ Count the backups that synchronous, Gauss-Seidel and prioritized sweeping value iteration need to converge on
+        the given environment, starting from zero and from a pessimistic value function.
+
+    :param name: The name of the environment
+    :param env: The tabular environment
+    :param gamma: The discount factor
+    :param eps: The sensitivity factor of the sweeps and the smallest priority of prioritized sweeping
+    """
+    model = compile_model(env)
+    # Every reward is negative, so nS times the smallest reward is a lower bound of the value of every state that
+    # reaches a terminal state along a shortest path.
+    pessimistic = np.where(model.terminal, 0.0, np.min(model.R[model.valid]) * model.nS)
+
+    print(f"\n{name} ({model.nS} states)")
+    print(f"{'algorithm':>24} {'init':>12} {'backups':>12} {'time':>9} {'max err':>9}")
+    for init, V0 in [('zero', None), ('pessimistic', pessimistic)]:
+        start = time.perf_counter()
+        V_history, _ = bellman.value_iteration(model, gamma, eps, V0, HistoryRecorder('off'))
+        V_opt = V_history[-1]
+        report('synchronous', init, (V_history.count - 1) * model.nS, time.perf_counter() - start, 0.0)
+
+        for ordering in ['index', 'reverse', 'distance']:
+            start = time.perf_counter()
+            V, n_backups = bellman.gauss_seidel_value_iteration(model, gamma, eps, ordering, V0)
+            report(f'Gauss-Seidel ({ordering})', init, n_backups, time.perf_counter() - start,
+                   np.max(np.abs(V - V_opt)))
+
+        start = time.perf_counter()
+        V, n_backups = bellman.prioritized_sweeping_value_iteration(model, gamma, eps, V0)
+        report('prioritized sweeping', init, n_backups, time.perf_counter() - start, np.max(np.abs(V - V_opt)))
+
+
+def main():
+    """ Compare the backups-to-convergence of synchronous value iteration with the ones of in-place Gauss-Seidel sweeps
+        and of prioritized sweeping, on growing GridWorld and Windy GridWorld environments.
+    """
+    sizes, scales, gamma, eps = parse_args()
+
+    for size in sizes:
+        compare(f'GridWorld {size}x{size}', GridWorldEnv(size, size), gamma, eps)
+
+    for scale in scales:
+        compare(f'Windy (king) {scale}x', scaled_windy_env(scale)('king_moves'), gamma, eps)
+
+
+if __name__ == '__main__':
+    main()
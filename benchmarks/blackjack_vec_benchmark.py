@@ -0,0 +1,101 @@
+import sys
+sys.path.insert(0, '..')
+
+import argparse
+import time
+import numpy as np
+from rl_envs.blackjack import BlackjackEnv
+from rl_envs.blackjack_vec import BlackjackVecEnv
+
+
+def check_positive_int(value):
+    """ Check if the given string value represents α positive integer.
+        If so, return the integer value. Otherwise, raise an error with an informative message.
+
+    :param value: The command line input string.
+    :return: The integer the input string represents.
+    """
+    num = int(value)
+    if num <= 0:
+        raise argparse.ArgumentTypeError("%s is an invalid positive int value" % value)
+    return num
+
+
+def parse_args():
+    """ Create a help menu with informative messages.
+        Parse the arguments given in the command line and return the given or the default values.
+
+    :return: The number of hands to play, the numbers of parallel hands of the vector environment and the threshold of
+             the player's strategy.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+
+    parser.add_argument("--n_hands", type=check_positive_int, default=200000,
+                        help="The number of hands to play with each environment. (DEFAULT=200000)")
+
+    parser.add_argument("--n_envs", type=check_positive_int, nargs='+', default=[100, 1000, 10000],
+                        help="The numbers of hands that the vector environment plays in parallel. "
+                             "(DEFAULT=100 1000 10000)")
+
+    parser.add_argument("--threshold", type=check_positive_int, default=20,
+                        help="The player hits if the sum is < threshold, otherwise he sticks. (DEFAULT=20)")
+
+    parser.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
+                        help='Show this help message and exit.')
+
+    args = parser.parse_args()
+    return args.n_hands, args.n_envs, args.threshold
+
+
+def play_scalar(n_hands, threshold):
+    """ Play hands one at a time with BlackjackEnv.
+
+    :param n_hands: The number of hands to play
+    :param threshold: The player hits if the sum is < threshold, otherwise he sticks
+    """
+    env = BlackjackEnv()
+    for _ in range(n_hands):
+        player_sum, _, _ = env.reset()
+        done = False
+        while not done:
+            (player_sum, _, _), _, done, _ = env.step(int(player_sum < threshold))
+
+
+def play_vector(n_hands, n_envs, threshold):
+    """ Play hands in lockstep with BlackjackVecEnv, until at least the given number of hands have finished.
+
+    :param n_hands: The number of hands to play
+    :param n_envs: The number of parallel hands
+    :param threshold: The player hits if the sum is < threshold, otherwise he sticks
+    :return: The number of finished hands
+    """
+    env = BlackjackVecEnv(n_envs)
+    player_sum, _, _ = env.reset()
+    finished = 0
+    while finished < n_hands:
+        (player_sum, _, _), _, dones, _ = env.step((player_sum < threshold).astype(np.int64))
+        finished += np.count_nonzero(dones)
+    return finished
+
+
+def main():
+    """ Compare the hands per second of BlackjackEnv with the ones of BlackjackVecEnv, for the threshold strategy of the
+        Monte Carlo prediction script.
+    """
+    n_hands, n_envs_list, threshold = parse_args()
+
+    print(f"{'environment':>24} {'hands/s':>12} {'speedup':>8}")
+    start = time.perf_counter()
+    play_scalar(n_hands, threshold)
+    scalar_rate = n_hands / (time.perf_counter() - start)
+    print(f"{'BlackjackEnv':>24} {scalar_rate:>12.0f} {1.0:>7.1f}x")
+
+    for n_envs in n_envs_list:
+        start = time.perf_counter()
+        finished = play_vector(n_hands, n_envs, threshold)
+        rate = finished / (time.perf_counter() - start)
+        print(f"{f'BlackjackVecEnv({n_envs})':>24} {rate:>12.0f} {rate / scalar_rate:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+import sys
+sys.path.insert(0, '..')
+
+import argparse
+import time
+import numpy as np
+from rl_envs.gridworld import GridWorldEnv
+from rl_envs.compiled_model import compile_model
+from rl_utils import bellman
+
+
+def check_positive_int(value):
+    """ Check if the given string value represents α positive integer.
+        If so, return the integer value. Otherwise, raise an error with an informative message.
+
+    :param value: The command line input string.
+    :return: The integer the input string represents.
+    """
+    num = int(value)
+    if num <= 0:
+        raise argparse.ArgumentTypeError("%s is an invalid positive int value" % value)
+    return num
+
+
+def parse_args():
+    """ Create a help menu with informative messages.
+        Parse the arguments given in the command line and return the given or the default values.
+
+    :return: The sizes of the (square) grids to benchmark and the number of timed sweeps per size.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+
+    parser.add_argument("--sizes", type=check_positive_int, nargs='+', default=[10, 25, 50, 100, 200],
+                        help="The height (and width) of the benchmarked grids. (DEFAULT=10 25 50 100 200)")
+
+    parser.add_argument("--repeats", type=check_positive_int, default=3,
+                        help="The number of timed sweeps per grid size. The fastest one is reported. (DEFAULT=3)")
+
+    parser.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
+                        help='Show this help message and exit.')
+
+    args = parser.parse_args()
+    return args.sizes, args.repeats
+
+
+def loop_greedy_sweep(env, V, gamma):
+    """ One sweep of value iteration with the interpreted loops over states, actions and outcomes.
+
+    :param env: The GridWorld environment
+    :param V: The state value function
+    :param gamma: The discount factor
+    :return: The backed-up state value function
+    """
+    Q = np.zeros((env.nS, env.nA))
+    for state in range(env.nS):
+        for action in range(env.nA):
+            for probability, nextstate, reward, _ in env.P[state][action]:
+                Q[state, action] += probability * (reward + gamma * V[nextstate])
+    return np.max(Q, axis=1)
+
+
+def loop_policy_sweep(env, V, policy, gamma):
+    """ One sweep of iterative policy evaluation with the interpreted loops over states, actions and outcomes.
+
+    :param env: The GridWorld environment
+    :param V: The state value function
+    :param policy: A 2-level dictionary with (state, action) as key and a probability as the value
+    :param gamma: The discount factor
+    :return: The backed-up state value function
+    """
+    V_upd = np.zeros_like(V)
+    for state in range(env.nS):
+        for action in policy[state].keys():
+            for (probability, nextstate, reward, _) in env.P[state][action]:
+                V_upd[state] += policy[state][action] * probability * (reward + gamma * V[nextstate])
+    return V_upd
+
+
+def best_time(fn, repeats):
+    """ Time the given function a few times.
+
+    :param fn: The function to time
+    :param repeats: The number of runs
+    :return: The fastest run time in seconds
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    """ Time one value iteration sweep and one policy evaluation sweep on growing GridWorld environments, with the
+        interpreted loops over env.P, with the vectorized Bellman backups over the compiled model and, for value
+        iteration, with the matrix-free moves of the grid.
+    """
+    sizes, repeats = parse_args()
+    gamma = 1.0
+
+    print(f"{'grid':>10} {'states':>8} {'compile':>9} {'VI loop':>9} {'VI vec':>9} {'VI grid':>9} {'speedup':>8} "
+          f"{'PE loop':>9} {'PE vec':>9} {'speedup':>8}")
+    for size in sizes:
+        env = GridWorldEnv(size, size)
+        V = np.random.rand(env.nS)
+        policy = {state: {action: 1.0 / env.nA for action in range(env.nA)} for state in range(env.nS)}
+
+        for state in env.P:     # P is built lazily, so it is built before the loops are timed.
+            env.P[state]
+
+        start = time.perf_counter()
+        model = compile_model(env)
+        compile_time = time.perf_counter() - start
+        pi = bellman.policy_matrix(model, policy)
+
+        vi_loop = best_time(lambda: loop_greedy_sweep(env, V, gamma), repeats)
+        vi_vec = best_time(lambda: bellman.greedy_backup(model, V, gamma), repeats)
+        vi_grid = best_time(lambda: env.greedy_backup(V, gamma), repeats)
+        pe_loop = best_time(lambda: loop_policy_sweep(env, V, policy, gamma), repeats)
+        pe_vec = best_time(lambda: bellman.policy_backup(model, V, pi, gamma), repeats)
+
+        print(f"{f'{size}x{size}':>10} {env.nS:>8} {compile_time:>8.4f}s {vi_loop:>8.4f}s {vi_vec:>8.4f}s "
+              f"{vi_grid:>8.4f}s {vi_loop / vi_grid:>7.1f}x {pe_loop:>8.4f}s {pe_vec:>8.4f}s {pe_loop / pe_vec:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
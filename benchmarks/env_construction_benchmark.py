@@ -0,0 +1,189 @@
+import sys
+sys.path.insert(0, '..')
+
+import argparse
+import time
+import tracemalloc
+import numpy as np
+from rl_envs.windy_gridworld import WindyGridWorldEnv
+from rl_envs.cliff_gridworld import CliffGridWorldEnv
+from rl_envs.gambler import GamblerEnv
+
+
+def check_positive_int(value):
+    """ Check if the given string value represents α positive integer.
+        If so, return the integer value. Otherwise, raise an error with an informative message.
+
+    :param value: The command line input string.
+    :return: The integer the input string represents.
+    """
+    num = int(value)
+    if num <= 0:
+        raise argparse.ArgumentTypeError("%s is an invalid positive int value" % value)
+    return num
+
+
+def parse_args():
+    """ Create a help menu with informative messages.
+        Parse the arguments given in the command line and return the given or the default values.
+
+    :return: The scale factors of the benchmarked grids.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+
+    parser.add_argument("--scales", type=check_positive_int, nargs='+', default=[1, 5, 10, 20, 40],
+                        help="The Windy and Cliff grids are scaled by these factors in both dimensions. "
+                             "(DEFAULT=1 5 10 20 40)")
+
+    parser.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
+                        help='Show this help message and exit.')
+
+    args = parser.parse_args()
+    return args.scales
+
+
+def scaled_windy_env(scale):
+    """ Create a Windy GridWorld class whose grid and target position are scaled by the given factor. Each wind column
+        is repeated, so that the strength of the winds stays the same and the target is reachable from every cell.
+
+    :param scale: The scale factor
+    :return: The scaled Windy GridWorld class
+    """
+    return type(f'WindyGridWorldEnv{scale}x', (WindyGridWorldEnv,), {
+        'HEIGHT': WindyGridWorldEnv.HEIGHT * scale,
+        'WIDTH': WindyGridWorldEnv.WIDTH * scale,
+        'START_POSITION': (WindyGridWorldEnv.START_POSITION[0] * scale, 0),
+        'TARGET_POSITION': (WindyGridWorldEnv.TARGET_POSITION[0] * scale, WindyGridWorldEnv.TARGET_POSITION[1] * scale),
+        'WINDS': list(np.repeat(WindyGridWorldEnv.WINDS, scale))})
+
+
+def scaled_cliff_env(scale):
+    """ Create a Cliff GridWorld class whose grid is scaled by the given factor. The cliff covers the bottom row.
+
+    :param scale: The scale factor
+    :return: The scaled Cliff GridWorld class
+    """
+    height, width = CliffGridWorldEnv.HEIGHT * scale, CliffGridWorldEnv.WIDTH * scale
+    return type(f'CliffGridWorldEnv{scale}x', (CliffGridWorldEnv,), {
+        'HEIGHT': height,
+        'WIDTH': width,
+        'START_POSITION': (height - 1, 0),
+        'CLIFF_POSITIONS': [(height - 1, w) for w in range(1, width - 1)],
+        'TARGET_POSITION': (height - 1, width - 1)})
+
+
+def legacy_windy_P(env):
+    """ Build the transition probability matrix of a Windy GridWorld as nested dictionaries of lists of tuples.
+
+    :param env: The Windy GridWorld environment
+    :return: The transition probability matrix P[s][a] == [(probability, nextstate, reward, done), ...]
+    """
+    P = {(h, w): dict() for h in range(env.HEIGHT) for w in range(env.WIDTH)}
+    for state in P.keys():
+        if env._is_done(state):
+            for action in range(env.action_space.n):
+                P[state][action] = [(1.0, state, 0.0, True)]
+        else:
+            y, x = state
+            for action in range(env.action_space.n):
+                dy, dx = env.MOVE_DELTAS[action]
+                next_state = env._limit_position(y + dy - env.WINDS[x], x + dx)
+                P[state][action] = [(1.0, next_state, -1.0, env._is_done(next_state))]
+    return P
+
+
+def legacy_cliff_P(env):
+    """ Build the transition probability matrix of a Cliff GridWorld as nested dictionaries of lists of tuples.
+
+    :param env: The Cliff GridWorld environment
+    :return: The transition probability matrix P[s][a] == [(probability, nextstate, reward, done), ...]
+    """
+    P = {(h, w): dict() for h in range(env.HEIGHT) for w in range(env.WIDTH)}
+    for state in P.keys():
+        if env._is_done(state):
+            for action in range(env.action_space.n):
+                P[state][action] = [(1.0, state, 0.0, True)]
+        elif env._is_cliff(state):
+            for action in range(env.action_space.n):
+                P[state][action] = [(1.0, env.START_POSITION, -100.0, False)]
+        else:
+            y, x = state
+            for action in range(env.action_space.n):
+                dy, dx = env.MOVE_DELTAS[action]
+                next_state = env._limit_position(y + dy, x + dx)
+                P[state][action] = [(1.0, next_state, -1.0, env._is_done(next_state))]
+    return P
+
+
+def legacy_gambler_P(env):
+    """ Build the transition probability matrix of the Gambler's problem as nested dictionaries of lists of tuples.
+
+    :param env: The Gambler environment
+    :return: The transition probability matrix P[s][a] == [(probability, nextstate, reward, done), ...]
+    """
+    goal = env.nS - 1
+    P = {state: {action: [] for action in range(env.nA)} for state in range(env.nS)}
+    for state in range(1, goal):
+        P[state][0].append((1.0, state, 0.0, False))
+        for action in range(1, min(state, goal - state) + 1):
+            P[state][action].append((env.ph, state + action, float(state + action == goal), state + action == goal))
+            P[state][action].append((1 - env.ph, state - action, 0.0, state - action == 0))
+    P[0][0].append((1.0, 0, 0.0, True))
+    P[goal][0].append((1.0, goal, 0.0, True))
+    return P
+
+
+def measure(fn):
+    """ Measure the run time and the memory of the object that the given function creates.
+
+    :param fn: The function to measure
+    :return: The result of the function, the run time in seconds and the retained and the peak memory in MB
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, current / 2**20, peak / 2**20
+
+
+def report(name, n_states, legacy_fn, array_fn):
+    """ Print the construction time and the memory of the legacy and of the array-backed transitions.
+
+    :param name: The name of the environment
+    :param n_states: The number of states of the environment
+    :param legacy_fn: A function that builds the legacy transition probability matrix
+    :param array_fn: A function that builds the array-backed environment
+    """
+    _, legacy_time, legacy_mem, legacy_peak = measure(legacy_fn)
+    _, array_time, array_mem, array_peak = measure(array_fn)
+    print(f"{name:>28} {n_states:>8} {legacy_time:>8.3f}s {legacy_mem:>7.1f}MB {legacy_peak:>7.1f}MB "
+          f"{array_time:>8.3f}s {array_mem:>7.1f}MB {array_peak:>7.1f}MB")
+
+
+def main():
+    """ Compare the construction time and the memory of the environments' transitions, when P is built as nested
+        dictionaries of tuples and when it is a view of compact transition arrays.
+    """
+    scales = parse_args()
+
+    print(f"{'environment':>28} {'states':>8} {'P time':>9} {'P mem':>9} {'P peak':>9} "
+          f"{'arr time':>9} {'arr mem':>9} {'arr peak':>9}")
+    for scale in scales:
+        env_class = scaled_windy_env(scale)
+        env = env_class('king_extra_moves')
+        report(f'Windy (king extra) {scale}x', len(env.P), lambda: legacy_windy_P(env),
+               lambda: env_class('king_extra_moves'))
+
+    for scale in scales:
+        env_class = scaled_cliff_env(scale)
+        env = env_class()
+        report(f'Cliff {scale}x', len(env.P), lambda: legacy_cliff_P(env), env_class)
+
+    env = GamblerEnv(0.4)
+    report('Gambler', env.nS, lambda: legacy_gambler_P(env), lambda: GamblerEnv(0.4).transition_arrays())
+
+
+if __name__ == '__main__':
+    main()
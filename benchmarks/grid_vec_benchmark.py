@@ -0,0 +1,119 @@
+import sys
+sys.path.insert(0, '..')
+
+import argparse
+import time
+import numpy as np
+from rl_envs.windy_gridworld import WindyGridWorldEnv
+from rl_envs.cliff_gridworld import CliffGridWorldEnv
+from rl_envs.grid_vec import GridWorldVecEnv
+
+
+def check_positive_int(value):
+    """ Check if the given string value represents α positive integer.
+        If so, return the integer value. Otherwise, raise an error with an informative message.
+
+    :param value: The command line input string.
+    :return: The integer the input string represents.
+    """
+    num = int(value)
+    if num <= 0:
+        raise argparse.ArgumentTypeError("%s is an invalid positive int value" % value)
+    return num
+
+
+def parse_args():
+    """ Create a help menu with informative messages.
+        Parse the arguments given in the command line and return the given or the default values.
+
+    :return: The number of steps to take and the numbers of parallel agents of the vector environment.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+
+    parser.add_argument("--n_steps", type=check_positive_int, default=500000,
+                        help="The number of steps to take with each environment. (DEFAULT=500000)")
+
+    parser.add_argument("--n_envs", type=check_positive_int, nargs='+', default=[100, 1000, 10000],
+                        help="The numbers of agents that the vector environment steps in parallel. "
+                             "(DEFAULT=100 1000 10000)")
+
+    parser.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
+                        help='Show this help message and exit.')
+
+    args = parser.parse_args()
+    return args.n_steps, args.n_envs
+
+
+def play_scalar(env, actions):
+    """ Take the given actions one at a time with an environment in training mode.
+
+    :param env: The environment in training mode
+    :param actions: The list of actions
+    :return: The states, the rewards and the done flags of the steps
+    """
+    states, rewards, dones = [], [], []
+    env.reset()
+    for action in actions:
+        s, r, done, _ = env.step(action)
+        if done:
+            s = env.reset()
+        states.append(s)
+        rewards.append(r)
+        dones.append(done)
+    return states, rewards, dones
+
+
+def play_vector(env, n_envs, n_steps):
+    """ Take uniformly random actions with the agents of a vector environment, until at least the given number of
+        steps have been taken.
+
+    :param env: The grid world environment of the agents
+    :param n_envs: The number of parallel agents
+    :param n_steps: The number of steps to take
+    :return: The number of steps taken
+    """
+    vec_env = GridWorldVecEnv(env, n_envs)
+    vec_env.reset()
+    for _ in range(-(-n_steps // n_envs)):
+        vec_env.step(np.random.randint(vec_env.nA, size=n_envs))
+    return -(-n_steps // n_envs) * n_envs
+
+
+def check_vector(env, actions):
+    """ :return: Whether a vector environment with a single agent takes the same steps as the environment. """
+    vec_env = GridWorldVecEnv(env, 1)
+    vec_env.reset()
+    steps = [vec_env.step(np.array([action])) for action in actions]
+    return [s.item() for s, _, _, _ in steps] == play_scalar(env, actions)[0]
+
+
+def main():
+    """ Compare the steps per second of the Windy and Cliff grid worlds in training mode with the ones of
+        GridWorldVecEnv, for agents that select their actions uniformly at random.
+    """
+    n_steps, n_envs_list = parse_args()
+
+    envs = {'Windy (normal)': WindyGridWorldEnv('normal_moves', training=True),
+            'Windy (king)': WindyGridWorldEnv('king_moves', training=True),
+            'Windy (king extra)': WindyGridWorldEnv('king_extra_moves', training=True),
+            'Cliff': CliffGridWorldEnv(training=True)}
+
+    print(f"{'environment':>20} {'agents':>7} {'steps/s':>12} {'speedup':>8}")
+    for name, env in envs.items():
+        actions = np.random.randint(env.action_space.n, size=n_steps).tolist()
+        assert check_vector(env, actions[:10000]), f"The vector environment of {name} takes different steps"
+
+        start = time.perf_counter()
+        play_scalar(env, actions)
+        scalar_rate = n_steps / (time.perf_counter() - start)
+        print(f"{name:>20} {1:>7} {scalar_rate:>12.0f} {1.0:>7.1f}x")
+
+        for n_envs in n_envs_list:
+            start = time.perf_counter()
+            steps = play_vector(env, n_envs, n_steps)
+            rate = steps / (time.perf_counter() - start)
+            print(f"{name:>20} {n_envs:>7} {rate:>12.0f} {rate / scalar_rate:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+import sys
+sys.path.insert(0, '..')
+sys.path.insert(0, '../windy_gridworld_sarsa')
+sys.path.insert(0, '../cliff_gridworld_qlearning')
+
+import argparse
+import time
+import numpy as np
+import matplotlib.pyplot as plt
+from rl_envs.windy_gridworld import WindyGridWorldEnv
+from rl_envs.cliff_gridworld import CliffGridWorldEnv
+from rl_utils.lockstep_td import lockstep_sarsa, lockstep_qlearning, learning_curves
+from windy_gridworld_sarsa import sarsa
+from cliff_gridworld_qlearning import qlearning
+
+
+def check_positive_int(value):
+    """ Check if the given string value represents α positive integer.
+        If so, return the integer value. Otherwise, raise an error with an informative message.
+
+    :param value: The command line input string.
+    :return: The integer the input string represents.
+    """
+    num = int(value)
+    if num <= 0:
+        raise argparse.ArgumentTypeError("%s is an invalid positive int value" % value)
+    return num
+
+
+def parse_args():
+    """ Create a help menu with informative messages.
+        Parse the arguments given in the command line and return the given or the default values.
+
+    :return: The number of runs, the number of episodes of each run, the number of timed serial runs, the moves of the
+             Windy GridWorld agent and a plot boolean.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+
+    parser.add_argument("--n_runs", type=check_positive_int, default=100,
+                        help="The number of independent runs that are trained in lockstep. (DEFAULT=100)")
+
+    parser.add_argument("--n_episodes", type=check_positive_int, default=200,
+                        help="The number of episodes of each run. (DEFAULT=200)")
+
+    parser.add_argument("--n_serial", type=check_positive_int, default=10,
+                        help="The number of runs of sarsa() and qlearning() one after the other, whose time is "
+                             "extrapolated to n_runs and whose mean curves are compared with the lockstep ones. "
+                             "(DEFAULT=10)")
+
+    parser.add_argument("--moves", choices=['normal_moves', 'king_moves', 'king_extra_moves'], default='normal_moves',
+                        help="The moves of the Windy GridWorld agent. (DEFAULT=normal_moves)")
+
+    parser.add_argument("--plot", action='store_true',
+                        help="Plot and save (as lockstep_td_curves.jpg) the mean episode length and reward over the "
+                             "episodes with their 95%% confidence bands. (DEFAULT=False)")
+
+    parser.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
+                        help='Show this help message and exit.')
+
+    args = parser.parse_args()
+    return args.n_runs, args.n_episodes, args.n_serial, args.moves, args.plot
+
+
+def benchmark(name, run_serial, run_lockstep, n_runs, n_serial):
+    """ Time the serial and the lockstep runs of an algorithm and compare their mean curves.
+
+    :param name: The name of the environment and the algorithm
+    :param run_serial: A function that performs a single run and returns its info dictionary
+    :param run_lockstep: A function of the number of runs that performs them in lockstep and returns their info
+    :param n_runs: The number of lockstep runs
+    :param n_serial: The number of serial runs
+    :return: The info of the lockstep runs
+    """
+    start = time.perf_counter()
+    serial_infos = [run_serial() for _ in range(n_serial)]
+    serial_time = (time.perf_counter() - start) / n_serial * n_runs
+
+    start = time.perf_counter()
+    info = run_lockstep(n_runs)
+    lockstep_time = time.perf_counter() - start
+
+    print(f"{name:>30} {serial_time:>9.2f}s {lockstep_time:>9.2f}s {serial_time / lockstep_time:>7.1f}x", end='')
+    for key in ('timesteps', 'rewards'):
+        # The fraction of the episodes whose serial and lockstep 99% confidence intervals of the mean overlap.
+        curves = learning_curves(info[key], confidence=0.99)
+        serial_curves = learning_curves([serial_info[key] for serial_info in serial_infos], confidence=0.99)
+        overlap = (serial_curves['lower'] <= curves['upper']) & (curves['lower'] <= serial_curves['upper'])
+        print(f" {np.mean(info[key][:, -10:]):>11.2f} {np.mean(overlap):>7.2f}", end='')
+    print()
+    return info
+
+
+def plot_curves(infos):
+    """ Plot the mean episode length and reward of the lockstep runs with their 95% confidence bands.
+
+    :param infos: A dictionary with the info of the lockstep runs of each environment
+    """
+    fig, axes = plt.subplots(2, len(infos), figsize=(10 * len(infos), 14), tight_layout=True, squeeze=False)
+    for column, (name, info) in enumerate(infos.items()):
+        for row, (key, label) in enumerate((('timesteps', 'Episode Length'), ('rewards', 'Episode Reward'))):
+            curves = learning_curves(info[key])
+            episodes = np.arange(1, len(curves['mean']) + 1)
+            axes[row, column].plot(episodes, curves['mean'])
+            axes[row, column].fill_between(episodes, curves['lower'], curves['upper'], alpha=0.3)
+            axes[row, column].set_title(f'{name}: Mean {label} over {info[key].shape[0]} Runs', fontsize=16)
+            axes[row, column].set_xlabel('Episode', fontsize=14)
+            axes[row, column].set_ylabel(label, fontsize=14)
+    fig.savefig('lockstep_td_curves.jpg')
+
+
+def main():
+    """ Train many independent runs of the SARSA agent of the Windy GridWorld and of the Q-Learning agent of the Cliff
+        GridWorld in lockstep, compare the time with the one of the same number of serial runs and check that the mean
+        curves of the serial runs agree with the lockstep ones.
+    """
+    n_runs, n_episodes, n_serial, moves, plot = parse_args()
+    windy_env = WindyGridWorldEnv(moves, training=True)
+    cliff_env = CliffGridWorldEnv(training=True)
+
+    print(f"{'':>30} {'serial':>10} {'lockstep':>10} {'speedup':>8} {'last length':>11} {'overlap':>7} "
+          f"{'last reward':>11} {'overlap':>7}")
+    infos = {f'Windy ({moves})': benchmark(f'SARSA Windy ({moves})',
+                                           lambda: sarsa(windy_env, n_episodes, 1.0)[3],
+                                           lambda k: lockstep_sarsa(windy_env, k, n_episodes, 1.0, seed=0)[1],
+                                           n_runs, n_serial),
+             'Cliff': benchmark('Q-Learning Cliff',
+                                lambda: qlearning(cliff_env, n_episodes, 1.0, 0.1)[3],
+                                lambda k: lockstep_qlearning(cliff_env, k, n_episodes, 1.0, 0.1, seed=0)[1],
+                                n_runs, n_serial)}
+
+    if plot:
+        plot_curves(infos)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+import sys
+sys.path.insert(0, '..')
+sys.path.insert(0, '../blackjack_backward_induction')
+
+import argparse
+import tempfile
+import time
+import numpy as np
+from rl_envs.blackjack import BlackjackEnv
+from rl_utils.tabular import BLACKJACK_ENCODER
+from rl_utils.episode_log import open_or_record_episodes
+from rl_utils.off_policy_evaluation import METHODS, greedy_probabilities, evaluate_policies
+from blackjack_backward_induction import backward_induction
+
+
+def check_positive_int(value):
+    """ Check if the given string value represents α positive integer.
+        If so, return the integer value. Otherwise, raise an error with an informative message.
+
+    :param value: The command line input string.
+    :return: The integer the input string represents.
+    """
+    num = int(value)
+    if num <= 0:
+        raise argparse.ArgumentTypeError("%s is an invalid positive int value" % value)
+    return num
+
+
+def parse_args():
+    """ Create a help menu with informative messages.
+        Parse the arguments given in the command line and return the given or the default values.
+
+    :return: The number of logged episodes, the episode log directory and the number of episodes per batch.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+
+    parser.add_argument("--n_episodes", type=check_positive_int, default=500000,
+                        help="The number of logged episodes of the uniformly random behavior policy. (DEFAULT=500000)")
+
+    parser.add_argument("--log", default=None,
+                        help="The directory of the episode log, which is recorded if it does not exist, so that the "
+                             "following runs reuse it. (DEFAULT=None, a temporary log)")
+
+    parser.add_argument("--batch_size", type=check_positive_int, default=20000,
+                        help="The number of episodes that are scored at once. (DEFAULT=20000)")
+
+    parser.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
+                        help='Show this help message and exit.')
+
+    args = parser.parse_args()
+    return args.n_episodes, args.log, args.batch_size
+
+
+def threshold_policies():
+    """ :return: The names and the (nS,) encoded actions of the policies that stick with a sum of at least a hard
+                 threshold without a usable ace and at least a soft threshold with a usable ace.
+    """
+    states = BLACKJACK_ENCODER.states()
+    names, actions = [], []
+    for hard in range(12, 22):
+        for soft in range(12, 22):
+            names.append(f'stick >= {hard}/{soft}')
+            actions.append([int(player_sum < (soft if usable_ace else hard)) for player_sum, _, usable_ace in states])
+    return names, np.array(actions)
+
+
+def benchmark(n_episodes, log_dir, batch_size):
+    """ Run the benchmark on an episode log.
+
+    :param n_episodes: The number of logged episodes
+    :param log_dir: The directory of the episode log
+    :param batch_size: The number of episodes that are scored at once
+    """
+    env = BlackjackEnv()
+    states = BLACKJACK_ENCODER.states()
+
+    start = time.perf_counter()
+    log = open_or_record_episodes(env, BLACKJACK_ENCODER, lambda obs: (np.random.randint(2), 0.5), n_episodes, log_dir,
+                                  exploring_starts=True,
+                                  metadata={'env': 'Blackjack', 'behavior': 'uniform', 'exploring_starts': True})
+    print(f"log of {log.n_episodes} episodes ({log.n_steps} steps) ready in {time.perf_counter() - start:.2f}s")
+
+    names, actions = threshold_policies()
+    optimal_policy, _, _ = backward_induction(env, 1.0)
+    names.append('optimal')
+    actions = np.vstack((actions, [optimal_policy[state] for state in states]))
+
+    # The exploring starts are uniform over the 200 states, so the value of a policy is the mean value of the states.
+    true_values = np.array([np.mean(list(backward_induction(env, 1.0, dict(zip(states, policy)))[1].values()))
+                            for policy in actions])
+
+    start = time.perf_counter()
+    estimates = evaluate_policies(log.batches(batch_size, n_episodes), greedy_probabilities(actions, 2), 1.0)
+    elapsed = time.perf_counter() - start
+    print(f"{len(names)} policies scored on {estimates['n_episodes']} episodes in {elapsed:.2f}s\n")
+
+    print(f"{'policy':>16} {'true':>8} {'ordinary':>16} {'weighted':>9} {'per-decision':>16}")
+    best = list(np.argsort(-true_values)[:10])
+    for k in best + ([len(names) - 1] if len(names) - 1 not in best else []):
+        print(f"{names[k]:>16} {true_values[k]:>8.4f} "
+              f"{estimates['ordinary'][k]:>8.4f} ±{estimates['ordinary_se'][k]:.4f} {estimates['weighted'][k]:>9.4f} "
+              f"{estimates['per_decision'][k]:>8.4f} ±{estimates['per_decision_se'][k]:.4f}")
+
+    print(f"\n{'method':>16} {'mean |error|':>13} {'max |error|':>12} {'rank corr.':>11}")
+    true_ranks = np.argsort(np.argsort(true_values))
+    for method in METHODS:
+        errors = np.abs(estimates[method] - true_values)
+        rank_corr = np.corrcoef(true_ranks, np.argsort(np.argsort(estimates[method])))[0, 1]
+        print(f"{method:>16} {np.mean(errors):>13.4f} {np.max(errors):>12.4f} {rank_corr:>11.3f}")
+
+
+def main():
+    """ Score 100 threshold policies and the optimal policy of Blackjack on one log of uniformly random episodes with
+        exploring starts, with ordinary, weighted and per-decision importance sampling, and compare the estimates with
+        the exact values of the policies from backward induction.
+    """
+    n_episodes, log_dir, batch_size = parse_args()
+    if log_dir is None:
+        with tempfile.TemporaryDirectory() as log_dir:
+            benchmark(n_episodes, log_dir, batch_size)
+    else:
+        benchmark(n_episodes, log_dir, batch_size)
+
+
+if __name__ == '__main__':
+    main()
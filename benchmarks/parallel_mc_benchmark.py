@@ -0,0 +1,140 @@
+import sys
+sys.path.insert(0, '..')
+sys.path.insert(0, '../blackjack_mc_control_exploring_starts')
+sys.path.insert(0, '../easy21_on_policy_mc_control')
+sys.path.insert(0, '../blackjack_backward_induction')
+
+import os
+import argparse
+import contextlib
+import io
+import time
+import numpy as np
+from rl_envs.blackjack import BlackjackEnv
+from rl_envs.easy21 import Easy21Env
+from blackjack_mcces import monte_carlo_es_control, parallel_monte_carlo_es_control
+from easy21_on_policy_mc_control import on_policy_monte_carlo_control, parallel_on_policy_monte_carlo_control
+from blackjack_backward_induction import backward_induction
+
+
+def check_positive_int(value):
+    """ Check if the given string value represents α positive integer.
+        If so, return the integer value. Otherwise, raise an error with an informative message.
+
+    :param value: The command line input string.
+    :return: The integer the input string represents.
+    """
+    num = int(value)
+    if num <= 0:
+        raise argparse.ArgumentTypeError("%s is an invalid positive int value" % value)
+    return num
+
+
+def parse_args():
+    """ Create a help menu with informative messages.
+        Parse the arguments given in the command line and return the given or the default values.
+
+    :return: The number of episodes of each run, the numbers of worker processes and the number of episodes per worker
+             between two merges.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+
+    parser.add_argument("--n_episodes", type=check_positive_int, default=200000,
+                        help="The number of episodes of each run. (DEFAULT=200000)")
+
+    parser.add_argument("--n_workers", type=check_positive_int, nargs='+', default=[2, 4],
+                        help="The numbers of worker processes of the parallel runs. (DEFAULT=2 4)")
+
+    parser.add_argument("--sync_every", type=check_positive_int, default=10000,
+                        help="The number of episodes that each worker samples between two merges. (DEFAULT=10000)")
+
+    parser.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
+                        help='Show this help message and exit.')
+
+    args = parser.parse_args()
+    return args.n_episodes, args.n_workers, args.sync_every
+
+
+def serial_run(game, n_episodes, seed):
+    """ Run the serial algorithm of a game with seeded random number generators.
+
+    :param game: 'blackjack' (MC control with exploring starts) or 'easy21' (on-policy MC control)
+    :param n_episodes: The number of episodes to sample
+    :param seed: The seed of the run
+    :return: The policy and the state value function dictionaries
+    """
+    np.random.seed(seed)
+    if game == 'blackjack':
+        env = BlackjackEnv(seed=seed)
+        for space in (env.action_space, env.observation_space):
+            if hasattr(space, 'seed'):
+                space.seed(seed)
+        policy, v, _ = monte_carlo_es_control(env, n_episodes, 1.0)
+    else:
+        with contextlib.redirect_stdout(io.StringIO()):     # The algorithm prints its visit counts.
+            policy, v, _ = on_policy_monte_carlo_control(Easy21Env(seed=seed), n_episodes, 1.0, 100.0)
+    return policy, v
+
+
+def parallel_run(game, n_episodes, n_workers, sync_every):
+    """ Run the parallel algorithm of a game.
+
+    :param game: 'blackjack' (MC control with exploring starts) or 'easy21' (on-policy MC control)
+    :param n_episodes: The total number of episodes to sample
+    :param n_workers: The number of worker processes
+    :param sync_every: The number of episodes that each worker samples between two merges
+    :return: The policy and the state value function dictionaries
+    """
+    if game == 'blackjack':
+        policy, v, _ = parallel_monte_carlo_es_control(n_episodes, 1.0, n_workers, sync_every)
+    else:
+        policy, v, _ = parallel_on_policy_monte_carlo_control(n_episodes, 1.0, 100.0, n_workers, sync_every)
+    return policy, v
+
+
+def compare(policy, v, ref_policy, ref_v):
+    """ :return: The fraction of the common states with the same action and the mean absolute value difference. """
+    states = [s for s in ref_policy if s in policy]
+    agreement = np.mean([policy[s] == ref_policy[s] for s in states])
+    return agreement, np.mean([abs(v[s] - ref_v[s]) for s in states])
+
+
+def main():
+    """ Compare the wall-clock time of the serial and the parallel Monte Carlo control algorithms of Blackjack and
+        Easy21, and check that the parallel policies match the serial ones as well as two serial runs match each other.
+    """
+    n_episodes, n_workers_list, sync_every = parse_args()
+    print(f"{os.cpu_count()} cores, {n_episodes} episodes per run, merge every {sync_every} episodes per worker")
+
+    optimal_policy, _, _ = backward_induction(BlackjackEnv(), 1.0)
+
+    for game in ('blackjack', 'easy21'):
+        print(f"\n{game}")
+        print(f"{'run':>12} {'time':>9} {'speedup':>8} {'same action':>12} {'mean |dV|':>10}"
+              + (f" {'optimal':>8}" if game == 'blackjack' else ''))
+
+        def report(name, elapsed, serial_elapsed, policy, v, ref_policy, ref_v):
+            agreement, dv = compare(policy, v, ref_policy, ref_v)
+            line = f"{name:>12} {elapsed:>8.2f}s {serial_elapsed / elapsed:>7.2f}x {agreement:>12.3f} {dv:>10.4f}"
+            if game == 'blackjack':
+                line += f" {compare(policy, v, optimal_policy, v)[0]:>8.3f}"
+            print(line)
+
+        start = time.perf_counter()
+        ref_policy, ref_v = serial_run(game, n_episodes, seed=0)
+        serial_elapsed = time.perf_counter() - start
+        report('serial', serial_elapsed, serial_elapsed, ref_policy, ref_v, ref_policy, ref_v)
+
+        # A second serial run with another seed measures how much two runs of the same algorithm differ.
+        start = time.perf_counter()
+        policy, v = serial_run(game, n_episodes, seed=1)
+        report('serial (2)', time.perf_counter() - start, serial_elapsed, policy, v, ref_policy, ref_v)
+
+        for n_workers in n_workers_list:
+            start = time.perf_counter()
+            policy, v = parallel_run(game, n_episodes, n_workers, sync_every)
+            report(f'{n_workers} workers', time.perf_counter() - start, serial_elapsed, policy, v, ref_policy, ref_v)
+
+
+if __name__ == '__main__':
+    main()
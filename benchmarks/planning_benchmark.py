@@ -0,0 +1,186 @@
+import sys
+sys.path.insert(0, '..')
+sys.path.insert(0, '../windy_gridworld_sarsa')
+sys.path.insert(0, '../cliff_gridworld_qlearning')
+
+import argparse
+import time
+import numpy as np
+import matplotlib.pyplot as plt
+from rl_envs.windy_gridworld import WindyGridWorldEnv
+from rl_envs.cliff_gridworld import CliffGridWorldEnv
+from rl_utils.planning import dyna_q, prioritized_sweeping
+from windy_gridworld_sarsa import sarsa
+from cliff_gridworld_qlearning import qlearning
+
+
+def check_positive_int(value):
+    """ Check if the given string value represents α positive integer.
+        If so, return the integer value. Otherwise, raise an error with an informative message.
+
+    :param value: The command line input string.
+    :return: The integer the input string represents.
+    """
+    num = int(value)
+    if num <= 0:
+        raise argparse.ArgumentTypeError("%s is an invalid positive int value" % value)
+    return num
+
+
+def parse_args():
+    """ Create a help menu with informative messages.
+        Parse the arguments given in the command line and return the given or the default values.
+
+    :return: The number of seeds, the number of planning updates per real step, the maximum number of episodes and a
+             plot boolean.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+
+    parser.add_argument("--n_seeds", type=check_positive_int, default=5,
+                        help="The number of runs of each algorithm, with the seeds 0, 1, ... (DEFAULT=5)")
+
+    parser.add_argument("--n_planning", type=check_positive_int, default=10,
+                        help="The number of planning updates per real step of Dyna-Q and prioritized sweeping. "
+                             "(DEFAULT=10)")
+
+    parser.add_argument("--max_episodes", type=check_positive_int, default=500,
+                        help="The maximum number of episodes of a run. (DEFAULT=500)")
+
+    parser.add_argument("--plot", action='store_true',
+                        help="Plot and save (as planning_benchmark.jpg) the real steps and the wall-clock time of "
+                             "each algorithm until its greedy path is optimal. (DEFAULT=False)")
+
+    parser.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
+                        help='Show this help message and exit.')
+
+    args = parser.parse_args()
+    return args.n_seeds, args.n_planning, args.max_episodes, args.plot
+
+
+def optimal_return(env):
+    """ :return: The optimal return from the start of a deterministic grid world, from value iteration on its
+                 transition arrays.
+    """
+    next_states, _, rewards, dones, _ = (array[:, :, 0] for array in env.transition_arrays())
+    v = np.zeros(next_states.shape[0])
+    for _ in range(next_states.shape[0]):
+        v = np.max(rewards + np.where(dones, 0.0, v[next_states]), axis=1)
+    return v[env.start_state]
+
+
+def greedy_return(env, q):
+    """ :return: The return of the greedy path of Q from the start, or -inf if the path does not reach the target. """
+    state, total = env.reset(), 0.0
+    for _ in range(env.observation_space.n):
+        state, reward, done, _ = env.step(int(np.argmax(q[state])))
+        total += reward
+        if done:
+            return total
+    return -np.inf
+
+
+def script_result(env, result):
+    """ Convert the result of sarsa() or qlearning(), whose Q is a dictionary keyed by the (y, x) positions of the
+        visited states, to the (nS, nA) Q array and the info of the planning algorithms.
+
+    :param env: The environment in training mode
+    :param result: The policy, V, Q and info of the run
+    :return: The (nS, nA) Q and the info of the run
+    """
+    _, _, q, info = result
+    array = np.zeros((env.observation_space.n, env.action_space.n))
+    for state, values in q.items():
+        array[env.P.encode(state)] = values
+    return array, info
+
+
+def run_until_optimal(env, algorithm, seed, max_episodes):
+    """ Find the first number of episodes after which the greedy path of an algorithm is optimal, by bisection, which
+        assumes that the greedy path stays optimal once it is reached, and time the run with that number of episodes.
+
+    :param env: The environment in training mode
+    :param algorithm: A function of the number of episodes, which returns the (nS, nA) Q and the info of a run
+    :param seed: The seed of np.random
+    :param max_episodes: The maximum number of episodes
+    :return: The number of episodes, the number of real steps and the wall-clock time of the run, or None if the
+             greedy path is not optimal after max_episodes
+    """
+    target = optimal_return(env)
+
+    def run(n_episodes):
+        np.random.seed(seed)
+        start = time.perf_counter()
+        q, info = algorithm(n_episodes)
+        elapsed = time.perf_counter() - start
+        return greedy_return(env, q) == target, sum(info['timesteps']), elapsed
+
+    optimal, steps, elapsed = run(max_episodes)
+    if not optimal:
+        return None
+    lo, hi = 0, max_episodes
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if run(mid)[0]:
+            hi = mid
+        else:
+            lo = mid
+    _, steps, elapsed = run(hi)
+    return hi, steps, elapsed
+
+
+def plot_results(results):
+    """ Plot the mean real steps and wall-clock time of each algorithm until its greedy path is optimal.
+
+    :param results: A dictionary with the results of the runs of each algorithm of each environment
+    """
+    fig, axes = plt.subplots(2, len(results), figsize=(10 * len(results), 14), tight_layout=True, squeeze=False)
+    for column, (env_name, env_results) in enumerate(results.items()):
+        names = list(env_results)
+        for row, (index, label) in enumerate(((1, 'Real Steps'), (2, 'Wall-Clock Time (s)'))):
+            values = [[run[index] for run in env_results[name] if run is not None] for name in names]
+            axes[row, column].bar(names, [np.mean(v) if v else np.nan for v in values],
+                                  yerr=[np.std(v) if v else 0.0 for v in values], capsize=5)
+            axes[row, column].set_title(f'{env_name}: {label} until the Greedy Path is Optimal', fontsize=16)
+            axes[row, column].set_ylabel(label, fontsize=14)
+    fig.savefig('planning_benchmark.jpg')
+
+
+def main():
+    """ Compare the real environment steps and the wall-clock time until the greedy path is optimal of SARSA on the
+        Windy GridWorld and Q-Learning on the Cliff GridWorld with the ones of Dyna-Q and prioritized sweeping.
+    """
+    n_seeds, n_planning, max_episodes, plot = parse_args()
+    windy_env = WindyGridWorldEnv('normal_moves', training=True)
+    cliff_env = CliffGridWorldEnv(training=True)
+
+    algorithms = {
+        'Windy': (windy_env, {
+            'SARSA': lambda n: script_result(windy_env, sarsa(windy_env, n, 1.0)),
+            'Dyna-Q': lambda n: dyna_q(windy_env, n, 1.0, 0.1, n_planning),
+            'Prioritized sweeping': lambda n: prioritized_sweeping(windy_env, n, 1.0, 0.1, n_planning)}),
+        'Cliff': (cliff_env, {
+            'Q-Learning': lambda n: script_result(cliff_env, qlearning(cliff_env, n, 1.0, 0.1)),
+            'Dyna-Q': lambda n: dyna_q(cliff_env, n, 1.0, 0.1, n_planning),
+            'Prioritized sweeping': lambda n: prioritized_sweeping(cliff_env, n, 1.0, 0.1, n_planning)})}
+
+    print(f"{'environment':>12} {'algorithm':>22} {'episodes':>9} {'real steps':>11} {'time':>9} {'failed':>7}")
+    results = dict()
+    for env_name, (env, env_algorithms) in algorithms.items():
+        results[env_name] = dict()
+        for name, algorithm in env_algorithms.items():
+            runs = [run_until_optimal(env, algorithm, seed, max_episodes) for seed in range(n_seeds)]
+            results[env_name][name] = runs
+            done = [run for run in runs if run is not None]
+            if done:
+                episodes, steps, elapsed = np.mean(done, axis=0)
+                print(f"{env_name:>12} {name:>22} {episodes:>9.1f} {steps:>11.0f} {elapsed:>8.3f}s "
+                      f"{len(runs) - len(done):>7}")
+            else:
+                print(f"{env_name:>12} {name:>22} {'-':>9} {'-':>11} {'-':>9} {len(runs):>7}")
+
+    if plot:
+        plot_results(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+import sys
+sys.path.insert(0, '..')
+
+import argparse
+import time
+import numpy as np
+from rl_envs.gridworld import GridWorldEnv
+from rl_envs.compiled_model import compile_model
+from rl_utils import bellman
+from rl_utils.history import HistoryRecorder
+
+
+def check_positive_int(value):
+    """ Check if the given string value represents α positive integer.
+        If so, return the integer value. Otherwise, raise an error with an informative message.
+
+    :param value: The command line input string.
+    :return: The integer the input string represents.
+    """
+    num = int(value)
+    if num <= 0:
+        raise argparse.ArgumentTypeError("%s is an invalid positive int value" % value)
+    return num
+
+
+def check_positive_float(value):
+    """ Check if the given string value represents α positive decimal number.
+        If so, return the float value. Otherwise, raise an error with an informative message.
+
+    :param value: The command line input string.
+    :return: The float the input string represents.
+    """
+    num = float(value)
+    if num <= 0.0:
+        raise argparse.ArgumentTypeError("%s is an invalid positive float value" % value)
+    return num
+
+
+def parse_args():
+    """ Create a help menu with informative messages.
+        Parse the arguments given in the command line and return the given or the default values.
+
+    :return: The sizes of the (square) grids, the evaluation sweeps of modified policy iteration, the discount factor
+             gamma and the sensitivity epsilon.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+
+    parser.add_argument("--sizes", type=check_positive_int, nargs='+', default=[10, 25, 50],
+                        help="The height (and width) of the benchmarked grids. (DEFAULT=10 25 50)")
+
+    parser.add_argument("--sweeps", type=check_positive_int, nargs='+', default=[1, 5, 20, 100],
+                        help="The evaluation sweeps per policy of the benchmarked modified policy iteration runs. "
+                             "(DEFAULT=1 5 20 100)")
+
+    parser.add_argument("--gamma", type=check_positive_float, default=1.0,
+                        help="The discount factor. (DEFAULT=1.0)")
+
+    parser.add_argument("--epsilon", type=check_positive_float, default=1e-5,
+                        help="The sensitivity factor of the (policy evaluation and value iteration) sweeps. "
+                             "(DEFAULT=1e-5)")
+
+    parser.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
+                        help='Show this help message and exit.')
+
+    args = parser.parse_args()
+    return args.sizes, args.sweeps, args.gamma, args.epsilon
+
+
+def classic_policy_iteration(model, pi, gamma, eps):
+    """ Classic policy iteration. Each policy is evaluated from zero until its value function converges.
+
+    :param model: The compiled model of the environment
+    :param pi: A (nS, nA) array with the probability of each action in each state of the initial policy
+    :param gamma: The discount factor
+    :param eps: The sensitivity factor of the policy evaluation
+    :return: The final state value function, the number of policy improvements and the total number of sweeps
+    """
+    policy = None
+    n_improvements, total_sweeps = 0, 0
+
+    while True:
+        V_history = bellman.policy_evaluation(model, pi, gamma, eps, HistoryRecorder('off'))
+        V = V_history[-1]
+        total_sweeps += V_history.count - 1
+
+        new_policy = bellman.greedy_policy(model, bellman.q_values(model, V, gamma), policy, eps)
+        n_improvements += 1
+        if policy is not None and np.array_equal(new_policy, policy):
+            return V, n_improvements, total_sweeps
+        policy = new_policy
+        pi = np.zeros((model.nS, model.nA))
+        pi[np.arange(model.nS), policy] = 1.0
+
+
+def report(name, n_states, n_improvements, total_sweeps, elapsed, error):
+    """ Print the cost of a run.
+
+    :param name: The name of the algorithm
+    :param n_states: The number of states of the environment
+    :param n_improvements: The number of policy improvements (or 0 for value iteration)
+    :param total_sweeps: The total number of sweeps
+    :param elapsed: The run time in seconds
+    :param error: The largest difference from the value function of value iteration
+    """
+    print(f"{name:>14} {n_improvements:>8} {total_sweeps:>8} {total_sweeps * n_states:>12} {elapsed:>8.3f}s "
+          f"{error:>9.1e}")
+
+
+def main():
+    """ Count the Bellman backups (evaluation or optimality backups of single states) that value iteration, classic
+        policy iteration and modified policy iteration need to converge on growing GridWorld environments.
+    """
+    sizes, sweeps, gamma, eps = parse_args()
+
+    for size in sizes:
+        env = GridWorldEnv(size, size)
+        model = compile_model(env)
+        pi = np.full((env.nS, env.nA), 1.0 / env.nA)
+
+        print(f"\n{size}x{size} grid ({env.nS} states)")
+        print(f"{'algorithm':>14} {'improve':>8} {'sweeps':>8} {'backups':>12} {'time':>9} {'max err':>9}")
+
+        start = time.perf_counter()
+        V_history, _ = bellman.value_iteration(model, gamma, eps, V_history=HistoryRecorder('off'))
+        V_opt = V_history[-1]
+        report('VI', env.nS, 0, V_history.count - 1, time.perf_counter() - start, 0.0)
+
+        start = time.perf_counter()
+        V, n_improvements, total_sweeps = classic_policy_iteration(model, pi, gamma, eps)
+        report('PI', env.nS, n_improvements, total_sweeps, time.perf_counter() - start, np.max(np.abs(V - V_opt)))
+
+        for n_sweeps in sweeps:
+            start = time.perf_counter()
+            policy_history, V_history, total_sweeps = bellman.modified_policy_iteration(
+                model, pi, gamma, n_sweeps, eps, policy_history=HistoryRecorder('off'),
+                V_history=HistoryRecorder('off'))
+            report(f'MPI (m={n_sweeps})', env.nS, policy_history.count, total_sweeps, time.perf_counter() - start,
+                   np.max(np.abs(V_history[-1] - V_opt)))
+
+
+if __name__ == '__main__':
+    main()
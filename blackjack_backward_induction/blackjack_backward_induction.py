@@ -0,0 +1,174 @@
+import sys
+sys.path.insert(0, '..')
+
+import time
+import numpy as np
+import argparse
+import pprint
+import matplotlib.pyplot as plt
+from mpl_toolkits.mplot3d import Axes3D
+import seaborn as sns
+from rl_envs.blackjack import BlackjackEnv
+
+
+def check_positive_float(value):
+    """ Check if the given string value represents α positive decimal number.
+        If so, return the float value. Otherwise, raise an error with an informative message.
+
+    :param value: The command line input string.
+    :return: The float the input string represents.
+    """
+    num = float(value)
+    if num <= 0.0:
+        raise argparse.ArgumentTypeError("%s is an invalid positive float value" % value)
+    return num
+
+
+def parse_args():
+    """ Create a help menu with informative messages.
+        Parse the arguments given in the command line and return the given or the default values.
+
+    :return: The discount factor and a plot boolean.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+
+    parser.add_argument("--gamma", type=check_positive_float, default=1.0,
+                        help="The discount factor. (DEFAULT=1.0)")
+
+    parser.add_argument("--plot", action='store_true',
+                        help="Plot and save as blackjack_bi_v.jpg the optimal state value function and as "
+                             "blackjack_bi_policy.jpg the optimal policy. (DEFAULT=False)")
+
+    parser.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
+                        help='Show this help message and exit.')
+
+    args = parser.parse_args()
+    return args.gamma, args.plot
+
+
+def plot_blackjack_results(policy, v):
+    """ Plot and save two figures, one with the optimal policy and another with its state value function.
+
+    :param policy: The optimal policy for the blackjack game
+    :param v: The state value function of the optimal policy
+    """
+
+    # Plot the optimal policy
+    fig1, axes1 = plt.subplots(2, 1, figsize=(20, 15))
+    fig1.suptitle('Blackjack Optimal Policy\n(backward induction)', fontsize=24)
+    for ax in axes1:
+        ax.tick_params(left=False, bottom=False)
+
+    usable_ace_policy = [['H' if policy[(player_sum, dealer_card, True)] else 'S' for dealer_card in range(1, 11)]
+                         for player_sum in range(21, 11, -1)]
+    usable_ace_clr = [[policy[(player_sum, dealer_card, True)] for dealer_card in range(1, 11)]
+                      for player_sum in range(21, 11, -1)]
+
+    no_usable_ace_policy = [['H' if policy[(player_sum, dealer_card, False)] else 'S' for dealer_card in range(1, 11)]
+                            for player_sum in range(21, 11, -1)]
+    no_usable_ace_clr = [[policy[(player_sum, dealer_card, False)] for dealer_card in range(1, 11)]
+                         for player_sum in range(21, 11, -1)]
+
+    sns.heatmap(ax=axes1[0], data=usable_ace_clr, annot=usable_ace_policy, vmin=0.0, vmax=1.0, cmap='plasma',
+                cbar=False, annot_kws={'fontsize': 22}, fmt='')
+
+    sns.heatmap(ax=axes1[1], data=no_usable_ace_clr, annot=no_usable_ace_policy, vmin=0.0, vmax=1.0, cmap='plasma',
+                cbar=False, annot_kws={'fontsize': 22}, fmt='')
+
+    axes1[0].set_title('Usable ace', fontsize=22)
+    axes1[1].set_title('No usable ace', fontsize=22)
+    for ax in axes1:
+        ax.set_xlabel('Dealer showing', fontsize=18)
+        ax.set_ylabel('Player sum', fontsize=18)
+        ax.set_xticklabels(['A', '2', '3', '4', '5', '6', '7', '8', '9', '10'])
+        ax.set_yticklabels(['21', '20', '19', '18', '17', '16', '15', '14', '13', '12'])
+
+    # Plot the state value function of the optimal policy
+    fig2 = plt.figure(figsize=(12, 15))
+    axes2 = [fig2.add_subplot(211, projection='3d'), fig2.add_subplot(212, projection='3d')]
+    fig2.suptitle('Blackjack State Value Function V*\n(backward induction)', fontsize=24)
+
+    x, y = np.meshgrid(range(1, 11), range(12, 22))
+    v_usable_ace = np.array([[v[(player_sum, dealer_card, True)] for dealer_card in range(1, 11)]
+                             for player_sum in range(12, 22)])
+    v_no_usable_ace = np.array([[v[(player_sum, dealer_card, False)] for dealer_card in range(1, 11)]
+                                for player_sum in range(12, 22)])
+
+    axes2[0].plot_surface(x, y, v_usable_ace)
+    axes2[1].plot_surface(x, y, v_no_usable_ace)
+
+    axes2[0].set_title('Usable ace', fontsize=22)
+    axes2[1].set_title('No usable ace', fontsize=22)
+    for ax in axes2:
+        ax.set_xlim(1, 10)
+        ax.set_ylim(12, 21)
+        ax.set_zlim(-1, 1)
+        ax.set_xlabel('Dealer showing', fontsize=18)
+        ax.set_ylabel('Player sum', fontsize=18)
+
+    fig1.savefig('blackjack_bi_policy.jpg')
+    fig2.savefig('blackjack_bi_v.jpg')
+    plt.show()
+
+
+def backward_induction(env, gamma, policy=None):
+    """ Solve the Blackjack game exactly with its transition model. The player's sum only increases, unless a usable
+        ace is demoted, which happens once per episode. So, every state is backed up after its successors, in one pass,
+        if the states without a usable ace come first and the states of each group are visited in decreasing order of
+        the player's sum. With a given policy, the same pass evaluates the policy instead.
+
+    :param env: The Blackjack environment
+    :param gamma: The discount factor
+    :param policy: A dictionary with the action of each state of a policy to evaluate (DEFAULT=None, the optimal
+                   policy is found)
+    :return: The optimal (or the given) policy, the state value function and the state-action value function, in the
+             formats of the Monte Carlo control algorithms
+    """
+    model = env.transition_model()
+    order = sorted(model, key=lambda state: (state[2], -state[0], state[1]))
+
+    q = dict()
+    v = dict()
+    for state in order:
+        q[state] = np.zeros(env.action_space.n)
+        for action, transitions in model[state].items():
+            for probability, next_state, reward, done in transitions:
+                q[state][action] += probability * (reward + (0.0 if done else gamma * v[next_state]))
+        v[state] = np.max(q[state]) if policy is None else q[state][policy[state]]
+
+    if policy is None:
+        policy = {state: np.argmax(q[state]) for state in q}
+    return policy, v, q
+
+
+def main():
+    """
+    Read the command line arguments, create a Blackjack environment and find the optimal strategy for the player with
+    backward induction over the exact transition model of the game. Optionally, plot two figures, one with the optimal
+    state value function and another one with the optimal policy.
+    """
+    gamma, plot = parse_args()
+    env = BlackjackEnv()
+
+    start = time.perf_counter()
+    policy, v, q = backward_induction(env, gamma)
+    elapsed = time.perf_counter() - start
+
+    pp = pprint.PrettyPrinter(indent=2)
+    print("Optimal Policy")
+    pp.pprint(policy)
+
+    print("\nState Value Function V*")
+    pp.pprint(v)
+
+    print("\nState-Action Value Function Q*")
+    pp.pprint(q)
+
+    print(f"\nSolved {len(q)} states in {1000 * elapsed:.1f} ms")
+
+    if plot:
+        plot_blackjack_results(policy, v)
+
+
+if __name__ == '__main__':
+    main()
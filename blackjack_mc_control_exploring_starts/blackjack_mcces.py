@@ -8,6 +8,9 @@ import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 import seaborn as sns
 from rl_envs.blackjack import BlackjackEnv
+from rl_utils.tabular import BLACKJACK_ENCODER, QTable
+from rl_utils.episode_buffer import EpisodeBuffer, scatter_mean
+from rl_utils.parallel_mc import parallel_mc_control
 
 
 def check_positive_int(value):
@@ -40,7 +43,9 @@ def parse_args():
     """ Create a help menu with informative messages.
         Parse the arguments given in the command line and return the given or the default values.
 
-    :return: The number of episodes to sample, the discount factor of the MC algorithm, a plot boolean.
+    :return: The number of episodes to sample, the discount factor of the MC algorithm, a plot boolean, the number of
+             worker processes, the number of episodes per worker between two merges and the number of episodes between
+             two updates of Q.
     """
     parser = argparse.ArgumentParser(add_help=False)
 
@@ -55,11 +60,22 @@ def parse_args():
                         help="Plot and save as blackjack_mcces_v.jpg the state value function of the optimal policy "
                              "and as blackjack_mcces_policy.jpg the optimal policy. (DEFAULT=False)")
 
+    parser.add_argument("--n_workers", type=check_positive_int, default=1,
+                        help="The number of worker processes that sample episodes in parallel. (DEFAULT=1)")
+
+    parser.add_argument("--sync_every", type=check_positive_int, default=10000,
+                        help="The number of episodes that each worker samples before its returns are merged with the "
+                             "ones of the other workers. (DEFAULT=10000)")
+
+    parser.add_argument("--batch_size", type=check_positive_int, default=1000,
+                        help="The number of episodes that are sampled between two updates of the Q function. "
+                             "(DEFAULT=1000)")
+
     parser.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
                         help='Show this help message and exit.')
 
     args = parser.parse_args()
-    return args.n_episodes, args.gamma, args.plot
+    return args.n_episodes, args.gamma, args.plot, args.n_workers, args.sync_every, args.batch_size
 
 
 def plot_blackjack_results(n_episodes, policy, v):
@@ -128,54 +144,76 @@ def plot_blackjack_results(n_episodes, policy, v):
     plt.show()
 
 
-def monte_carlo_es_control(env, n_episodes, gamma):
+def sample_episode(env, q, buffer):
+    """ Sample an episode with an exploring start and the greedy policy of the given state-action value function.
+
+    :param env: The Blackjack environment.
+    :param q: The (encoded) state-action value function
+    :param buffer: The episode buffer, where the steps of the episode are recorded
+    """
+    done = False  # Sample an episode based on the given strategy
+
+    curr_obs = env.reset(env.observation_space.sample())
+    c = 0
+    while not done:
+        curr_state = BLACKJACK_ENCODER.encode(curr_obs)
+
+        if c:  # Select the best action greedily after the first time
+            max_ind = np.where(q[curr_state] == np.max(q[curr_state]))[0]  # Ties are broken arbitrarily
+            action = np.random.choice(max_ind)
+        else:  # The first time the action is selected at random
+            action = env.action_space.sample()
+
+        next_obs, r, done, _ = env.step(action)
+        buffer.append(curr_state, action, r)
+        curr_obs = next_obs
+        c += 1
+    buffer.end_episode()
+
+
+def monte_carlo_es_control(env, n_episodes, gamma, batch_size=1000):
     """ An implementation of the (First-Visit) Monte Carlo with Exploring Starts Algorithm. The algorithm estimates the
-        optimal policy for the given environment.
+        optimal policy for the given environment. The episodes are recorded into an episode buffer and the first-visit
+        returns of every batch_size episodes are averaged into Q at once, so the greedy policy is updated every
+        batch_size episodes.
 
     :param env: The Blackjack environment.
     :param n_episodes: The number of episodes to sample
     :param gamma: The discount factor of MC
+    :param batch_size: The number of episodes between two updates of Q
     :return: The final optimal policy, the state value function and the state-action value function
     """
 
-    q = dict()
-    n = dict()
+    table = QTable(BLACKJACK_ENCODER, env.action_space.n)
+    q, n = table.Q, table.N
+    buffer = EpisodeBuffer()
     for e in range(n_episodes):  # Loop for the given number of episodes to sample
+        sample_episode(env, q, buffer)
 
-        done = False  # Sample an episode based on the given strategy
-        episode_hist = []
-
-        curr_obs = env.reset(env.observation_space.sample())
-        c = 0
-        while not done:
-            if curr_obs not in q:
-                q[curr_obs] = np.zeros(env.action_space.n)
-                n[curr_obs] = np.zeros(env.action_space.n)
+        if buffer.n_episodes == batch_size or e + 1 == n_episodes:
+            states, actions, returns = buffer.first_visit_returns(gamma)
+            scatter_mean(q, n, (states, actions), returns)
+            buffer.clear()
 
-            if c:  # Select the best action greedily after the first time
-                max_ind = np.where(q[curr_obs] == np.max(q[curr_obs]))[0]  # Ties are broken arbitrarily
-                action = np.random.choice(max_ind)
-            else:  # The first time the action is selected at random
-                action = env.action_space.sample()
+    return table.to_dicts()
 
-            next_obs, r, done, _ = env.step(action)
-            episode_hist.append(((curr_obs, action), r))
-            curr_obs = next_obs
-            c += 1
 
-        episode_returns = dict()  # Calculate the return for the first visit of a (state, action) pair in the episode
-        g = 0
-        for (s, a), r in reversed(episode_hist):
-            g = r + gamma * g
-            episode_returns[(s, a)] = g
+def parallel_monte_carlo_es_control(n_episodes, gamma, n_workers, sync_every, batch_size=1000):
+    """ The Monte Carlo with Exploring Starts Algorithm with worker processes, which sample episodes with independent
+        Blackjack environments and merge their returns every sync_every episodes.
 
-        for (s, a) in episode_returns:
-            n[s][a] += 1
-            q[s][a] += 1 / n[s][a] * (episode_returns[(s, a)] - q[s][a])
-
-    policy = {state: np.argmax(q[state]) for state in q}
-    v = {state: np.max(q[state]) for state in q}
-    return policy, v, q
+    :param n_episodes: The total number of episodes to sample
+    :param gamma: The discount factor of MC
+    :param n_workers: The number of worker processes
+    :param sync_every: The number of episodes that each worker samples between two merges
+    :param batch_size: The number of episodes between two updates of the local Q of a worker
+    :return: The final optimal policy, the state value function and the state-action value function
+    """
+    table = QTable(BLACKJACK_ENCODER, BlackjackEnv().action_space.n)
+    table.Q[:], table.N[:] = parallel_mc_control(BlackjackEnv, sample_episode, (), BLACKJACK_ENCODER.nS,
+                                                 table.Q.shape[1], gamma, n_episodes, n_workers, sync_every,
+                                                 batch_size)
+    return table.to_dicts()
 
 
 def main():
@@ -185,9 +223,12 @@ def main():
     with Exploring Starts algorithm. Optionally, plot two figures, one with the final state value function and another
     one with the optimal policy.
     """
-    n_episodes, gamma, plot = parse_args()
-    env = BlackjackEnv()
-    final_policy, v, q = monte_carlo_es_control(env, n_episodes, gamma)
+    n_episodes, gamma, plot, n_workers, sync_every, batch_size = parse_args()
+    if n_workers > 1:
+        final_policy, v, q = parallel_monte_carlo_es_control(n_episodes, gamma, n_workers, sync_every, batch_size)
+    else:
+        env = BlackjackEnv()
+        final_policy, v, q = monte_carlo_es_control(env, n_episodes, gamma, batch_size)
 
     pp = pprint.PrettyPrinter(indent=2)
     print("Final Policy")
@@ -1,6 +1,7 @@
 import sys
 sys.path.insert(0, '..')
 
+import math
 import numpy as np
 import argparse
 import pprint
@@ -8,6 +9,14 @@ import matplotlib.pyplot as plt
 import matplotlib.animation as an
 from mpl_toolkits.mplot3d import Axes3D
 from rl_envs.blackjack import BlackjackEnv
+from rl_utils.history import HistoryRecorder
+from rl_utils.tabular import BLACKJACK_ENCODER
+from rl_utils.episode_buffer import EpisodeBuffer, scatter_mean
+from rl_utils.episode_log import open_or_record_episodes
+
+# The value function and the visit counts are dense (player_sum - 12, dealer_card - 1, usable_ace) arrays, whose flat
+# indices are the states of the Blackjack encoder.
+SHAPE = (10, 10, 2)
 
 
 def check_positive_int(value):
@@ -56,7 +65,8 @@ def parse_args():
         Parse the arguments given in the command line and return the given or the default values.
 
     :return: The number of episodes to sample, the threshold of the player's strategy, the discount factor of the MC
-             algorithm, a plot boolean.
+             algorithm, a plot boolean, the snapshot interval, the history mode, its size and the episode log
+             directory.
     """
     parser = argparse.ArgumentParser(add_help=False)
 
@@ -74,29 +84,50 @@ def parse_args():
                              "of the Monte Carlo Prediction algorithm and as blackjack_mcp_results_{n_episodes}.jpg "
                              "the final results of the algorithm (DEFAULT=False)")
 
+    parser.add_argument("--snapshot_every", type=check_positive_int, default=1000,
+                        help="The number of episodes between two snapshots of the value function, which are the "
+                             "frames of the animation. The final value function is always a snapshot. (DEFAULT=1000)")
+
+    parser.add_argument("--history", choices=HistoryRecorder.MODES, default=None,
+                        help="How the snapshots are recorded. 'all' keeps every snapshot, 'stride' every N-th one, "
+                             "'last' the last N ones, 'disk' streams all of them to "
+                             "blackjack_mcp_history_{n_episodes}.npy and 'off' keeps only the final one, which is "
+                             "always kept. (DEFAULT=all with --plot, off without it)")
+
+    parser.add_argument("--history-n", type=check_positive_int, default=10,
+                        help="The N of the 'stride' and 'last' history modes. (DEFAULT=10)")
+
+    parser.add_argument("--log", default=None,
+                        help="Replay the episodes of the episode log in this directory instead of sampling them. "
+                             "If the log does not exist, the episodes of the strategy are recorded into it first, so "
+                             "they are sampled once and reused by the following runs. An existing log must have at "
+                             "least n_episodes episodes. (DEFAULT=None)")
+
     parser.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
                         help='Show this help message and exit.')
 
     args = parser.parse_args()
-    return args.n_episodes, args.threshold, args.gamma, args.plot
+    return (args.n_episodes, args.threshold, args.gamma, args.plot, args.snapshot_every, args.history,
+            args.history_n, args.log)
 
 
-def plot_blackjack_results(n_episodes, v_history):
+def plot_blackjack_results(n_episodes, V_history, snapshot_every):
     """ Plot and save two figures, one with the final value function and another where the value function progress is
      animated.
 
     :param n_episodes: The number of episodes that were sampled for the MC Prediction algorithm
-    :param v_history: A list containing the state value function for each episode of MC
+    :param V_history: A history that contains the (recorded) snapshots of the state value function
+    :param snapshot_every: The number of episodes between two snapshots
     """
 
-    # Animation Parameters for n=10,000
-    STEP = 1000
+    # Animation Parameters for n=10,000 (--snapshot_every 1000)
     INTERVAL = 2000
 
-    # Animation Parameters for n=500,000
-    # STEP = 10000
+    # Animation Parameters for n=500,000 (--snapshot_every 10000)
     # INTERVAL = 500
 
+    episodes = [min((i + 1) * snapshot_every, n_episodes) for i in V_history.iterations]
+
     fig1 = plt.figure(figsize=(12, 20))
     ax11 = fig1.add_subplot(211, projection='3d')
     ax12 = fig1.add_subplot(212, projection='3d')
@@ -110,8 +141,8 @@ def plot_blackjack_results(n_episodes, v_history):
     ax12.set_title('No usable ace', fontsize=18)
     fig1.suptitle(f"Monte Carlo Prediction\n", fontsize=22)
 
-    def update(fig, ax1, ax2, episode):
-        vf = v_history[episode]
+    def update(fig, ax1, ax2, frame):
+        vf = V_history[frame]
 
         ax1.cla()
         ax2.cla()
@@ -123,70 +154,104 @@ def plot_blackjack_results(n_episodes, v_history):
             ax.set_zlim(-1, 1)
         ax1.set_title('Usable ace', fontsize=18)
         ax2.set_title('No usable ace', fontsize=18)
-        fig.suptitle(f"Monte Carlo Prediction\nepisode# = {episode+1}", fontsize=22)
+        fig.suptitle(f"Monte Carlo Prediction\nepisode# = {episodes[frame]}", fontsize=22)
 
         player_hand = np.arange(12, 22)
         dealer_card = np.arange(1, 11)
 
         x, y = np.meshgrid(dealer_card, player_hand)
-        v_usable_ace = np.array([[vf.get((i, j, True), 0) for j in dealer_card] for i in player_hand])
-        v_no_usable_ace = np.array([[vf.get((i, j, False), 0) for j in dealer_card] for i in player_hand])
-
-        ax1.plot_surface(x, y, v_usable_ace)
-        ax2.plot_surface(x, y, v_no_usable_ace)
+        ax1.plot_surface(x, y, vf[:, :, 1])
+        ax2.plot_surface(x, y, vf[:, :, 0])
 
-    anim = an.FuncAnimation(fig1, lambda frame: update(fig1, ax11, ax12, STEP * (frame+1) - 1), n_episodes//STEP,
-                            repeat=False, interval=INTERVAL)
+    anim = an.FuncAnimation(fig1, lambda frame: update(fig1, ax11, ax12, frame), len(V_history), repeat=False,
+                            interval=INTERVAL)
     anim.save(f'blackjack_mcp_episodes_{n_episodes}.gif', writer='imagemagick', fps=1000 / INTERVAL)
 
     fig2 = plt.figure(figsize=(12, 20))
     ax21 = fig2.add_subplot(211, projection='3d')
     ax22 = fig2.add_subplot(212, projection='3d')
-    update(fig2, ax21, ax22, len(v_history)-1)
+    update(fig2, ax21, ax22, len(V_history)-1)
     fig2.savefig(f'blackjack_mcp_results_{n_episodes}.jpg')
 
     plt.show()
 
 
-def monte_carlo_prediction(env, n_episodes, gamma, strategy_fn):
-    """ The Monte Carlo Prediction Algorithm to evaluate the state value function for the given strategy.
+def monte_carlo_prediction(env, n_episodes, gamma, strategy_fn, snapshot_every=1000, V_history=None,
+                           batch_size=1000, log=None):
+    """ The Monte Carlo Prediction Algorithm to evaluate the state value function for the given strategy. The value
+        function and the visit counts are kept in dense arrays and a snapshot of the value function is recorded every
+        snapshot_every episodes, so the memory does not depend on the number of episodes. The episodes are recorded
+        into an episode buffer and the first-visit returns of a batch of episodes are averaged into the value function
+        at once. The strategy does not depend on the value function, so the result does not depend on the batch size.
+        Instead of sampling the episodes from the environment, they can be replayed from an episode log of the same
+        strategy.
 
     :param env: The Blackjack environment
     :param n_episodes: The number of episodes to sample for the MC algorithm
     :param gamma: The discount factor of MC
     :param strategy_fn: The strategy of the agent given an observation of the environment
-    :return: A list containing the state value function for each episode of MC
+    :param snapshot_every: The number of episodes between two snapshots of the value function
+    :param V_history: The history recorder of the snapshots (DEFAULT=a recorder that keeps all of them)
+    :param batch_size: The maximum number of episodes between two updates of the value function
+    :param log: An episode log of the strategy with at least n_episodes episodes, whose first n_episodes episodes are
+                replayed (DEFAULT=None, the episodes are sampled from the environment)
+    :return: A history that contains the snapshots of the state value function, whose last one is the final value
+             function, and the visit counts of the states
     """
 
-    V_hist = []
-    mc_state = dict()
+    V_history = HistoryRecorder() if V_history is None else V_history
+    V = np.zeros(SHAPE)
+    N = np.zeros(SHAPE, dtype=np.int64)
+
+    def update(buffer):
+        # Average the returns of the first visit of each state in each episode of the batch.
+        first = buffer.first_visit_mask(buffer.states)
+        scatter_mean(V, N, buffer.states[first], buffer.returns(gamma)[first])
+
+    if log is not None:
+        # The batches of the log end at the multiples of their size, so the snapshots are taken after whole batches.
+        i = 0
+        for batch in log.batches(math.gcd(snapshot_every, batch_size), n_episodes):
+            update(batch)
+            i += batch.n_episodes
+            if i % snapshot_every == 0 or i == n_episodes:
+                V_history.append(V.copy())
+
+        V_history.close()
+        return V_history, N
+
+    buffer = EpisodeBuffer()
     for i in range(n_episodes):                         # Loop for the given number of episodes to sample
 
         done = False                                    # Sample an episode based on the given strategy
-        episode_hist = []
-
         curr_obs = env.reset()
         while not done:
             action = strategy_fn(curr_obs)              # The action to take based on the given strategy
             next_obs, r, done, _ = env.step(action)
-            episode_hist.append((curr_obs, r))
+            buffer.append(BLACKJACK_ENCODER.encode(curr_obs), action, r)
             curr_obs = next_obs
+        buffer.end_episode()
+
+        snapshot = (i + 1) % snapshot_every == 0 or i + 1 == n_episodes
+        if snapshot or buffer.n_episodes == batch_size:
+            update(buffer)
+            buffer.clear()
 
-        episode_state_returns = dict()  # Calculate the return for the first visit of a state in the sampled episode
-        g = 0
-        for obs, r in reversed(episode_hist):
-            g = r + gamma * g
-            episode_state_returns[obs] = g
+        if snapshot:
+            V_history.append(V.copy())
 
-        for state, g in episode_state_returns.items():
-            exp_g, n = mc_state.get(state, (0, 0))
-            n += 1
-            exp_g += 1/n * (g - exp_g)
-            mc_state[state] = (exp_g, n)
+    V_history.close()
+    return V_history, N
 
-        V_hist.append({state: mc_state[state][0] for state in mc_state})
 
-    return V_hist
+def value_function_dict(V, N):
+    """ Convert the dense value function to a dictionary with the visited states, (player_sum, dealer_card, usable_ace).
+
+    :param V: The dense state value function
+    :param N: The dense visit counts
+    :return: A dictionary with the value of each visited state
+    """
+    return {(int(p) + 12, int(d) + 1, bool(a)): V[p, d, a] for p, d, a in zip(*np.nonzero(N))}
 
 
 def strategy(obs, threshold):
@@ -211,17 +276,27 @@ def main():
     Prediction algorithm. Optionally, plot an animation demonstrating the progress of the MC algorithm and an
     image with the final value function.
     """
-    n_episodes, threshold, gamma, plot = parse_args()
+    n_episodes, threshold, gamma, plot, snapshot_every, history, history_n, log_dir = parse_args()
     env = BlackjackEnv()
-    v_history = monte_carlo_prediction(env, n_episodes, gamma, strategy_fn=lambda obs: strategy(obs, threshold))
+    strategy_fn = lambda obs: strategy(obs, threshold)
+
+    log = None
+    if log_dir is not None:
+        log = open_or_record_episodes(env, BLACKJACK_ENCODER, lambda obs: (strategy_fn(obs), 1.0), n_episodes, log_dir,
+                                      metadata={'env': 'Blackjack', 'strategy': 'threshold', 'threshold': threshold})
+
+    V_history = HistoryRecorder(history or ('all' if plot else 'off'), history_n,
+                                f'blackjack_mcp_history_{n_episodes}.npy')
+    V_history, N = monte_carlo_prediction(env, n_episodes, gamma, strategy_fn=strategy_fn,
+                                          snapshot_every=snapshot_every, V_history=V_history, log=log)
 
-    final_v = v_history[-1]
+    final_v = value_function_dict(V_history[-1], N)
     pp = pprint.PrettyPrinter(indent=2)
     print("State Value Function")
     pp.pprint(final_v)
 
     if plot:
-        plot_blackjack_results(n_episodes, v_history)
+        plot_blackjack_results(n_episodes, V_history, snapshot_every)
 
 
 if __name__=='__main__':
@@ -8,6 +8,10 @@ import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 import seaborn as sns
 from rl_envs.blackjack import BlackjackEnv
+from rl_utils.tabular import BLACKJACK_ENCODER, QTable
+from rl_utils.action_selection import EpsilonGreedy
+from rl_utils.episode_buffer import EpisodeBuffer, scatter_mean
+from rl_utils.episode_log import open_or_record_episodes
 
 
 def check_positive_int(value):
@@ -40,7 +44,8 @@ def parse_args():
     """ Create a help menu with informative messages.
         Parse the arguments given in the command line and return the given or the default values.
 
-    :return: The number of episodes to sample, the discount factor of the off-policy MC algorithm, a plot boolean.
+    :return: The number of episodes to sample, the discount factor of the off-policy MC algorithm, a plot boolean,
+             the number of episodes between two updates of Q and the episode log directory.
     """
     parser = argparse.ArgumentParser(add_help=False)
 
@@ -55,11 +60,21 @@ def parse_args():
                              "target (optimal) policy and as blackjack_offpolicy_mcc_wis_policy.jpg the target policy. "
                              "(DEFAULT=False)")
 
+    parser.add_argument("--batch_size", type=check_positive_int, default=1000,
+                        help="The number of episodes that are sampled between two updates of the Q function. "
+                             "(DEFAULT=1000)")
+
+    parser.add_argument("--log", default=None,
+                        help="Replay the episodes of the episode log in this directory instead of sampling them. "
+                             "If the log does not exist, episodes of the uniformly random behavior policy with "
+                             "exploring starts are recorded into it first, so they are sampled once and reused by the "
+                             "following runs. An existing log must have at least n_episodes episodes. (DEFAULT=None)")
+
     parser.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
                         help='Show this help message and exit.')
 
     args = parser.parse_args()
-    return args.n_episodes, args.gamma, args.plot
+    return args.n_episodes, args.gamma, args.plot, args.batch_size, args.log
 
 
 def plot_blackjack_results(n_episodes, policy, v):
@@ -129,54 +144,64 @@ def plot_blackjack_results(n_episodes, policy, v):
     plt.show()
 
 
-def off_policy_monte_carlo_wis_control(env, n_episodes, gamma):
+def off_policy_monte_carlo_wis_control(env, n_episodes, gamma, batch_size=1000, log=None):
     """ An implementation of the Off-Policy (Every-Visit) Monte Carlo Control with Weighted Importance Sampling
         Algorithm. The target policy of the algorithm converges to the optimal policy for the given environment.
 
+        The episodes are recorded into an episode buffer and every batch_size episodes the weighted returns of the
+        batch are averaged into Q at once, with the greedy target policy of the start of the batch. The importance
+        sampling weight of a step is the product of 1 / b(A|S) over the following steps, whose actions must all be
+        greedy; the steps before the last non-greedy action of an episode get a zero weight, like the backward loop
+        over an episode, which stops at the first non-greedy action. Instead of sampling the episodes with the
+        epsilon-greedy behavior policy, they can be replayed from an episode log of any soft behavior policy, whose
+        probabilities are stored in the log.
+
     :param env: The Blackjack environment.
     :param n_episodes: The number of episodes to sample using the behavior policy
     :param gamma: The discount factor of MC
+    :param batch_size: The number of episodes between two updates of Q
+    :param log: An episode log with at least n_episodes episodes, whose first n_episodes episodes are replayed
+                (DEFAULT=None, the episodes are sampled from the environment)
     :return: The final optimal policy, its state value function and its state-action value function
     """
 
     def behavior_policy(s, e):
         epsilon = np.sqrt(33333/(e+33333))
-        prob = np.full(env.action_space.n, epsilon/env.action_space.n)
-        prob[np.argmax(q[s])] += 1-epsilon
-        a = np.random.choice(env.action_space.n, p=prob)
-        return a, prob[a]
+        return selector.select_with_prob(q[s], epsilon)
+
+    def update(buffer):
+        states, actions = buffer.states, buffer.actions
+        target_probs = (actions == np.argmax(q[states], axis=1)).astype(float)
+        w = buffer.importance_ratios(target_probs, exclusive=True)
+        scatter_mean(q, c, (states, actions), buffer.returns(gamma), w)
+
+    table = QTable(BLACKJACK_ENCODER, env.action_space.n)
+    q, c = table.Q, table.N     # The cumulative importance sampling weights are the counts of the table.
 
-    q = dict()
-    c = dict()
+    if log is not None:
+        for batch in log.batches(batch_size, n_episodes):
+            update(batch)
+        return table.to_dicts()
+
+    selector = EpsilonGreedy(env.action_space.n)
+    buffer = EpisodeBuffer()
     for e in range(n_episodes):  # Loop for the given number of episodes to sample
 
         done = False  # Sample an episode based on the given strategy
-        episode_hist = []
-
         curr_obs = env.reset(env.observation_space.sample())
         while not done:
-            if curr_obs not in q:
-                q[curr_obs] = np.zeros(env.action_space.n)
-                c[curr_obs] = np.zeros(env.action_space.n)
-
-            action, prob = behavior_policy(curr_obs, e)
+            curr_state = BLACKJACK_ENCODER.encode(curr_obs)
+            action, prob = behavior_policy(curr_state, e)
             next_obs, r, done, _ = env.step(action)
-            episode_hist.append(((curr_obs, action), prob, r))
+            buffer.append(curr_state, action, r, prob)
             curr_obs = next_obs
+        buffer.end_episode()
 
-        g = 0                   # (state, action) pair in the episode
-        w = 1
-        for (s, a), prob, r in reversed(episode_hist):
-            g = r + gamma * g
-            c[s][a] += w
-            q[s][a] += w / c[s][a] * (g - q[s][a])
-            if a != np.argmax(q[s]):
-                break
-            w *= 1/prob
+        if buffer.n_episodes == batch_size or e + 1 == n_episodes:
+            update(buffer)
+            buffer.clear()
 
-    policy = {state: np.argmax(q[state]) for state in q}
-    v = {state: np.max(q[state]) for state in q}
-    return policy, v, q
+    return table.to_dicts()
 
 
 def main():
@@ -186,9 +211,17 @@ def main():
     Control with Weighted Importance Sampling algorithm. Optionally, plot two figures, one with the optimal target
     policy and another with its state value function.
     """
-    n_episodes, gamma, plot = parse_args()
+    n_episodes, gamma, plot, batch_size, log_dir = parse_args()
     env = BlackjackEnv()
-    final_policy, v, q = off_policy_monte_carlo_wis_control(env, n_episodes, gamma)
+
+    log = None
+    if log_dir is not None:
+        n_actions = env.action_space.n
+        log = open_or_record_episodes(env, BLACKJACK_ENCODER, lambda obs: (np.random.randint(n_actions), 1 / n_actions),
+                                      n_episodes, log_dir, exploring_starts=True,
+                                      metadata={'env': 'Blackjack', 'behavior': 'uniform', 'exploring_starts': True})
+
+    final_policy, v, q = off_policy_monte_carlo_wis_control(env, n_episodes, gamma, batch_size, log)
 
     pp = pprint.PrettyPrinter(indent=2)
     print("Final Target Policy")
@@ -7,6 +7,7 @@ import pprint
 import matplotlib.pyplot as plt
 import matplotlib.animation as an
 from rl_envs.cliff_gridworld import CliffGridWorldEnv
+from rl_utils.action_selection import EpsilonGreedy
 
 
 def check_positive_int(value):
@@ -131,11 +132,12 @@ def plot_cliff_gridworld_results(env, n_episodes, final_policy, info, epsilon, q
     fig3, axes3 = plt.subplots(1, 1)
     axes3.axis('off')
 
+    selector = EpsilonGreedy(env.action_space.n)
     s = env.reset()
     behavior_frames = [env.render('rgb_array')]
     done = False
     while not done:
-        a = eps_greedy_policy(env, epsilon, q, s)
+        a = eps_greedy_policy(selector, epsilon, q, s)
         s, _, done, _ = env.step(a)
         behavior_frames.append(env.render('rgb_array'))
         if env.ep_moves > 100:
@@ -150,18 +152,16 @@ def plot_cliff_gridworld_results(env, n_episodes, final_policy, info, epsilon, q
     plt.show(block=True)
 
 
-def eps_greedy_policy(env, epsilon, q, curr_state):
+def eps_greedy_policy(selector, epsilon, q, curr_state):
     """ The epsilon-greedy policy of the agent.
 
-    :param env: The Windy Gridworld environment
+    :param selector: The epsilon-greedy action selector
     :param epsilon: The epsilon of the epsilon-greedy policy.
     :param q: The state-action value function
     :param curr_state: The current state of the agent
     :return: The action of the agent.
     """
-    prob = np.full(env.action_space.n, epsilon / env.action_space.n)
-    prob[np.argmax(q[curr_state])] += 1 - epsilon
-    return np.random.choice(env.action_space.n, p=prob)
+    return selector.select(q[curr_state], epsilon)
 
 
 def qlearning(env, n_episodes, gamma, epsilon):
@@ -170,7 +170,7 @@ def qlearning(env, n_episodes, gamma, epsilon):
         criteria. The target policy of the algorithm converges to the optimal policy of the agent in the given
         environment.
 
-    :param env: The Windy Gridworld environment
+    :param env: The Cliff Gridworld environment in training mode, whose states are integer indices
     :param n_episodes: The number of episodes to sample for the Q-Learning algorithm based on the behavior policy b.
     :param gamma: The discount factor gamma of the Q-Learning algorithm.
     :param epsilon: The epsilon parameter of the epsilon greedy behavior policy b.
@@ -178,9 +178,12 @@ def qlearning(env, n_episodes, gamma, epsilon):
              regarding the cumulative reward per episode.
     """
 
-    q = dict()
-    n = dict()
+    nS, nA = env.observation_space.n, env.action_space.n
+    q = np.zeros((nS, nA))
+    n = np.zeros((nS, nA))
+    visited = np.zeros(nS, dtype=bool)
     info = {'timesteps': [], 'rewards': []}
+    selector = EpsilonGreedy(nA)
 
     for e in range(n_episodes):
 
@@ -188,27 +191,26 @@ def qlearning(env, n_episodes, gamma, epsilon):
         info['rewards'].append(0)
 
         curr_state = env.reset()
-        if curr_state not in q:
-            q[curr_state] = np.zeros(env.action_space.n)
-            n[curr_state] = np.zeros(env.action_space.n)
+        visited[curr_state] = True
         done = False
 
         while not done:
-            action = eps_greedy_policy(env, epsilon, q, curr_state)
+            action = eps_greedy_policy(selector, epsilon, q, curr_state)
             next_state, reward, done, _ = env.step(action)
-            if next_state not in q:
-                q[next_state] = np.zeros(env.action_space.n)
-                n[next_state] = np.zeros(env.action_space.n)
+            visited[next_state] = True
 
-            alpha = (10 / (n[curr_state][action] + 10))**(2/3)
-            q[curr_state][action] += alpha * (reward + gamma * np.max(q[next_state]) - q[curr_state][action])
+            alpha = (10 / (n[curr_state, action] + 10))**(2/3)
+            q[curr_state, action] += alpha * (reward + gamma * np.max(q[next_state]) - q[curr_state, action])
             curr_state = next_state
 
             info['timesteps'][-1] += 1
             info['rewards'][-1] += reward
 
-    v = {state: np.max(q[state]) for state in q}
-    policy = {state: np.argmax(q[state]) for state in q}
+    # The results are keyed by the (y, x) positions of the visited states.
+    states = np.flatnonzero(visited)
+    v = {env.states[s]: np.max(q[s]) for s in states}
+    policy = {env.states[s]: np.argmax(q[s]) for s in states}
+    q = {env.states[s]: q[s] for s in states}
 
     return policy, v, q, info
 
@@ -221,7 +223,7 @@ def main():
     the optimal trajectory, according to the optimal policy.
     """
     n_episodes, gamma, epsilon, plot = parse_args()
-    env = CliffGridWorldEnv()
+    env = CliffGridWorldEnv(training=True)
     final_target_policy, v, q, info = qlearning(env, n_episodes, gamma, epsilon)
 
     pp = pprint.PrettyPrinter(indent=2)
@@ -235,7 +237,7 @@ def main():
     pp.pprint(q)
 
     if plot:
-        plot_cliff_gridworld_results(env, n_episodes, final_target_policy, info, epsilon, q)
+        plot_cliff_gridworld_results(CliffGridWorldEnv(), n_episodes, final_target_policy, info, epsilon, q)
 
 
 if __name__ == '__main__':
@@ -9,6 +9,10 @@ import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 import seaborn as sns
 from rl_envs.easy21 import Easy21Env
+from rl_utils.tabular import EASY21_ENCODER, QTable
+from rl_utils.action_selection import EpsilonGreedy
+from rl_utils.episode_buffer import EpisodeBuffer, scatter_mean
+from rl_utils.parallel_mc import parallel_mc_control
 from matplotlib import cm
 
 
@@ -43,7 +47,8 @@ def parse_args():
         Parse the arguments given in the command line and return the given or the default values.
 
     :return: The number of episodes to sample, the discount factor of the MC algorithm, the constant n0 of the epsilon
-             parameter and a plot boolean.
+             parameter, a plot boolean, the number of worker processes, the number of episodes per worker between
+             two merges and the number of episodes between two updates of Q.
     """
     parser = argparse.ArgumentParser(add_help=False)
 
@@ -61,11 +66,22 @@ def parse_args():
                         help="Plot and save as easy21_on_policy_mcc_v.jpg the state value function of the optimal "
                              "policy and as easy21_on_policy_mcc_policy.jpg the optimal policy. (DEFAULT=False)")
 
+    parser.add_argument("--n_workers", type=check_positive_int, default=1,
+                        help="The number of worker processes that sample episodes in parallel. (DEFAULT=1)")
+
+    parser.add_argument("--sync_every", type=check_positive_int, default=10000,
+                        help="The number of episodes that each worker samples before its returns are merged with the "
+                             "ones of the other workers. (DEFAULT=10000)")
+
+    parser.add_argument("--batch_size", type=check_positive_int, default=1000,
+                        help="The number of episodes that are sampled between two updates of the Q function. "
+                             "(DEFAULT=1000)")
+
     parser.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
                         help='Show this help message and exit.')
 
     args = parser.parse_args()
-    return args.n_episodes, args.gamma, args.n0, args.plot
+    return args.n_episodes, args.gamma, args.n0, args.plot, args.n_workers, args.sync_every, args.batch_size
 
 
 def plot_easy21_results(n_episodes, policy, v):
@@ -115,66 +131,86 @@ def plot_easy21_results(n_episodes, policy, v):
     plt.show()
 
 
-def eps_greedy_policy(env, q, n, n0, curr_state):
-    """ The epsilon-greedy policy of the agent.
+def eps_greedy_policy(selector, q, curr_state):
+    """ The epsilon-greedy policy of the agent. The ties of the greedy action are broken uniformly at random.
 
-    :param env: The Windy Gridworld environment
-    :param q: The state-action value function
-    :param n: The number of times Q(s,a) has been updated
-    :param n0: A constant to calculate the epsilon parameter of the epsilon greedy policy
-    :param curr_state: The current state of the agent
+    :param selector: The epsilon-greedy action selector, which counts the updates of each state and whose n0 is the
+                     constant of the epsilon parameter of the epsilon greedy policy
+    :param q: The state-action value function as an (nS, nA) array
+    :param curr_state: The current (encoded) state of the agent
     :return: The action of the agent.
     """
-    epsilon = n0 / (n0 + np.sum(n[curr_state]))
-    prob = np.full(env.action_space.n, epsilon / env.action_space.n)
-    max_ind = np.where(q[curr_state] == np.max(q[curr_state]))[0]
-    prob[max_ind] += (1 - epsilon) / len(max_ind)
-    return np.random.choice(env.action_space.n, p=prob)
+    return selector.select_decaying(q[curr_state], curr_state)
 
 
-def on_policy_monte_carlo_control(env, n_episodes, gamma, n0):
+def sample_episode(env, q, buffer, selector):
+    """ Sample an episode with the epsilon-greedy policy of the given state-action value function.
+
+    :param env: The Easy21 environment.
+    :param q: The (encoded) state-action value function
+    :param buffer: The episode buffer, where the steps of the episode are recorded
+    :param selector: The epsilon-greedy action selector, which counts the updates of each (encoded) state
+    """
+    done = False  # Sample an episode based on the given strategy
+    curr_obs = env.reset()
+    while not done:
+        curr_state = EASY21_ENCODER.encode(curr_obs)
+        action = eps_greedy_policy(selector, q, curr_state)
+        next_obs, r, done, _ = env.step(action)
+        buffer.append(curr_state, action, r)
+        curr_obs = next_obs
+    buffer.end_episode()
+
+
+def on_policy_monte_carlo_control(env, n_episodes, gamma, n0, batch_size=1000):
     """ An implementation of the (First-Visit) On-Policy Monte Carlo algorithm. The algorithm estimates the
-        optimal policy for the given environment.
+        optimal policy for the given environment. The episodes are recorded into an episode buffer and the first-visit
+        returns of every batch_size episodes are averaged into Q at once, so the epsilon-greedy policy is updated every
+        batch_size episodes.
 
     :param env: The Easy21 environment.
     :param n_episodes: The number of episodes to sample
     :param gamma: The discount factor of MC
     :param n0: The constant n0 of the epsilon parameter
+    :param batch_size: The number of episodes between two updates of Q
     :return: The final optimal policy, the state value function and the state-action value function
     """
 
-    q = dict()
-    n = dict()
+    table = QTable(EASY21_ENCODER, env.action_space.n)
+    q, n = table.Q, table.N
+    selector = EpsilonGreedy(env.action_space.n, random_ties=True, nS=EASY21_ENCODER.nS, n0=n0)
+    buffer = EpisodeBuffer()
     for e in range(n_episodes):  # Loop for the given number of episodes to sample
+        sample_episode(env, q, buffer, selector)
 
-        done = False  # Sample an episode based on the given strategy
-        episode_hist = []
-        curr_obs = env.reset()
-        while not done:
-            if curr_obs not in q:
-                q[curr_obs] = np.zeros(env.action_space.n)
-                n[curr_obs] = np.zeros(env.action_space.n)
+        if buffer.n_episodes == batch_size or e + 1 == n_episodes:
+            states, actions, returns = buffer.first_visit_returns(gamma)
+            scatter_mean(q, n, (states, actions), returns)
+            selector.count_batch(states)
+            buffer.clear()
 
-            action = eps_greedy_policy(env, q, n, n0, curr_obs)
-            next_obs, r, done, _ = env.step(action)
-            episode_hist.append(((curr_obs, action), r))
-            curr_obs = next_obs
+    print(table.to_dict(n))
+    return table.to_dicts()
 
-        episode_returns = dict()  # Calculate the return for the first visit of a (state, action) pair in the episode
-        g = 0
-        for (s, a), r in reversed(episode_hist):
-            g = r + gamma * g
-            episode_returns[(s, a)] = g
 
-        for (s, a) in episode_returns:
-            n[s][a] += 1
-            alpha = 1.0 / n[s][a]
-            q[s][a] += alpha * (episode_returns[(s, a)] - q[s][a])
+def parallel_on_policy_monte_carlo_control(n_episodes, gamma, n0, n_workers, sync_every, batch_size=1000):
+    """ The On-Policy Monte Carlo algorithm with worker processes, which sample episodes with independent Easy21
+        environments and merge their returns every sync_every episodes.
 
-    print(n)
-    policy = {state: np.argmax(q[state]) for state in q}
-    v = {state: np.max(q[state]) for state in q}
-    return policy, v, q
+    :param n_episodes: The total number of episodes to sample
+    :param gamma: The discount factor of MC
+    :param n0: The constant n0 of the epsilon parameter
+    :param n_workers: The number of worker processes
+    :param sync_every: The number of episodes that each worker samples between two merges
+    :param batch_size: The number of episodes between two updates of the local Q of a worker
+    :return: The final optimal policy, the state value function and the state-action value function
+    """
+    table = QTable(EASY21_ENCODER, Easy21Env().action_space.n)
+    selector = EpsilonGreedy(table.Q.shape[1], random_ties=True, nS=EASY21_ENCODER.nS, n0=n0)
+    table.Q[:], table.N[:] = parallel_mc_control(Easy21Env, sample_episode, (selector,), EASY21_ENCODER.nS,
+                                                 table.Q.shape[1], gamma, n_episodes, n_workers, sync_every,
+                                                 batch_size, selector=selector)
+    return table.to_dicts()
 
 
 def main():
@@ -183,9 +219,13 @@ def main():
         algorithm. Optionally, plot two figures, one with the final state value function and another one with the
         optimal policy.
     """
-    n_episodes, gamma, n0, plot = parse_args()
-    env = Easy21Env()
-    final_policy, v, q = on_policy_monte_carlo_control(env, n_episodes, gamma, n0)
+    n_episodes, gamma, n0, plot, n_workers, sync_every, batch_size = parse_args()
+    if n_workers > 1:
+        final_policy, v, q = parallel_on_policy_monte_carlo_control(n_episodes, gamma, n0, n_workers, sync_every,
+                                                                    batch_size)
+    else:
+        env = Easy21Env()
+        final_policy, v, q = on_policy_monte_carlo_control(env, n_episodes, gamma, n0, batch_size)
 
     pp = pprint.PrettyPrinter(indent=2)
     print("Final Policy")
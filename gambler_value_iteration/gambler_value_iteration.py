@@ -7,6 +7,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as an
 from rl_envs.gambler import GamblerEnv
+from rl_utils.history import HistoryRecorder
 
 
 def check_probability(value):
@@ -22,6 +23,32 @@ def check_probability(value):
     return num
 
 
+def check_goal(value):
+    """ Check if the given string value represents an integer goal capital that is at least 2$.
+        If so, return the integer value. Otherwise, raise an error with an informative message.
+
+    :param value: The command line input string.
+    :return: The integer the input string represents.
+    """
+    num = int(value)
+    if num < 2:
+        raise argparse.ArgumentTypeError("%s is an invalid goal capital (it must be at least 2)" % value)
+    return num
+
+
+def check_positive_int(value):
+    """ Check if the given string value represents α positive integer.
+        If so, return the integer value. Otherwise, raise an error with an informative message.
+
+    :param value: The command line input string.
+    :return: The integer the input string represents.
+    """
+    num = int(value)
+    if num <= 0:
+        raise argparse.ArgumentTypeError("%s is an invalid positive int value" % value)
+    return num
+
+
 def check_positive_float(value):
     """ Check if the given string value represents α positive decimal number.
         If so, return the float value. Otherwise, raise an error with an informative message.
@@ -39,14 +66,20 @@ def parse_args():
     """ Create a help menu with informative messages.
         Parse the arguments given in the command line and return the given or the default values.
 
-    :return: The heads probability of the coin, the discount factor gamma, the sensitivity epsilon and a plot boolean.
+    :return: The heads probabilities of the coin, the goal capital, the discount factors gamma, the sensitivity epsilon,
+             a plot boolean and the history mode and its size.
     """
     parser = argparse.ArgumentParser(add_help=False)
 
-    parser.add_argument("--ph", type=check_probability, default=0.4,
-                        help="The discount factor of the value iteration algorithm. (DEFAULT=0.40)")
+    parser.add_argument("--ph", type=check_probability, nargs='+', default=[0.4],
+                        help="The probability of the coin coming up heads. When several probabilities (or discount "
+                             "factors) are given, all the combinations are solved in one batched value iteration run. "
+                             "(DEFAULT=0.40)")
+
+    parser.add_argument("--goal", type=check_goal, default=100,
+                        help="The capital the gambler wants to reach. (DEFAULT=100)")
 
-    parser.add_argument("--gamma", type=check_positive_float, default=1.0,
+    parser.add_argument("--gamma", type=check_positive_float, nargs='+', default=[1.0],
                         help="The discount factor of the value iteration algorithm. (DEFAULT=1.0)")
 
     parser.add_argument("--epsilon", type=check_positive_float, default=1e-5,
@@ -56,13 +89,24 @@ def parse_args():
     parser.add_argument("--plot", action='store_true',
                         help="Plot and save an animation of the value function for each step of the value iteration "
                              "algorithm (gambler_vi_animation_{ph}.mp4) and an image with the final value function, "
-                             "all the optimal actions and a deterministic optimal policy (gambler_results_{ph}.jpg).")
+                             "all the optimal actions and a deterministic optimal policy (gambler_results_{ph}.jpg). "
+                             "For a batched run, plot and save the final value functions and deterministic optimal "
+                             "policies of all the combinations (gambler_sweep_results.jpg).")
+
+    parser.add_argument("--history", choices=HistoryRecorder.MODES, default=None,
+                        help="How the value function of each iteration is recorded. 'all' keeps every iteration, "
+                             "'stride' every N-th one, 'last' the last N ones, 'disk' streams all of them to "
+                             "gambler_vi_history_{ph}.npy and 'off' keeps only the final one, which is always kept. "
+                             "(DEFAULT=all with --plot, off without it)")
+
+    parser.add_argument("--history-n", type=check_positive_int, default=10,
+                        help="The N of the 'stride' and 'last' history modes. (DEFAULT=10)")
 
     parser.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
                         help='Show this help message and exit.')
 
     args = parser.parse_args()
-    return args.ph, args.gamma, args.epsilon, args.plot
+    return args.ph, args.goal, args.gamma, args.epsilon, args.plot, args.history, args.history_n
 
 
 def plot_gambler_results(env, V_history, opt_policies, dt_opt_policy):
@@ -70,17 +114,20 @@ def plot_gambler_results(env, V_history, opt_policies, dt_opt_policy):
         where the value function progress is animated for each step of the algorithm.
 
     :param env: The Gambler environment
-    :param V_history: A history list that contains the value function for each step of the value iteration algorithm.
+    :param V_history: A history that contains the value function for each (recorded) step of the value iteration
+                      algorithm.
     :param opt_policies: A dictionary containing all the optimal actions (stakes) for all the states (capitals)
     :param dt_opt_policy: A dictionary containing one optimal action (stake) per state (capital). In this policy,
                           the gambler always bets the smallest non-zero amount.
     """
+    iterations = V_history.iterations
 
     INTERVAL = 10     # The milliseconds during which a single frame is displayed
 
     fig1, axes1 = plt.subplots(3, 1, figsize=(8, 12), tight_layout=True)
     fig1.suptitle(f"Gambler's Problem Results\nph = {env.ph:.2f}", fontsize=22)
-    capital = list(range(1, 100))
+    capital = list(range(1, env.goal))
+    xticks = [1, env.goal // 4, env.goal // 2, 3 * env.goal // 4, env.goal - 1]
     ve = [V_history[-1][s] for s in capital]
     dt_action = [dt_opt_policy[s] for s in capital]
     opt_policies_capital, opt_policies_actions = zip(*[(s, a) for s in capital for a in opt_policies[s]])
@@ -88,23 +135,23 @@ def plot_gambler_results(env, V_history, opt_policies, dt_opt_policy):
     axes1[0].plot(capital, ve)
     axes1[0].set_xlabel('Capital', fontsize=18)
     axes1[0].set_ylabel('Value Function', fontsize=18)
-    axes1[0].set_xticks([1, 25, 50, 75, 99])
-    axes1[0].set_xlim(0, 100)
+    axes1[0].set_xticks(xticks)
+    axes1[0].set_xlim(0, env.goal)
     axes1[0].set_ylim(0.0, 1.0)
 
     axes1[1].scatter(capital, dt_action)
     axes1[1].set_xlabel('Capital', fontsize=18)
     axes1[1].set_ylabel('A Deterministic Final Policy\n(Stake)', fontsize=18)
-    axes1[1].set_xticks([1, 25, 50, 75, 99])
-    axes1[1].set_xlim(0, 100)
-    axes1[1].set_ylim(-1, 51)
+    axes1[1].set_xticks(xticks)
+    axes1[1].set_xlim(0, env.goal)
+    axes1[1].set_ylim(-1, env.goal // 2 + 1)
 
     axes1[2].scatter(opt_policies_capital, opt_policies_actions)
     axes1[2].set_xlabel('Capital', fontsize=18)
     axes1[2].set_ylabel('Optimal Policies\n(Possible Stakes)', fontsize=18)
-    axes1[2].set_xticks([1, 25, 50, 75, 99])
-    axes1[2].set_xlim(0, 100)
-    axes1[2].set_ylim(-1, 51)
+    axes1[2].set_xticks(xticks)
+    axes1[2].set_xlim(0, env.goal)
+    axes1[2].set_ylim(-1, env.goal // 2 + 1)
 
     for ax in axes1:
         ax.tick_params(labelsize=16)
@@ -113,15 +160,15 @@ def plot_gambler_results(env, V_history, opt_policies, dt_opt_policy):
     fig2.suptitle(f'Value Iteration (ph = {env.ph:.2f})\nIteration: ', fontsize=22)
 
     def update(frame):
-        fig2.suptitle(f'Value Iteration\nph = {env.ph:.2f}\nIteration: {frame}', fontsize=22)
+        fig2.suptitle(f'Value Iteration\nph = {env.ph:.2f}\nIteration: {iterations[frame]}', fontsize=22)
         ve = [V_history[frame][s] for s in capital]
 
         ax2.cla()
         ax2.plot(capital, ve)
         ax2.set_xlabel('Capital', fontsize=18)
         ax2.set_ylabel('Value Function', fontsize=18)
-        ax2.set_xticks([1, 25, 50, 75, 99])
-        ax2.set_xlim(0, 100)
+        ax2.set_xticks(xticks)
+        ax2.set_xlim(0, env.goal)
         ax2.set_ylim(0.0, 1.0)
 
     anim = an.FuncAnimation(fig=fig2, func=update, frames=len(V_history), repeat=False, interval=INTERVAL)
@@ -131,55 +178,157 @@ def plot_gambler_results(env, V_history, opt_policies, dt_opt_policy):
     plt.show()
 
 
-def value_iteration(env, gamma, eps):
+def plot_gambler_sweep_results(goal, settings, V, dt_opt_policies):
+    """ Plot and save a figure with the final value function and a deterministic optimal policy for each (ph, gamma)
+        combination of a batched value iteration run.
+
+    :param goal: The goal capital of the Gambler environment
+    :param settings: A list with the (ph, gamma) combinations
+    :param V: A (K, nS) array with the final state value function of each combination
+    :param dt_opt_policies: A list with a deterministic optimal policy (dictionary) for each combination
+    """
+    fig, axes = plt.subplots(2, 1, figsize=(8, 10), tight_layout=True)
+    fig.suptitle("Gambler's Problem Results", fontsize=22)
+    capital = list(range(1, goal))
+    xticks = [1, goal // 4, goal // 2, 3 * goal // 4, goal - 1]
+
+    for (ph, gamma), v, dt_opt_policy in zip(settings, V, dt_opt_policies):
+        label = f'ph = {ph:.2f}, gamma = {gamma:.2f}'
+        axes[0].plot(capital, v[1:goal], label=label)
+        axes[1].scatter(capital, [dt_opt_policy[s] for s in capital], s=8, label=label)
+
+    axes[0].set_ylabel('Value Function', fontsize=18)
+    axes[0].set_ylim(0.0, 1.0)
+    axes[1].set_ylabel('A Deterministic Final Policy\n(Stake)', fontsize=18)
+    axes[1].set_ylim(-1, goal // 2 + 1)
+    for ax in axes:
+        ax.set_xlabel('Capital', fontsize=18)
+        ax.set_xticks(xticks)
+        ax.set_xlim(0, goal)
+        ax.tick_params(labelsize=16)
+        ax.legend()
+
+    fig.savefig('gambler_sweep_results.jpg')
+    plt.show()
+
+
+def value_iteration(env, gamma, eps, V_history=None):
     """ The value iteration algorithm. The algorithm is used to find the optimal policy for the given environment and
-        its corresponding state value function.
+        its corresponding state value function. Each sweep iterates over the stakes and backs up all the capitals that
+        can place a stake at once, because their winning and losing capitals are contiguous slices of V.
 
     :param env: The Gambler's environment
     :param gamma: The discount factor for the value iteration algorithm
     :param eps: The sensitivity factor for the termination of the value iteration algorithm
-    :return: A history list that contains the state value function for each step of the value iteration and the
+    :param V_history: The history recorder of the state value functions (DEFAULT=a recorder that keeps all of them)
+    :return: A history that contains the state value function for each step of the value iteration and the
              corresponding optimal policies.
     """
 
     V = np.zeros(env.nS)
-    V_history = [V]
+    V_history = HistoryRecorder() if V_history is None else V_history
+    V_history.append(V)
     diff = np.inf
 
     while diff > eps:
-        Q = np.zeros((env.nS, env.nA))
-        for state in range(env.nS):
-            for action in range(env.nA):
-                if env.P[state][action]:
-                    for probability, nextstate, reward, _ in env.P[state][action]:
-                        Q[state, action] += probability * (reward + gamma * V[nextstate])
-                else:
-                    Q[state, action] = -np.inf
-
-        V_upd = np.max(Q, axis=1)
+        V_upd = env.greedy_backup(V, gamma)
         diff = np.max(np.abs(V_upd - V))
-        V = V_upd
+        V_prev, V = V, V_upd
         V_history.append(V)
+    V_history.close()
 
-    opt_policies = {state: [action for action in range(env.nA) if abs(Q[state, action] - V[state]) <= eps]
-                    for state in range(env.nS)}
+    # The optimal actions are the ones whose value (in the last sweep) is eps-close to the value of the capital.
+    opt_policies = {state: [] for state in range(env.nS)}
+    for action in range(np.max(env.max_stakes) + 1):
+        start, q = env.stake_values(V_prev, gamma, action)
+        for state in start + np.nonzero(np.abs(q - V[start:start + q.size]) <= eps)[0]:
+            opt_policies[state.item()].append(action)
 
     return V_history, opt_policies
 
 
+def batched_value_iteration(goal, settings, eps):
+    """ Solve several variants of the Gambler's problem, one per (ph, gamma) combination, in one batched value iteration
+        run. Each sweep backs up the value functions of all the variants that have not converged yet.
+
+    :param goal: The goal capital of the Gambler environment
+    :param settings: A list with K (ph, gamma) combinations
+    :param eps: The sensitivity factor for the termination of the value iteration algorithm
+    :return: A (K, nS) array with the state value function of each variant, a list with the optimal policies of each
+             variant and the number of sweeps each variant needed.
+    """
+    env = GamblerEnv(settings[0][0], goal)
+    ph = np.array([[p] for p, _ in settings])
+    gamma = np.array([[g] for _, g in settings])
+
+    V = np.zeros((len(settings), env.nS))
+    V_prev = V.copy()
+    n_sweeps = np.zeros(len(settings), dtype=int)
+    active = np.ones(len(settings), dtype=bool)        # The variants that have not converged yet.
+
+    while np.any(active):
+        V_upd = env.greedy_backup(V[active], gamma[active], ph[active])
+        diff = np.max(np.abs(V_upd - V[active]), axis=1)
+        V_prev[active] = V[active]
+        V[active] = V_upd
+        n_sweeps[active] += 1
+        active[active] = diff > eps
+
+    # The optimal actions are the ones whose value (in the last sweep) is eps-close to the value of the capital.
+    opt_policies = [{state: [] for state in range(env.nS)} for _ in settings]
+    for action in range(np.max(env.max_stakes) + 1):
+        start, q = env.stake_values(V_prev, gamma, action, ph)
+        for k, i in zip(*np.nonzero(np.abs(q - V[:, start:start + q.shape[1]]) <= eps)):
+            opt_policies[k][start + i.item()].append(action)
+
+    return V, opt_policies, n_sweeps
+
+
+def deterministic_policy(opt_policies):
+    """ Select one optimal action per state. The gambler always bets the smallest non-zero amount.
+
+    :param opt_policies: A dictionary containing all the optimal actions (stakes) for all the states (capitals)
+    :return: A dictionary containing one optimal action (stake) per state (capital)
+    """
+    return {state: opt_policies[state][1] if len(opt_policies[state]) >= 2 else opt_policies[state][0]
+            for state in opt_policies.keys()}
+
+
 def main():
     """
     Create a Gambler environment based on the command line arguments and find the optimal policies for this
     environment. Optionally, plot an animation demonstrating the progress of the value iteration algorithm and an
     image with the final value function, the optimal actions per state and an optimal deterministic policy.
     """
-    ph, gamma, eps, plot = parse_args()
-    env = GamblerEnv(ph)
-    V_history, opt_policies = value_iteration(env, gamma, eps)
-    dt_opt_policy = {state: opt_policies[state][1] if len(opt_policies[state]) >= 2 else opt_policies[state][0]
-                     for state in opt_policies.keys()}  # The gambler always bets the smallest non-zero amount
-    print(len(V_history))
+    phs, goal, gammas, eps, plot, history, history_n = parse_args()
+    settings = [(ph, gamma) for ph in phs for gamma in gammas]
     pp = pprint.PrettyPrinter(indent=2)
+
+    if len(settings) > 1:
+        V, opt_policies, n_sweeps = batched_value_iteration(goal, settings, eps)
+        dt_opt_policies = [deterministic_policy(policies) for policies in opt_policies]
+        for (ph, gamma), v, policies, dt_opt_policy, n in zip(settings, V, opt_policies, dt_opt_policies, n_sweeps):
+            print(f"ph = {ph:.2f}, gamma = {gamma:.2f} ({n} sweeps)")
+            print("Optimal Policies")
+            pp.pprint(policies)
+
+            print("\nA Deterministic Optimal Policy")
+            pp.pprint(dt_opt_policy)
+
+            print("\nState Value Function")
+            pp.pprint(v)
+            print()
+
+        if plot:
+            plot_gambler_sweep_results(goal, settings, V, dt_opt_policies)
+        return
+
+    (ph, gamma), = settings
+    env = GamblerEnv(ph, goal)
+    V_history = HistoryRecorder(history or ('all' if plot else 'off'), history_n, f'gambler_vi_history_{ph:.2f}.npy')
+    V_history, opt_policies = value_iteration(env, gamma, eps, V_history)
+    dt_opt_policy = deterministic_policy(opt_policies)
+    print(V_history.count)
     print("Optimal Policies")
     pp.pprint(opt_policies)
 
@@ -7,6 +7,9 @@ import matplotlib.pyplot as plt
 import matplotlib.animation as an
 import seaborn as sns
 from rl_envs.gridworld import GridWorldEnv
+from rl_envs.compiled_model import compile_model
+from rl_utils import bellman
+from rl_utils.history import HistoryRecorder
 
 
 def check_positive_int(value):
@@ -39,7 +42,8 @@ def parse_args():
     """ Create a help menu with informative messages.
         Parse the arguments given in the command line and return the given or the default values.
 
-    :return: The height and width of the grid, the discount factor gamma, the sensitivity epsilon, a plot boolean.
+    :return: The height and width of the grid, the discount factor gamma, the sensitivity epsilon, a plot boolean and
+             the history mode and its size.
     """
     parser = argparse.ArgumentParser(add_help=False)
 
@@ -60,11 +64,20 @@ def parse_args():
                         help="Plot and save (as gridworld_ipe_animation.gif) the results of the iterative \
                         policy evaluation algorithm per iteration. (DEFAULT=False)")
 
+    parser.add_argument("--history", choices=HistoryRecorder.MODES, default=None,
+                        help="How the value function of each iteration is recorded. 'all' keeps every iteration, "
+                             "'stride' every N-th one, 'last' the last N ones, 'disk' streams all of them to "
+                             "gridworld_ipe_history.npy and 'off' keeps only the final one, which is always kept. "
+                             "(DEFAULT=all with --plot, off without it)")
+
+    parser.add_argument("--history-n", type=check_positive_int, default=10,
+                        help="The N of the 'stride' and 'last' history modes. (DEFAULT=10)")
+
     parser.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
                         help='Show this help message and exit.')
 
     args = parser.parse_args()
-    return args.height, args.width, args.gamma, args.epsilon, args.plot
+    return args.height, args.width, args.gamma, args.epsilon, args.plot, args.history, args.history_n
 
 
 def policy_eval_animation(env, V_history):
@@ -74,6 +87,7 @@ def policy_eval_animation(env, V_history):
     :param env: The GridWorld environment.
     :param V_history: The history of the iterative policy evaluation algorithms.
     """
+    iterations = V_history.iterations
 
     INTERVAL = 1000
 
@@ -89,7 +103,7 @@ def policy_eval_animation(env, V_history):
     def update(frame):
         V = V_history[frame].reshape(env.height, env.width)
         ax.cla()
-        fig.suptitle(f"Iterative Policy Evaluation\nIteration: {frame}")
+        fig.suptitle(f"Iterative Policy Evaluation\nIteration: {iterations[frame]}")
         sns.heatmap(ax=ax, data=colors, annot=V, vmin=0.0, vmax=1.0, cmap='Greys', cbar=False, linewidths=1, linecolor='black',
                            annot_kws={'fontsize': 22}, fmt='.2f')
 
@@ -98,33 +112,19 @@ def policy_eval_animation(env, V_history):
     plt.show()
 
 
-def iterative_policy_evaluation(env, policy, gamma, eps):
+def iterative_policy_evaluation(env, policy, gamma, eps, V_history=None):
     """ The iterative policy evaluation algorithm.
 
     :param env: The GridWorld environment
     :param policy: The policy to be evaluated
     :param gamma: The discount factor
     :param eps: The sensitivity factor for the termination of the algorithm
-    :return: The list V_history containing the values of the environment's states for each step of the algorithm.
+    :param V_history: The history recorder of the state value functions (DEFAULT=a recorder that keeps all of them)
+    :return: The history V_history containing the values of the environment's states for each step of the algorithm.
     """
 
-    V_history = []
-
-    diff = 100
-    V = np.zeros(env.nS)
-    V_history.append(V)
-    while diff > eps:
-        V_upd = np.zeros_like(V)
-        for state in range(env.nS):
-            for action in policy[state].keys():
-                for (probability, nextstate, reward, _) in env.P[state][action]:
-                    V_upd[state] += policy[state][action] * probability * (reward + gamma * V[nextstate])
-
-        diff = np.max(np.abs(V_upd - V))
-        V = V_upd
-        V_history.append(V)
-
-    return V_history
+    model = compile_model(env)
+    return bellman.policy_evaluation(model, bellman.policy_matrix(model, policy), gamma, eps, V_history)
 
 
 def main():
@@ -132,10 +132,11 @@ def main():
         environment. Optionally, plot an animation demonstrating the progress of the iterative policy evaluation
         algorithm.
     """
-    height, width, gamma, epsilon, plot = parse_args()
+    height, width, gamma, epsilon, plot, history, history_n = parse_args()
     env = GridWorldEnv(height, width)
     random_policy = {state: {action: 1.0/env.nA for action in range(env.nA)} for state in range(env.nS)}
-    V_history = iterative_policy_evaluation(env, random_policy, gamma, epsilon)
+    V_history = HistoryRecorder(history or ('all' if plot else 'off'), history_n, 'gridworld_ipe_history.npy')
+    V_history = iterative_policy_evaluation(env, random_policy, gamma, epsilon, V_history)
     V = V_history[-1].reshape(height, width)
     print(V)
 
@@ -8,6 +8,10 @@ import matplotlib.pyplot as plt
 import matplotlib.animation as an
 import seaborn as sns
 from rl_envs.gridworld import GridWorldEnv
+from rl_envs.compiled_model import compile_model
+from rl_utils import bellman
+from rl_utils import linear_evaluation
+from rl_utils.history import HistoryRecorder
 
 
 def check_positive_int(value):
@@ -40,7 +44,9 @@ def parse_args():
     """ Create a help menu with informative messages.
         Parse the arguments given in the command line and return the given or the default values.
 
-    :return: The height and width of the grid, the discount factor gamma, the sensitivity epsilon, a plot boolean.
+    :return: The height and width of the grid, the discount factor gamma, the sensitivity epsilon, the policy
+             evaluation method, the number of evaluation sweeps of modified policy iteration, a plot boolean and the
+             history mode and its size.
     """
     parser = argparse.ArgumentParser(add_help=False)
 
@@ -57,15 +63,36 @@ def parse_args():
                         help="The iterative policy evaluation algorithm terminates once the value \
                               function change is less than epsilon for all states. (DEFAULT=1e-5)")
 
+    parser.add_argument("--evaluation", choices=['iterative', 'direct', 'gmres'], default='iterative',
+                        help="The policy evaluation method. 'iterative' sweeps until the value function changes less "
+                             "than epsilon, 'direct' and 'gmres' solve the linear Bellman expectation equations "
+                             "exactly, with a sparse LU factorization or with the GMRES Krylov solver. "
+                             "(DEFAULT=iterative)")
+
+    parser.add_argument("--sweeps", type=check_positive_int, default=None,
+                        help="Use modified policy iteration, which evaluates each policy with at most this number of "
+                             "sweeps, starting from the value function of the previous policy. The evaluation method "
+                             "is ignored. (DEFAULT=None, the policies are evaluated fully)")
+
     parser.add_argument("--plot", action='store_true',
                         help="Plot and save (as gridworld_pi_animation.gif) the policy that is selected greedily and \
                               its value function for every step of the policy iteration algorithm. (DEFAULT=False)")
 
+    parser.add_argument("--history", choices=HistoryRecorder.MODES, default=None,
+                        help="How the policy and the value function of each step are recorded. 'all' keeps every "
+                             "step, 'stride' every N-th one, 'last' the last N ones, 'disk' streams all of them to "
+                             "gridworld_pi_policy_history.npy and gridworld_pi_history.npy and 'off' keeps only the "
+                             "final one, which is always kept. (DEFAULT=all with --plot, off without it)")
+
+    parser.add_argument("--history-n", type=check_positive_int, default=10,
+                        help="The N of the 'stride' and 'last' history modes. (DEFAULT=10)")
+
     parser.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
                         help='Show this help message and exit.')
 
     args = parser.parse_args()
-    return args.height, args.width, args.gamma, args.epsilon, args.plot
+    return (args.height, args.width, args.gamma, args.epsilon, args.evaluation, args.sweeps, args.plot, args.history,
+            args.history_n)
 
 
 def policy_to_annot(env, policy):
@@ -74,7 +101,7 @@ def policy_to_annot(env, policy):
         during the first step of policy iteration), the character '?' is used.
 
     :param env: The GridWorld environment
-    :param policy: A 2-level dictionary with (state, action) as key and a probability as the value
+    :param policy: A (nS,) integer array with the action of each state, which is -1 for the stochastic states
     :return: A grid that visualizes the selected policy
     """
     annot = [[None for _ in range(env.width)] for _ in range(env.height)]
@@ -84,10 +111,10 @@ def policy_to_annot(env, policy):
                 annot[y][x] = ''
             else:
                 state = env.coords_to_state((y, x))
-                if len(policy[state]) > 2:
+                action = policy[state]
+                if action == -1:
                     annot[y][x] = '?'
                 else:
-                    action = list(policy[state].keys())[0]
                     if action == GridWorldEnv.UP:
                         annot[y][x] = 'U'
                     elif action == GridWorldEnv.DOWN:
@@ -99,18 +126,19 @@ def policy_to_annot(env, policy):
     return annot
 
 
-def policy_iteration_animation(env, H):
+def policy_iteration_animation(env, policy_history, V_history):
     """ Create an animation plot that demonstrates how the policy iteration algorithm progresses in the given
         GridWorld environment. Two subplots are animated, one for the policy of the current step and another for its
         value function.
 
     :param env: The GridWorld environment
-    :param H: A history list that contains a policy and its value function for each step of the policy iteration algorithm.
+    :param policy_history: A history that contains the policy of each (recorded) step of the policy iteration algorithm.
+    :param V_history: A history that contains the value function of each (recorded) step of the algorithm.
     """
 
     INTERVAL = 5000
 
-    policy_history, V_history = zip(*H)
+    iterations = V_history.iterations
 
     fig, axes = plt.subplots(1, 2, figsize=(30, 8))
     axes[0].tick_params(left=False, bottom=False)
@@ -132,14 +160,14 @@ def policy_iteration_animation(env, H):
     def update_value_func(step):
         V = V_history[step].reshape(env.height, env.width)
         axes[1].cla()
-        axes[1].set_title(f"Value Function\nIteration: {step}")
+        axes[1].set_title(f"Value Function\nIteration: {iterations[step]}")
         sns.heatmap(ax=axes[1], data=colors, annot=V, vmin=0.0, vmax=1.0, cmap='Greys', cbar=False, linewidths=1,
                     linecolor='black', annot_kws={'fontsize': 12}, fmt='.1f')
 
     def update_policy(step):
         policy = policy_history[step]
         axes[0].cla()
-        axes[0].set_title(f"Policy\nIteration: {step}")
+        axes[0].set_title(f"Policy\nIteration: {iterations[step]}")
         sns.heatmap(ax=axes[0], data=colors, annot=policy_to_annot(env, policy), vmin=0.0, vmax=1.0, cmap='Greys',
                     cbar=False, linewidths=1, linecolor='black', annot_kws={'fontsize': 22}, fmt='')
 
@@ -147,7 +175,7 @@ def policy_iteration_animation(env, H):
         update_value_func(frame)
         update_policy(frame)
 
-    anim = an.FuncAnimation(fig=fig, func=update, frames=len(H), repeat=False, interval=INTERVAL)
+    anim = an.FuncAnimation(fig=fig, func=update, frames=len(V_history), repeat=False, interval=INTERVAL)
     anim.save('gridworld_pi_animation.gif', writer='imagemagick', fps=1000 / INTERVAL)
     plt.show()
 
@@ -162,67 +190,135 @@ def iterative_policy_evaluation(env, policy, gamma, eps):
     :return: The state value function V and the action value function Q for the given environment and the given policy.
     """
 
-    diff = 100
-    V = np.zeros(env.nS)
+    model = compile_model(env)
+    V = bellman.policy_evaluation(model, bellman.policy_matrix(model, policy), gamma, eps, HistoryRecorder('off'))[-1]
+    Q = bellman.q_values(model, V, gamma)
 
-    while diff > eps:
-        V_upd = np.zeros_like(V)
-        for state in range(env.nS):
-            for action in policy[state].keys():
-                for (probability, nextstate, reward, _) in env.P[state][action]:
-                    V_upd[state] += policy[state][action] * probability * (reward + gamma * V[nextstate])
+    return V, Q
 
-        diff = np.max(np.abs(V_upd - V))
-        V = V_upd
 
-    Q = np.zeros((env.nS, env.nA))
-    for state in range(env.nS):
-        for action in range(env.nA):
-            for (probability, nextstate, reward, _) in env.P[state][action]:
-                Q[state, action] += probability * (reward + gamma * V[nextstate])
+def linear_policy_evaluation(env, policy, gamma, method):
+    """ Evaluate a given policy exactly, by solving the linear system (I - gamma * P_pi) V = r_pi of its Bellman
+        expectation equations. The terminal states are absorbing and their value is 0.0.
+
+    :param env: The GridWorld environment
+    :param policy: The policy to be evaluated
+    :param gamma: The discount factor
+    :param method: The linear solver, 'direct' or 'gmres'
+    :return: The state value function V and the action value function Q for the given environment and the given policy.
+    """
+
+    model = compile_model(env)
+    V = linear_evaluation.solve_policy_evaluation(model, bellman.policy_matrix(model, policy), gamma, method)
+    Q = bellman.q_values(model, V, gamma)
 
     return V, Q
 
 
-def policy_iteration(env, gamma, eps):
+def evaluate_policy(env, policy, gamma, eps, evaluation):
+    """ Evaluate a given policy with the selected policy evaluation method.
+
+    :param env: The GridWorld environment
+    :param policy: The policy to be evaluated
+    :param gamma: The discount factor
+    :param eps: The sensitivity factor for the termination of the iterative policy evaluation algorithm
+    :param evaluation: The policy evaluation method, 'iterative', 'direct' or 'gmres'
+    :return: The state value function V and the action value function Q for the given environment and the given policy.
+    """
+    if evaluation == 'iterative':
+        return iterative_policy_evaluation(env, policy, gamma, eps)
+    return linear_policy_evaluation(env, policy, gamma, evaluation)
+
+
+def actions_to_policy(actions):
+    """ Convert an integer array with the action of each state to the 2-level dictionary format of a policy.
+
+    :param actions: A (nS,) integer array with the action of each state
+    :return: A 2-level dictionary with (state, action) as key and a probability as the value
+    """
+    return {state: {action: 1.0} for state, action in enumerate(actions.tolist())}
+
+
+def policy_iteration(env, gamma, eps, evaluation='iterative', policy_history=None, V_history=None):
     """ The policy iteration algorithm. The algorithm is used to find the optimal policy for the given environment.
         At each step of the algorithm a policy is first evaluated using the iterative policy evaluation algorithm and
-        then it is improved in a greedy way.
+        then it is improved in a greedy way. The algorithm terminates once the greedy actions stop changing. The
+        action of the previous policy is kept when it is within eps of the best one, so ties do not change the policy.
 
     :param env: The GridWorld environment
     :param gamma: The discount factor for the iterative policy evaluation algorithm
     :param eps: The sensitivity factor for the termination of the iterative policy evaluation algorithm
-    :return: A history list that contains a policy and its value function for each step of the policy iteration algorithm.
+    :param evaluation: The policy evaluation method, 'iterative', 'direct' or 'gmres'
+    :param policy_history: The history recorder of the policies (DEFAULT=a recorder that keeps all of them)
+    :param V_history: The history recorder of the state value functions (DEFAULT=a recorder that keeps all of them)
+    :return: The histories of the policy (as integer actions, -1 for the stochastic states) and of its value function
+             for each step of the policy iteration algorithm.
     """
 
-    H = []
+    policy_history = HistoryRecorder() if policy_history is None else policy_history
+    V_history = HistoryRecorder() if V_history is None else V_history
+    model = compile_model(env)
 
     policy = {state: {action: 1.0/env.nA for action in range(env.nA)} for state in range(env.nS)}
-    V, Q = iterative_policy_evaluation(env, policy, gamma, eps)
+    V, Q = evaluate_policy(env, policy, gamma, eps, evaluation)
+    actions = None
+
+    while True:
+        if actions is None:
+            policy_history.append(bellman.policy_actions(bellman.policy_matrix(model, policy)))
+        else:
+            policy_history.append(actions)
+        V_history.append(V)
+
+        new_actions = bellman.greedy_policy(model, Q, actions, eps)
+        if actions is not None and np.array_equal(new_actions, actions):
+            break
+        actions = new_actions
+        policy = actions_to_policy(actions)
+        V, Q = evaluate_policy(env, policy, gamma, eps, evaluation)
 
-    prev_tot_value = -np.inf
-    curr_tot_value = np.sum(V)
+    policy_history.close()
+    V_history.close()
+    return policy_history, V_history
 
-    while curr_tot_value > prev_tot_value:
-        H.append((policy, V))
 
-        policy = {state: {np.argmax(Q[state]).item(): 1.0} for state in range(env.nS)}
-        V, Q = iterative_policy_evaluation(env, policy, gamma, eps)
+def modified_policy_iteration(env, gamma, eps, n_sweeps, policy_history=None, V_history=None):
+    """ The modified policy iteration algorithm. Each policy is evaluated with at most n_sweeps sweeps, which start
+        from the value function of the previous policy, and then it is improved in a greedy way. The algorithm
+        terminates once the greedy actions stop changing and the evaluation of the policy has converged.
 
-        prev_tot_value = curr_tot_value
-        curr_tot_value = np.sum(V)
+    :param env: The GridWorld environment
+    :param gamma: The discount factor
+    :param eps: The sensitivity factor for the termination of the policy evaluation
+    :param n_sweeps: The maximum number of evaluation sweeps per policy
+    :param policy_history: The history recorder of the policies (DEFAULT=a recorder that keeps all of them)
+    :param V_history: The history recorder of the state value functions (DEFAULT=a recorder that keeps all of them)
+    :return: The histories of the policy (as integer actions, -1 for the stochastic states) and of its value function
+             for each step of the algorithm.
+    """
 
-    return H
+    model = compile_model(env)
+    pi = np.full((env.nS, env.nA), 1.0 / env.nA)
+    policy_history, V_history, _ = bellman.modified_policy_iteration(model, pi, gamma, n_sweeps, eps,
+                                                                     policy_history=policy_history, V_history=V_history)
+    return policy_history, V_history
 
 
 def main():
     """ Create a GridWorld environment based on the command line arguments and find the optimal policy for this
         environment. Optionally, plot an animation demonstrating the progress of the policy iteration algorithm.
     """
-    height, width, gamma, epsilon, plot = parse_args()
+    height, width, gamma, epsilon, evaluation, n_sweeps, plot, history, history_n = parse_args()
     env = GridWorldEnv(height, width)
-    H = policy_iteration(env, gamma, epsilon)
-    opt_policy, V = H[-1]
+    history = history or ('all' if plot else 'off')
+    policy_history = HistoryRecorder(history, history_n, 'gridworld_pi_policy_history.npy')
+    V_history = HistoryRecorder(history, history_n, 'gridworld_pi_history.npy')
+    if n_sweeps is None:
+        policy_history, V_history = policy_iteration(env, gamma, epsilon, evaluation, policy_history, V_history)
+    else:
+        policy_history, V_history = modified_policy_iteration(env, gamma, epsilon, n_sweeps, policy_history,
+                                                              V_history)
+    opt_policy, V = policy_history[-1], V_history[-1]
 
     pp = pprint.PrettyPrinter(indent=2, width=env.width * 7, compact=True)
     print("Optimal Policy")
@@ -232,7 +328,7 @@ def main():
     pp.pprint(V.reshape(height, width).tolist())
 
     if plot:
-        policy_iteration_animation(env, H)
+        policy_iteration_animation(env, policy_history, V_history)
 
 
 if __name__ == '__main__':
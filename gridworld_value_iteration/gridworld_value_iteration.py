@@ -8,6 +8,7 @@ import matplotlib.pyplot as plt
 import matplotlib.animation as an
 import seaborn as sns
 from rl_envs.gridworld import GridWorldEnv
+from rl_utils.history import HistoryRecorder
 
 
 def check_positive_int(value):
@@ -40,7 +41,8 @@ def parse_args():
     """ Create a help menu with informative messages.
         Parse the arguments given in the command line and return the given or the default values.
 
-    :return: The height and width of the grid, the discount factor gamma, the sensitivity epsilon, a plot boolean.
+    :return: The height and width of the grid, the discount factors gamma, the sensitivity epsilon, a plot boolean and
+             the history mode and its size.
     """
     parser = argparse.ArgumentParser(add_help=False)
 
@@ -50,8 +52,9 @@ def parse_args():
     parser.add_argument("--width", type=check_positive_int, default=4,
                         help="The width of the grid. (DEFAULT=4)")
 
-    parser.add_argument("--gamma", type=check_positive_float, default=1.0,
-                        help="The discount factor of the value iteration algorithm. (DEFAULT=1.0)")
+    parser.add_argument("--gamma", type=check_positive_float, nargs='+', default=[1.0],
+                        help="The discount factor of the value iteration algorithm. When several discount factors are "
+                             "given, all of them are solved in one batched value iteration run. (DEFAULT=1.0)")
 
     parser.add_argument("--epsilon", type=check_positive_float, default=1e-5,
                         help="The value iteration algorithm terminates once the value \
@@ -60,13 +63,22 @@ def parse_args():
     parser.add_argument("--plot", action='store_true',
                         help="Plot and save an animation (gridworld_vi_animation.gif) of the value function for each "
                              "step of the value iteration algorithm and an image (gridworld_vi_policy.jpg) with the "
-                             "optimal policy")
+                             "optimal policy. It is ignored for a batched run.")
+
+    parser.add_argument("--history", choices=HistoryRecorder.MODES, default=None,
+                        help="How the value function of each iteration is recorded. 'all' keeps every iteration, "
+                             "'stride' every N-th one, 'last' the last N ones, 'disk' streams all of them to "
+                             "gridworld_vi_history.npy and 'off' keeps only the final one, which is always kept. "
+                             "(DEFAULT=all with --plot, off without it)")
+
+    parser.add_argument("--history-n", type=check_positive_int, default=10,
+                        help="The N of the 'stride' and 'last' history modes. (DEFAULT=10)")
 
     parser.add_argument('-h', '--help', action='help', default=argparse.SUPPRESS,
                         help='Show this help message and exit.')
 
     args = parser.parse_args()
-    return args.height, args.width, args.gamma, args.epsilon, args.plot
+    return args.height, args.width, args.gamma, args.epsilon, args.plot, args.history, args.history_n
 
 
 def policy_to_annot(env, policy):
@@ -102,9 +114,11 @@ def value_iteration_animation(env, V_history, opt_policy):
         step of the algorithm. In the second one, the optimal policy is plotted for each non-terminal state.
 
     :param env: The GridWorld environment
-    :param V_history: A history list that contains the value function for each step of the value iteration algorithm.
+    :param V_history: A history that contains the value function for each (recorded) step of the value iteration
+                      algorithm.
     :param opt_policy: A grid-like 2D-nested list containing the optimal action for each state.
     """
+    iterations = V_history.iterations
 
     INTERVAL = 1000
 
@@ -130,7 +144,7 @@ def value_iteration_animation(env, V_history, opt_policy):
                     linecolor='black')
 
     def update(frame):
-        fig1.suptitle(f'Value Iteration\nIteration: {frame}')
+        fig1.suptitle(f'Value Iteration\nIteration: {iterations[frame]}')
         V = V_history[frame].reshape(env.height, env.width)
         ax1.cla()
         sns.heatmap(ax=ax1, data=colors, annot=V, vmin=0.0, vmax=1.0, cmap='Greys', cbar=False, linewidths=1,
@@ -142,49 +156,95 @@ def value_iteration_animation(env, V_history, opt_policy):
     plt.show()
 
 
-def value_iteration(env, gamma, eps):
+def value_iteration(env, gamma, eps, V_history=None):
     """ The value iteration algorithm. The algorithm is used to find the optimal policy for the given environment and
         its corresponding state value function.
 
     :param env: The GridWorld environment
     :param gamma: The discount factor for the value iteration algorithm
     :param eps: The sensitivity factor for the termination of the value iteration algorithm
-    :return: A history list that contains the state value function for each step of the value iteration algorithm and
+    :param V_history: The history recorder of the state value functions (DEFAULT=a recorder that keeps all of them)
+    :return: A history that contains the state value function for each step of the value iteration algorithm and
              the optimal policy.
     """
 
     V = np.zeros(env.nS)
-    V_history = [V]
+    V_history = HistoryRecorder() if V_history is None else V_history
+    V_history.append(V)
     diff = np.inf
 
     while diff > eps:
-        Q = np.zeros((env.nS, env.nA))
-        for state in range(env.nS):
-            for action in range(env.nA):
-                for probability, nextstate, reward, _ in env.P[state][action]:
-                    Q[state, action] += probability * (reward + gamma * V[nextstate])
-
-        V_upd = np.max(Q, axis=1)
+        V_upd = env.greedy_backup(V, gamma)     # The moves are clamped shifts of the grid, so no P is needed.
         diff = np.max(np.abs(V_upd - V))
-        V = V_upd
+        V_prev, V = V, V_upd
         V_history.append(V)
+    V_history.close()
 
+    Q = env.q_values(V_prev, gamma)
     opt_policy = {state: {np.argmax(Q[state]).item(): 1.0} for state in range(env.nS)}
 
     return V_history, opt_policy
 
 
+def batched_value_iteration(env, gammas, eps):
+    """ Solve the given GridWorld environment for several discount factors in one batched value iteration run. Each
+        sweep backs up the value functions of all the discount factors that have not converged yet.
+
+    :param env: The GridWorld environment
+    :param gammas: A list with K discount factors
+    :param eps: The sensitivity factor for the termination of the value iteration algorithm
+    :return: A (K, nS) array with the state value function of each discount factor, a list with the optimal policy of
+             each discount factor and the number of sweeps each discount factor needed.
+    """
+    gammas = np.array(gammas)
+
+    V = np.zeros((len(gammas), env.nS))
+    V_prev = V.copy()
+    n_sweeps = np.zeros(len(gammas), dtype=int)
+    active = np.ones(len(gammas), dtype=bool)          # The discount factors that have not converged yet.
+
+    while np.any(active):
+        V_upd = env.greedy_backup(V[active], gammas[active])
+        diff = np.max(np.abs(V_upd - V[active]), axis=1)
+        V_prev[active] = V[active]
+        V[active] = V_upd
+        n_sweeps[active] += 1
+        active[active] = diff > eps
+
+    opt_policies = []
+    for v, gamma in zip(V_prev, gammas):
+        Q = env.q_values(v, gamma)
+        opt_policies.append({state: {np.argmax(Q[state]).item(): 1.0} for state in range(env.nS)})
+
+    return V, opt_policies, n_sweeps
+
+
 def main():
     """ Create a GridWorld environment based on the command line arguments and find the optimal policy for this
         environment. Optionally, plot an animation demonstrating the progress of the value iteration algorithm and an
         image with an optimal deterministic policy.
     """
-    height, width, gamma, epsilon, plot = parse_args()
+    height, width, gammas, epsilon, plot, history, history_n = parse_args()
     env = GridWorldEnv(height, width)
-    V_history, opt_policy = value_iteration(env, gamma, epsilon)
+    pp = pprint.PrettyPrinter(indent=2, width=env.width * 7, compact=True)
+
+    if len(gammas) > 1:
+        V, opt_policies, n_sweeps = batched_value_iteration(env, gammas, epsilon)
+        for gamma, v, opt_policy, n in zip(gammas, V, opt_policies, n_sweeps):
+            print(f"gamma = {gamma:.2f} ({n} sweeps)")
+            print("Optimal Policy")
+            pp.pprint(policy_to_annot(env, opt_policy))
+
+            print("\nState Value Function")
+            pp.pprint(v.reshape(height, width).tolist())
+            print()
+        return
+
+    gamma, = gammas
+    V_history = HistoryRecorder(history or ('all' if plot else 'off'), history_n, 'gridworld_vi_history.npy')
+    V_history, opt_policy = value_iteration(env, gamma, epsilon, V_history)
     V = V_history[-1].reshape((height, width))
 
-    pp = pprint.PrettyPrinter(indent=2, width=env.width * 7, compact=True)
     print("Optimal Policy")
     pp.pprint(policy_to_annot(env, opt_policy))
 
@@ -0,0 +1,68 @@
+from collections.abc import Mapping
+
+
+class ArrayTransitions(Mapping):
+    """ A read-only view of the transition probability matrix P[s][a] == [(probability, nextstate, reward, done), ...]
+        of an environment, whose transitions are stored in compact arrays. The outcomes of each (state, action) pair are
+        stored along the last axis of the arrays and the mask marks the existing outcomes. The tuples of a state are
+        created only when the state is accessed.
+    """
+
+    def __init__(self, next_states, probs, rewards, dones, mask, states=None):
+        """ Create the view of the given transition arrays.
+
+        :param next_states: A (nS, nA, K) array with the (encoded) next state of each outcome
+        :param probs: A (nS, nA, K) array with the probability of each outcome
+        :param rewards: A (nS, nA, K) array with the reward of each outcome
+        :param dones: A (nS, nA, K) array with the done flag of each outcome
+        :param mask: A (nS, nA, K) boolean array, which is True for the existing outcomes
+        :param states: A list with the state of each index or None, if the states are 0, ..., nS-1.
+        """
+        self.next_states = next_states
+        self.probs = probs
+        self.rewards = rewards
+        self.dones = dones
+        self.mask = mask
+        self.states = states
+        self.state_index = None if states is None else {state: i for i, state in enumerate(states)}
+
+    def __getitem__(self, state):
+        s = self.encode(state)
+        nA = self.mask.shape[1]
+        decode = self.decode
+        return {action: [(p, decode(ns), r, d) for ns, p, r, d, m in zip(self.next_states[s, action].tolist(),
+                                                                          self.probs[s, action].tolist(),
+                                                                          self.rewards[s, action].tolist(),
+                                                                          self.dones[s, action].tolist(),
+                                                                          self.mask[s, action].tolist()) if m]
+                for action in range(nA)}
+
+    def __iter__(self):
+        return iter(range(len(self)) if self.states is None else self.states)
+
+    def __len__(self):
+        return self.mask.shape[0]
+
+    def encode(self, state):
+        """ Map a state of the environment to its index in the arrays.
+
+        :param state: The state
+        :return: The index of the state
+        """
+        if self.state_index is not None:
+            return self.state_index[state]
+        if not 0 <= state < len(self):
+            raise KeyError(state)
+        return state
+
+    def decode(self, index):
+        """ Map an index of the arrays back to the state of the environment.
+
+        :param index: The index of the state
+        :return: The state
+        """
+        return index if self.states is None else self.states[index]
+
+    def arrays(self):
+        """ :return: The next states, probabilities, rewards, done flags and the outcome mask arrays. """
+        return self.next_states, self.probs, self.rewards, self.dones, self.mask
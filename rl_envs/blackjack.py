@@ -1,16 +1,22 @@
-from gym import Env
-from gym.utils import seeding
+import numpy as np
 from gym.spaces import Discrete, Tuple
+from rl_envs.card_buffer import CardBuffer
+from rl_envs.dealer_outcomes import DealerOutcomeEnv
 
-class BlackjackEnv(Env):
+
+class BlackjackEnv(DealerOutcomeEnv):
 
     STICK = 0
     HIT = 1
 
     CARDS = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10]
 
-    def __init__(self):
+    def __init__(self, dealer='sample', seed=None):
+
+        self._init_dealer(dealer)
 
+        # The cards (and the uniform numbers of the 'sample' mode) are drawn from buffers of a per-instance generator.
+        self.deck = CardBuffer(self.CARDS)
         self.np_random = None
         self.dealer_card = None
         self.player_sum = None
@@ -20,7 +26,8 @@ class BlackjackEnv(Env):
         self.action_space = Discrete(2)
         self.observation_space = Tuple((Discrete(10), Discrete(10), Discrete(2)))
 
-        self._seed()
+        self._model = None
+        self._seed(seed)
 
     def reset(self, s0=None):
         if s0:
@@ -63,42 +70,129 @@ class BlackjackEnv(Env):
 
             return self._get_obs(), 0.0, False, self.info
 
-        else:                                                       # The player sticks. It's the dealer's turn now.
-            if self.dealer_card == 1:
+        else:                                                       # The player sticks. Resolve it with the dealer mode
+            return self._stick(self.player_sum, self.dealer_card)
+
+    def states(self):
+        """ :return: A list with the 200 decision states (player_sum, dealer_card, usable_ace) of the game. """
+        return [(player_sum, dealer_card, usable_ace) for usable_ace in (False, True)
+                for player_sum in range(12, 22) for dealer_card in range(1, 11)]
+
+    def transition_model(self):
+        """ The exact transition model of the game with an infinite deck, model[s][a] == [(probability, nextstate,
+            reward, done), ...], over the (player_sum, dealer_card, usable_ace) states. The outcomes that end the
+            episode (a bust, or the dealer's outcome after a stick) keep the state as their next state, like the
+            observations of step. The model is built the first time it is requested and it is cached afterwards.
+
+        :return: The transition model as a dictionary of dictionaries
+        """
+        if self._model is not None:
+            return self._model
+
+        card_probs = {c: self.CARDS.count(c) / len(self.CARDS) for c in sorted(set(self.CARDS))}
+
+        self._model = dict()
+        for state in self.states():
+            player_sum, dealer_card, usable_ace = state
+
+            hit = dict()
+            for c, p in card_probs.items():
+                if player_sum + c > 21 and usable_ace:              # The ace in the player's hand is no longer usable
+                    outcome = ((player_sum + c - 10, dealer_card, False), 0.0, False)
+                elif player_sum + c <= 21:                          # The player did not go bust
+                    outcome = ((player_sum + c, dealer_card, usable_ace), 0.0, False)
+                else:                                               # The player went bust
+                    outcome = (state, -1.0, True)
+                hit[outcome] = hit.get(outcome, 0.0) + p
+
+            # The outcome of a stick only depends on whether the dealer's final sum is above, equal to or below the
+            # player's sum (or a bust).
+            dealer_dist = self.dealer_table[dealer_card - 1]
+            sums = np.array(self.DEALER_SUMS)
+            win = dealer_dist[self.DEALER_BUST] + np.sum(dealer_dist[:self.DEALER_BUST][sums < player_sum])
+            draw = np.sum(dealer_dist[:self.DEALER_BUST][sums == player_sum])
+            lose = np.sum(dealer_dist[:self.DEALER_BUST][sums > player_sum])
+            stick = [(p, state, r, True) for p, r in ((win, 1.0), (draw, 0.0), (lose, -1.0)) if p > 0.0]
+
+            self._model[state] = {self.STICK: stick,
+                                  self.HIT: [(p, next_state, r, done) for (next_state, r, done), p in hit.items()]}
+
+        return self._model
+
+    def _play_dealer(self, player_sum, dealer_card):
+        """ Play the dealer's hand card by card, after the player sticks ('simulate').
+
+        :param player_sum: The sum of the player
+        :param dealer_card: The value of the card that the dealer shows
+        :return: The reward of the player
+        """
+        if dealer_card == 1:
+            dealer_ace = True
+            dealer_sum = 11
+        else:
+            dealer_ace = False
+            dealer_sum = dealer_card
+
+        while dealer_sum < 17:                                      # The dealer hits until the sum of his cards is >=17
+            c = self._draw_card()
+            self.info['dealer'].append(c)
+            if c == 1 and dealer_sum + 11 <= 21:                    # The dealer draws an ace that can be used as an 11
+                dealer_sum += 11
                 dealer_ace = True
-                dealer_sum = 11
-            else:
+            elif dealer_sum + c > 21 and dealer_ace:                # The ace in the dealer's hand is no longer usable
+                dealer_sum += c - 10
                 dealer_ace = False
-                dealer_sum = self.dealer_card
-
-            while dealer_sum < 17:                                  # The dealer hits until the sum of his cards is >=17
-                c = self._draw_card()
-                self.info['dealer'].append(c)
-                if c == 1 and dealer_sum + 11 <= 21:                # The dealer draws an ace that can be used as an 11
-                    dealer_sum += 11
-                    dealer_ace = True
-                elif dealer_sum + c > 21 and dealer_ace:            # The ace in the dealer's hand is no longer usable
-                    dealer_sum += c - 10
-                    dealer_ace = False
-                else:
-                    dealer_sum += c
-            if dealer_sum > 21:                                     # The dealer went bust, the player won
-                return self._get_obs(), 1.0, True, self.info
-            else:                                                   # The dealer did not go bust.
-                if self.player_sum > dealer_sum:                    # The player had a hand closer to 21 than the dealer
-                    return self._get_obs(), 1.0, True, self.info
-                elif self.player_sum < dealer_sum:                  # The dealer had a hand closer to 21 than the dealer
-                    return self._get_obs(), -1.0, True, self.info
-                else:                                               # The sum of the dealer's and the player's hand is equal
-                    return self._get_obs(), 0.0, True, self.info    # The sum was less than 21 or both had a natural 21
+            else:
+                dealer_sum += c
+        if dealer_sum > 21:                                         # The dealer went bust, the player won
+            return 1.0
+        elif player_sum > dealer_sum:                               # The player had a hand closer to 21 than the dealer
+            return 1.0
+        elif player_sum < dealer_sum:                               # The dealer had a hand closer to 21 than the dealer
+            return -1.0
+        else:                                                       # The sum of the dealer's and the player's hand is equal
+            return 0.0                                              # The sum was less than 21 or both had a natural 21
+
+    def _dealer_outcome_table(self):
+        """ Compute the exact distribution of the final outcome of the dealer's hand for each card that the dealer
+            shows, with the rules of step (infinite deck). The dealer's hand is a (sum, usable ace) pair, whose hard sum
+            only increases, so the distributions are computed by recursion over the next card.
+
+        :return: A (10, 6) array with the probabilities of a final sum of 17, ..., 21 and of a bust for each card
+        """
+        memo = dict()
+
+        def outcome(dealer_sum, dealer_ace):
+            if dealer_sum > 21:
+                return np.eye(6)[self.DEALER_BUST]
+            if dealer_sum >= 17:
+                return np.eye(6)[dealer_sum - 17]
+            if (dealer_sum, dealer_ace) not in memo:
+                dist = np.zeros(6)
+                for c in self.CARDS:
+                    if c == 1 and dealer_sum + 11 <= 21:            # An ace that can be used as an 11
+                        dist += outcome(dealer_sum + 11, True)
+                    elif dealer_sum + c > 21 and dealer_ace:        # The ace is no longer usable
+                        dist += outcome(dealer_sum + c - 10, False)
+                    else:
+                        dist += outcome(dealer_sum + c, dealer_ace)
+                memo[(dealer_sum, dealer_ace)] = dist / len(self.CARDS)
+            return memo[(dealer_sum, dealer_ace)]
+
+        return np.array([outcome(11, True) if c == 1 else outcome(c, False) for c in range(1, 11)])
 
     def _get_obs(self):
         return self.player_sum, self.dealer_card, self.usable_ace
 
     def _draw_card(self):
-        c = self.np_random.randint(13)
-        return self.CARDS[c]
+        return self.deck.draw()
 
     def _seed(self, seed=None):
-        self.np_random, seed = seeding.np_random(seed)
-        return [seed]
+        """ Seed the deck of the environment.
+
+        :param seed: An integer, a SeedSequence (e.g. one of SeedSequence.spawn for parallel workers) or None
+        :return: A list with the entropy of the seed, which reproduces the deck
+        """
+        entropy = self.deck.seed(seed)
+        self.np_random = self.deck.np_random
+        return [entropy]
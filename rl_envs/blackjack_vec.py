@@ -0,0 +1,138 @@
+import numpy as np
+from gym import Env
+from gym.utils import seeding
+from gym.spaces import Discrete, Tuple
+
+
+class BlackjackVecEnv(Env):
+    """ N independent Blackjack hands, which are played in lockstep with array operations. The rules of the player and
+        the dealer are the ones of BlackjackEnv. The observations are the arrays (player_sum, dealer_card, usable_ace)
+        of all the hands and a finished hand is reset automatically, so the returned observation of a finished hand is
+        the first observation of its next hand.
+    """
+
+    STICK = 0
+    HIT = 1
+
+    CARDS = np.array([1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10])
+
+    def __init__(self, n_envs):
+
+        self.num_envs = n_envs
+
+        self.np_random = None
+        self.player_sum = np.zeros(n_envs, dtype=np.int64)
+        self.dealer_card = np.zeros(n_envs, dtype=np.int64)
+        self.usable_ace = np.zeros(n_envs, dtype=bool)
+
+        self.action_space = Discrete(2)
+        self.observation_space = Tuple((Discrete(10), Discrete(10), Discrete(2)))
+
+        self._seed()
+
+    def reset(self, s0=None):
+        """ Deal new hands to all the players.
+
+        :param s0: An optional (N, 3) integer array with the initial state of each hand, in the format of the
+                   exploring starts of BlackjackEnv.reset (player_sum - 12, dealer_card - 1, usable_ace)
+        :return: The observations of the hands
+        """
+        if s0 is not None:
+            s0 = np.asarray(s0)
+            self.player_sum[:] = 12 + s0[:, 0]
+            self.dealer_card[:] = 1 + s0[:, 1]
+            self.usable_ace[:] = s0[:, 2] == 1
+        else:
+            self._deal(np.arange(self.num_envs))
+        return self._get_obs()
+
+    def step(self, actions):
+        """ Take one action in every hand.
+
+        :param actions: An (N,) integer array with the action of each hand
+        :return: The observations (of the next hands, for the finished ones), the rewards, the done flags and an info
+                 dictionary with the final observations of the finished hands ('final_obs')
+        """
+        actions = np.asarray(actions)
+        rewards = np.zeros(self.num_envs)
+        dones = np.zeros(self.num_envs, dtype=bool)
+
+        hit = np.flatnonzero(actions == self.HIT)
+        if hit.size:                                                # The players that hit draw one card each.
+            c = self._draw_cards(hit.size)
+            player_sum = self.player_sum[hit] + c
+            demote = (player_sum > 21) & self.usable_ace[hit]      # The ace is no longer usable.
+            player_sum[demote] -= 10
+            self.usable_ace[hit[demote]] = False
+            self.player_sum[hit] = player_sum
+            bust = hit[player_sum > 21]                             # The player went bust in this turn.
+            rewards[bust] = -1.0
+            dones[bust] = True
+            self.player_sum[bust] -= c[player_sum > 21]             # The observation of BlackjackEnv keeps the sum.
+
+        stick = np.flatnonzero(actions == self.STICK)
+        if stick.size:                                              # The players that stick. It's the dealers' turn.
+            dealer_sum = self._play_dealer(self.dealer_card[stick])
+            player_sum = self.player_sum[stick]
+            rewards[stick] = np.where((dealer_sum > 21) | (player_sum > dealer_sum), 1.0,
+                                      np.where(player_sum < dealer_sum, -1.0, 0.0))
+            dones[stick] = True
+
+        final_obs = self._get_obs()
+        finished = np.flatnonzero(dones)
+        if finished.size:
+            self._deal(finished)
+
+        return self._get_obs(), rewards, dones, {'final_obs': final_obs}
+
+    def _deal(self, idx):
+        """ Deal new hands to the given players. Each player draws cards until the sum is at least 12 and an ace is
+            counted as 11 when it fits. The dealer shows one card.
+
+        :param idx: The indices of the hands
+        """
+        player_sum = np.zeros(idx.size, dtype=np.int64)
+        usable_ace = np.zeros(idx.size, dtype=bool)
+
+        drawing = np.arange(idx.size)
+        while drawing.size:
+            c = self._draw_cards(drawing.size)
+            ace = (c == 1) & (player_sum[drawing] + 11 <= 21)
+            player_sum[drawing] += np.where(ace, 11, c)
+            usable_ace[drawing[ace]] = True
+            drawing = drawing[player_sum[drawing] < 12]
+
+        self.player_sum[idx] = player_sum
+        self.usable_ace[idx] = usable_ace
+        self.dealer_card[idx] = self._draw_cards(idx.size)
+
+    def _play_dealer(self, dealer_card):
+        """ Play the hands of the dealers, who hit until the sum of their cards is at least 17.
+
+        :param dealer_card: The card that each dealer shows
+        :return: The final sum of each dealer
+        """
+        dealer_ace = dealer_card == 1
+        dealer_sum = np.where(dealer_ace, 11, dealer_card)
+
+        drawing = np.flatnonzero(dealer_sum < 17)
+        while drawing.size:
+            c = self._draw_cards(drawing.size)
+            s, ace = dealer_sum[drawing], dealer_ace[drawing]
+            new_ace = (c == 1) & (s + 11 <= 21)                     # An ace that can be used as an 11
+            demote = ~new_ace & (s + c > 21) & ace                  # The ace of the dealer is no longer usable
+            dealer_sum[drawing] = s + np.where(new_ace, 11, np.where(demote, c - 10, c))
+            dealer_ace[drawing] = (ace | new_ace) & ~demote
+            drawing = drawing[dealer_sum[drawing] < 17]
+
+        return dealer_sum
+
+    def _get_obs(self):
+        return self.player_sum.copy(), self.dealer_card.copy(), self.usable_ace.copy()
+
+    def _draw_cards(self, n):
+        return self.CARDS[self.np_random.randint(13, size=n)]
+
+    def _seed(self, seed=None):
+        self.np_random, seed = seeding.np_random(seed)
+        return [seed]
@@ -0,0 +1,60 @@
+import numpy as np
+
+
+class CardBuffer:
+    """ An infinite deck of equally likely cards, which are drawn from a buffer that is refilled in blocks from a
+        per-instance numpy Generator, so a draw is a list index instead of a call to the random number generator. The
+        same generator also fills a buffer of uniform numbers in [0, 1), e.g. for the dealer's outcome of a stick.
+
+        The generator is seeded with a SeedSequence, so the decks of parallel workers can get independent streams with
+        SeedSequence.spawn, and a deck that is seeded with the same value draws the same cards.
+    """
+
+    def __init__(self, cards, block_size=4096):
+        """ Create a deck with a fresh seed.
+
+        :param cards: The equally likely cards of the deck, e.g. a card value or a (value, color) tuple
+        :param block_size: The number of cards (and uniform numbers) that are drawn at once
+        """
+        self.cards = list(cards)
+        self.block_size = block_size
+
+        self.np_random = None
+        self._cards = []
+        self._next_card = 0
+        self._uniforms = []
+        self._next_uniform = 0
+
+        self.seed()
+
+    def seed(self, seed=None):
+        """ Seed the generator of the deck and discard the buffered cards and uniform numbers.
+
+        :param seed: An integer, a SeedSequence or None for fresh entropy
+        :return: The entropy of the SeedSequence, which reproduces the deck
+        """
+        seed_seq = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.np_random = np.random.default_rng(seed_seq)
+
+        self._cards, self._next_card = [], 0
+        self._uniforms, self._next_uniform = [], 0
+        return seed_seq.entropy
+
+    def draw(self):
+        """ :return: The next card of the deck. """
+        if self._next_card == len(self._cards):
+            cards = self.cards
+            self._cards = [cards[i] for i in self.np_random.integers(len(cards), size=self.block_size).tolist()]
+            self._next_card = 0
+        card = self._cards[self._next_card]
+        self._next_card += 1
+        return card
+
+    def uniform(self):
+        """ :return: The next uniform number in [0, 1). """
+        if self._next_uniform == len(self._uniforms):
+            self._uniforms = self.np_random.random(self.block_size).tolist()
+            self._next_uniform = 0
+        u = self._uniforms[self._next_uniform]
+        self._next_uniform += 1
+        return u
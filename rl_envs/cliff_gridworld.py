@@ -1,8 +1,7 @@
 import numpy as np
 from gym import Env
 from gym.spaces import Discrete, Tuple
-import matplotlib.pyplot as plt
-import seaborn as sns
+from rl_envs.array_transitions import ArrayTransitions
 
 
 class CliffGridWorldEnv(Env):
@@ -18,6 +17,12 @@ class CliffGridWorldEnv(Env):
     RIGHT = 2
     LEFT = 3
 
+    MOVE_DELTAS = {            # The (dy, dx) of each move.
+        UP: (-1, 0),
+        DOWN: (1, 0),
+        RIGHT: (0, 1),
+        LEFT: (0, -1)}
+
     MOVE_CHARS = {
         UP: '↑',
         DOWN: '↓',
@@ -26,31 +31,31 @@ class CliffGridWorldEnv(Env):
 
     metadata = {"render.modes": ['rgb_array']}
 
-    def __init__(self):
+    def __init__(self, training=False):
+        """ Create the environment.
 
+        :param training: Whether the environment runs in training mode. In training mode, the states are the integer
+                         indices y * WIDTH + x, the steps are looked up in flat next state, reward and done tables and
+                         no trajectory is kept for rendering, so the environment cannot be rendered.
+        """
         self.action_space = Discrete(4)  # There are 4 actions: U, D, R, L
-        self.observation_space = Tuple([Discrete(self.HEIGHT), Discrete(self.WIDTH)])  # There are height x width states
-
-        self.P = {(h, w): dict() for h in range(self.HEIGHT) for w in range(self.WIDTH)}  # The transition probabilities
-        for state in self.P.keys():  # P[s][a] == [(probability, nextstate, reward, done), ...]
-            if self._is_done(state):
-                for action in range(self.action_space.n):
-                    self.P[state][action] = [(1.0, state, 0.0, True)]
-            elif self._is_cliff(state):
-                for action in range(self.action_space.n):
-                    self.P[state][action] = [(1.0, self.START_POSITION, -100.0, False)]
-            else:
-                y, x = state
-
-                next_state_u = self._limit_position(y - 1, x)
-                next_state_d = self._limit_position(y + 1, x)
-                next_state_r = self._limit_position(y, x + 1)
-                next_state_l = self._limit_position(y, x - 1)
-
-                self.P[state][self.UP] = [(1.0, next_state_u, -1.0, self._is_done(next_state_u))]
-                self.P[state][self.DOWN] = [(1.0, next_state_d, -1.0, self._is_done(next_state_d))]
-                self.P[state][self.RIGHT] = [(1.0, next_state_r, -1.0, self._is_done(next_state_r))]
-                self.P[state][self.LEFT] = [(1.0, next_state_l, -1.0, self._is_done(next_state_l))]
+
+        # The transition probability matrix, P[s][a] == [(probability, nextstate, reward, done), ...], is a view of
+        # compact transition arrays. The state (y, x) is stored at the index y * WIDTH + x.
+        self.states = [(h, w) for h in range(self.HEIGHT) for w in range(self.WIDTH)]
+        self.P = ArrayTransitions(*self._build_transitions(), states=self.states)
+
+        self.training = training
+        if training:
+            self.observation_space = Discrete(self.HEIGHT * self.WIDTH)     # There are height x width state indices
+            # Nested lists, so that a step is two list lookups instead of indexing numpy arrays.
+            self.next_state_table = self.P.next_states[:, :, 0].tolist()
+            self.reward_table = self.P.rewards[:, :, 0].tolist()
+            self.done_table = self.P.dones[:, :, 0].tolist()
+            self.start_state = self.P.encode(self.START_POSITION)
+            self._info = {}
+        else:
+            self.observation_space = Tuple([Discrete(self.HEIGHT), Discrete(self.WIDTH)])  # height x width states
 
         self.curr_state = None
         self.fig, self.axes = None, None
@@ -60,6 +65,9 @@ class CliffGridWorldEnv(Env):
 
     def reset(self):
         self.ep_moves = 0
+        if self.training:
+            self.curr_state = self.start_state
+            return self.curr_state
         self.curr_state = self.START_POSITION
         self.moves_hist['y'] = [self.curr_state[0] + 0.5]
         self.moves_hist['x'] = [self.curr_state[1] + 0.5]
@@ -67,7 +75,15 @@ class CliffGridWorldEnv(Env):
         return self.curr_state
 
     def step(self, action):
-        _, self.curr_state, reward, done = self.P[self.curr_state][action][0]
+        if self.training:
+            s = self.curr_state
+            self.curr_state = self.next_state_table[s][action]
+            self.ep_moves += 1
+            return self.curr_state, self.reward_table[s][action], self.done_table[s][action], self._info
+
+        s = self.P.encode(self.curr_state)
+        self.curr_state = self.states[self.P.next_states[s, action, 0]]
+        reward, done = self.P.rewards[s, action, 0].item(), self.P.dones[s, action, 0].item()
         self.ep_moves += 1
         self.moves_hist['y'].append(self.curr_state[0] + 0.5)
         self.moves_hist['x'].append(self.curr_state[1] + 0.5)
@@ -76,6 +92,9 @@ class CliffGridWorldEnv(Env):
 
     def render(self, mode="human"):
         assert mode in self.metadata['render.modes']
+        assert not self.training, "An environment in training mode cannot be rendered"
+        import matplotlib.pyplot as plt     # Imported on demand, so that training does not need matplotlib.
+        import seaborn as sns
 
         if self.fig is None:
             self.fig, self.axes = plt.subplots(1, 1)
@@ -102,9 +121,42 @@ class CliffGridWorldEnv(Env):
         return np.frombuffer(self.fig.canvas.tostring_rgb(), dtype=np.uint8).reshape(int(height), int(width), 3)
 
     def close(self):
-        plt.close(self.fig)
+        if self.fig is not None:
+            import matplotlib.pyplot as plt
+            plt.close(self.fig)
         self.fig, self.axes = None, None
 
+    def transition_arrays(self):
+        """ :return: The next states, probabilities, rewards, done flags and the outcome mask as (nS, nA, 1) arrays. """
+        return self.P.arrays()
+
+    def _build_transitions(self):
+        """ Build the (deterministic) transitions of all the states and actions with array operations.
+
+        :return: The next states, probabilities, rewards, done flags and the outcome mask as (nS, nA, 1) arrays.
+        """
+        nS, nA = self.HEIGHT * self.WIDTH, self.action_space.n
+        y, x = np.divmod(np.arange(nS), self.WIDTH)
+        dy, dx = np.array([self.MOVE_DELTAS[action] for action in range(nA)]).T
+
+        next_y = np.clip(y[:, None] + dy, 0, self.HEIGHT - 1)
+        next_x = np.clip(x[:, None] + dx, 0, self.WIDTH - 1)
+        next_states = next_y * self.WIDTH + next_x
+        rewards = np.full((nS, nA), -1.0)
+
+        cliff = [h * self.WIDTH + w for h, w in self.CLIFF_POSITIONS]
+        next_states[cliff] = self.START_POSITION[0] * self.WIDTH + self.START_POSITION[1]    # The agent falls off.
+        rewards[cliff] = -100.0
+
+        target = self.TARGET_POSITION[0] * self.WIDTH + self.TARGET_POSITION[1]
+        next_states[target] = target                # The target is an absorbing state without any reward.
+        rewards[target] = 0.0
+        dones = next_states == target
+
+        probs = np.ones((nS, nA))
+        mask = np.ones((nS, nA), dtype=bool)
+        return next_states[..., None], probs[..., None], rewards[..., None], dones[..., None], mask[..., None]
+
     def _is_done(self, s):
         return s == self.TARGET_POSITION
 
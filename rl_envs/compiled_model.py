@@ -0,0 +1,140 @@
+import numpy as np
+
+
+class CompiledModel:
+    """ A tabular MDP compiled into flat CSR-style arrays.
+
+        The outcomes of the (state, action) pair with flat index sa = state * nA + action are stored in the slice
+        indptr[sa]:indptr[sa + 1] of the arrays next_states, probs, rewards and dones. States are always integers
+        0, 1, ..., nS-1. Environments whose states are tuples (e.g. (y, x) grid positions) get a stable encoding, which
+        is the sorted order of their states.
+    """
+
+    def __init__(self, nS, nA, indptr, next_states, probs, rewards, dones, states=None):
+        """ Create a compiled model from its CSR arrays.
+
+        :param nS: The number of states
+        :param nA: The number of actions
+        :param indptr: The (nS * nA + 1,) offsets of the outcomes of each (state, action) pair
+        :param next_states: The (encoded) next state of each outcome
+        :param probs: The probability of each outcome
+        :param rewards: The reward of each outcome
+        :param dones: Whether each outcome terminates the episode
+        :param states: A list with the original state of each encoded state or None, if the states are 0, ..., nS-1.
+        """
+        self.nS = nS
+        self.nA = nA
+
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.next_states = np.asarray(next_states, dtype=np.int64)
+        self.probs = np.asarray(probs, dtype=np.float64)
+        self.rewards = np.asarray(rewards, dtype=np.float64)
+        self.dones = np.asarray(dones, dtype=bool)
+
+        # The (state, action) pair of each outcome, which is used to reduce the outcomes of every pair at once.
+        counts = np.diff(self.indptr)
+        self.rows = np.repeat(np.arange(nS * nA, dtype=np.int64), counts)
+
+        # The expected reward of each (state, action) pair and the actions that are available in each state.
+        self.R = np.bincount(self.rows, weights=self.probs * self.rewards, minlength=nS * nA).reshape(nS, nA)
+        self.valid = (counts > 0).reshape(nS, nA)
+
+        # A state is terminal if all of its available actions lead back to itself and end the episode.
+        self_loop = self.dones & (self.next_states == self.rows // nA)
+        not_absorbing = np.bincount(self.rows, weights=~self_loop, minlength=nS * nA).reshape(nS, nA)
+        self.terminal = ~np.any(not_absorbing, axis=1)
+
+        self.states = states
+        self.state_index = None if states is None else {state: i for i, state in enumerate(states)}
+
+    @classmethod
+    def from_P(cls, P, nA):
+        """ Compile a transition probability matrix P[s][a] == [(probability, nextstate, reward, done), ...].
+
+        :param P: The transition probability matrix of the environment
+        :param nA: The number of actions of the environment
+        :return: The compiled model
+        """
+        keys = list(P.keys())
+        if all(isinstance(s, (int, np.integer)) for s in keys) and sorted(keys) == list(range(len(keys))):
+            states, encode = None, int
+        else:
+            states = sorted(keys)
+            state_index = {state: i for i, state in enumerate(states)}
+            encode = state_index.__getitem__
+
+        nS = len(keys)
+        indptr = np.zeros(nS * nA + 1, dtype=np.int64)
+        next_states, probs, rewards, dones = [], [], [], []
+        for s in range(nS):
+            transitions = P[s if states is None else states[s]]
+            for a in range(nA):
+                for probability, nextstate, reward, done in transitions.get(a, []):
+                    next_states.append(encode(nextstate))
+                    probs.append(probability)
+                    rewards.append(reward)
+                    dones.append(done)
+                indptr[s * nA + a + 1] = len(probs)
+
+        return cls(nS, nA, indptr, next_states, probs, rewards, dones, states)
+
+    @classmethod
+    def from_arrays(cls, next_states, probs, rewards, dones, mask, states=None):
+        """ Compile the padded transition arrays of an environment, where the outcomes of each (state, action) pair are
+            stored along the last axis and the mask marks the existing outcomes.
+
+        :param next_states: A (nS, nA, K) array with the (encoded) next state of each outcome
+        :param probs: A (nS, nA, K) array with the probability of each outcome
+        :param rewards: A (nS, nA, K) array with the reward of each outcome
+        :param dones: A (nS, nA, K) array with the done flag of each outcome
+        :param mask: A (nS, nA, K) boolean array, which is True for the existing outcomes
+        :param states: A list with the original state of each encoded state or None, if the states are 0, ..., nS-1.
+        :return: The compiled model
+        """
+        nS, nA = mask.shape[:2]
+        indptr = np.zeros(nS * nA + 1, dtype=np.int64)
+        np.cumsum(np.sum(mask, axis=2).ravel(), out=indptr[1:])
+        return cls(nS, nA, indptr, next_states[mask], probs[mask], rewards[mask], dones[mask], states)
+
+    def encode(self, state):
+        """ Map an original state of the environment to its integer index.
+
+        :param state: The original state
+        :return: The index of the state
+        """
+        return state if self.state_index is None else self.state_index[state]
+
+    def decode(self, index):
+        """ Map an integer index back to the original state of the environment.
+
+        :param index: The index of the state
+        :return: The original state
+        """
+        return index if self.states is None else self.states[index]
+
+    def outcomes(self, state, action):
+        """ Return the outcomes of the given (encoded) state and action as a view of the compiled arrays.
+
+        :param state: The index of the state
+        :param action: The action
+        :return: The next states, the probabilities, the rewards and the done flags of the outcomes
+        """
+        start, end = self.indptr[state * self.nA + action], self.indptr[state * self.nA + action + 1]
+        return self.next_states[start:end], self.probs[start:end], self.rewards[start:end], self.dones[start:end]
+
+
+def compile_model(env):
+    """ Compile the transition probability matrix P of a tabular environment. The compiled model is cached in the
+        environment, so that it is built only once.
+
+    :param env: A tabular environment with a transition probability matrix P (GridWorld, Gambler, Windy or Cliff)
+    :return: The compiled model of the environment
+    """
+    model = getattr(env, '_compiled_model', None)
+    if model is None:
+        if hasattr(env, 'transition_arrays'):    # The environment builds its transitions in a vectorized way.
+            model = CompiledModel.from_arrays(*env.transition_arrays(), states=getattr(env, 'states', None))
+        else:
+            model = CompiledModel.from_P(env.P, env.action_space.n)
+        env._compiled_model = model
+    return model
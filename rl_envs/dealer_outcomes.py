@@ -0,0 +1,88 @@
+from abc import ABC, abstractmethod
+import numpy as np
+from gym import Env
+
+
+class DealerOutcomeEnv(Env, ABC):
+    """ The shared part of the card games, in which the player sticks against a dealer who hits until the sum of the
+        cards is at least 17 (BlackjackEnv and Easy21Env). This class resolves a stick in every dealer mode (_stick): a
+        subclass provides the exact distribution of the dealer's final outcome for each card that the dealer shows
+        (_dealer_outcome_table), which resolves 'sample' and 'expected', and plays the dealer's hand card by card with
+        its own rules (_play_dealer), which resolves 'simulate'.
+    """
+
+    # When the player sticks, the dealer's hand is either played card by card ('simulate'), or its final outcome is
+    # drawn from the exact outcome distribution of the dealer's card ('sample'), or the expected reward is returned
+    # ('expected').
+    DEALER_MODES = ('simulate', 'sample', 'expected')
+
+    # The final outcomes of the dealer's hand: a sum of 17, 18, 19, 20 or 21, or a bust.
+    DEALER_SUMS = [17, 18, 19, 20, 21]
+    DEALER_BUST = 5
+
+    def _init_dealer(self, dealer):
+        """ Check the dealer mode and build the outcome tables of the dealer.
+
+        :param dealer: The dealer mode, one of DEALER_MODES
+        """
+        if dealer not in self.DEALER_MODES:
+            raise ValueError(f"Unknown dealer mode: {dealer}")
+        self.dealer = dealer
+
+        # dealer_table[c-1, k] is the probability of the k-th final outcome of the dealer, when the dealer shows card c.
+        # stick_rewards[p, c-1] is the expected reward of sticking with a sum of p, when the dealer shows card c.
+        self.dealer_table = self._dealer_outcome_table()
+        self.dealer_cdf = np.cumsum(self.dealer_table, axis=1)
+        self.dealer_cdf[:, -1] = 1.0
+        self.stick_rewards = self._stick_reward_table()
+
+    def _stick(self, player_sum, dealer_card):
+        """ Resolve a stick of the player with the dealer mode and end the episode.
+
+        :param player_sum: The sum of the player
+        :param dealer_card: The value of the card that the dealer shows
+        :return: The observation, the reward, the done flag and the info of the final step
+        """
+        if self.dealer == 'simulate':
+            reward = self._play_dealer(player_sum, dealer_card)
+        else:
+            reward = self._stick_reward(player_sum, dealer_card)
+        return self._get_obs(), reward, True, self.info
+
+    def _stick_reward(self, player_sum, dealer_card):
+        """ Resolve a stick without playing the dealer's hand: return the expected reward ('expected'), or draw the
+            final outcome of the dealer with a uniform number of the deck ('sample').
+
+        :param player_sum: The sum of the player
+        :param dealer_card: The value of the card that the dealer shows
+        :return: The reward of the player
+        """
+        if self.dealer == 'expected':
+            return self.stick_rewards[player_sum, dealer_card - 1]
+
+        u = self.deck.uniform()
+        outcome = int(np.searchsorted(self.dealer_cdf[dealer_card - 1], u, side='right'))
+        if outcome == self.DEALER_BUST:                             # The dealer went bust, the player won
+            return 1.0
+        return float(np.sign(player_sum - self.DEALER_SUMS[outcome]))
+
+    @abstractmethod
+    def _play_dealer(self, player_sum, dealer_card):
+        """ Play the dealer's hand card by card, after the player sticks.
+
+        :param player_sum: The sum of the player
+        :param dealer_card: The value of the card that the dealer shows
+        :return: The reward of the player
+        """
+
+    @abstractmethod
+    def _dealer_outcome_table(self):
+        """ :return: A (10, 6) array with the probabilities of a final sum of 17, ..., 21 and of a bust for each card
+                     that the dealer shows.
+        """
+
+    def _stick_reward_table(self):
+        """ :return: A (22, 10) array with the expected reward of sticking for each player sum and dealer card. """
+        player_sums = np.arange(22)[:, None]
+        sign = np.sign(player_sums - np.array(self.DEALER_SUMS))                # (22, 5) reward for each dealer sum
+        return sign @ self.dealer_table[:, :self.DEALER_BUST].T + self.dealer_table[:, self.DEALER_BUST]
@@ -1,9 +1,10 @@
-from gym import Env
 from gym.spaces import Discrete, Tuple
 import numpy as np
+from rl_envs.card_buffer import CardBuffer
+from rl_envs.dealer_outcomes import DealerOutcomeEnv
 
 
-class Easy21Env(Env):
+class Easy21Env(DealerOutcomeEnv):
     # There are 2 colors: red & black. Red and black cards are drawn with probability 1/3 and 2/3, respectively.
     RED = 0
     BLACK = 1
@@ -17,7 +18,13 @@ class Easy21Env(Env):
     # The deck's cards range from 1 to 10 (uniformly distributed). There are no aces or face cards in the game.
     CARDS = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]
 
-    def __init__(self):
+    # The deck as equally likely (value, color) cards: every value once in red and twice in black, which gives the
+    # colors their probabilities 1/3 and 2/3 and every value a probability of 1/10.
+    DECK = list(zip(CARDS, [RED] * len(CARDS))) + 2 * list(zip(CARDS, [BLACK] * len(CARDS)))
+
+    def __init__(self, dealer='sample', seed=None):
+        self._init_dealer(dealer)
+
         self.action_space = Discrete(2)  # There are 2 actions: hit & stick
         self.observation_space = Tuple((Discrete(21), Discrete(10)))  # The state space is player sum x dealer 1st card.
 
@@ -25,6 +32,11 @@ class Easy21Env(Env):
         self.dealer_card_value = None
         self.info = None
 
+        # The cards (and the uniform numbers of the 'sample' mode) are drawn from buffers of a per-instance generator.
+        self.deck = CardBuffer(self.DECK)
+        self.np_random = None
+        self._seed(seed)
+
     def reset(self, state=None):
         if state is None:
             player_card = self._draw_card(sample_color=False)  # The player draws a visible black card
@@ -60,36 +72,81 @@ class Easy21Env(Env):
 
             return self._get_obs(), 0.0, False, self.info
 
-        else:
-            dealer_sum = self.dealer_card_value
-            while dealer_sum < 17:
-                card = self._draw_card()
-                self.info['dealer'].append(card)
-                card_value, card_color = card
-
-                if card_color == self.BLACK:
-                    if dealer_sum + card_value <= 21:  # The dealer did not go bust, the game continues.
-                        dealer_sum += card_value
-                    else:  # The dealer went bust, the player wins.
-                        return self._get_obs(), 1.0, True, self.info
-                else:
-                    if dealer_sum - card_value >= 1:  # The dealer did not go bust, the game continues.
-                        dealer_sum -= card_value
-                    else:  # The dealer went bust, the player wins.
-                        return self._get_obs(), 1.0, True, self.info
-
-            # Both sums are in between 1 and 21. The player and the dealer did not go bust.
-            if dealer_sum < self.player_sum:  # The player wins, because his sum is closer to 21.
-                return self._get_obs(), 1.0, True, self.info
-            elif dealer_sum > self.player_sum:  # The player loses, because the dealer's sum is closer to 21.
-                return self._get_obs(), -1.0, True, self.info
-            else:  # This game is a draw, because the sums are equal.
-                return self._get_obs(), 0.0, True, self.info
+        else:  # The player sticks. Resolve it with the dealer mode.
+            return self._stick(self.player_sum, self.dealer_card_value)
+
+    def _play_dealer(self, player_sum, dealer_card):
+        """ Play the dealer's hand card by card, after the player sticks ('simulate').
+
+        :param player_sum: The sum of the player
+        :param dealer_card: The value of the card that the dealer shows
+        :return: The reward of the player
+        """
+        dealer_sum = dealer_card
+        while dealer_sum < 17:
+            card = self._draw_card()
+            self.info['dealer'].append(card)
+            card_value, card_color = card
+
+            if card_color == self.BLACK:
+                if dealer_sum + card_value <= 21:  # The dealer did not go bust, the game continues.
+                    dealer_sum += card_value
+                else:  # The dealer went bust, the player wins.
+                    return 1.0
+            else:
+                if dealer_sum - card_value >= 1:  # The dealer did not go bust, the game continues.
+                    dealer_sum -= card_value
+                else:  # The dealer went bust, the player wins.
+                    return 1.0
+
+        # Both sums are in between 1 and 21. The player and the dealer did not go bust.
+        if dealer_sum < player_sum:  # The player wins, because his sum is closer to 21.
+            return 1.0
+        elif dealer_sum > player_sum:  # The player loses, because the dealer's sum is closer to 21.
+            return -1.0
+        else:  # This game is a draw, because the sums are equal.
+            return 0.0
+
+    def _dealer_outcome_table(self):
+        """ Compute the exact distribution of the final outcome of the dealer's hand for each card that the dealer
+            shows. A red card decreases the dealer's sum, so the hand is an absorbing Markov chain over the sums
+            1, ..., 16, whose absorption probabilities B solve (I - T) B = A, where T and A are the transition
+            probabilities to the sums below 17 and to the final outcomes, respectively.
+
+        :return: A (10, 6) array with the probabilities of a final sum of 17, ..., 21 and of a bust for each card
+        """
+        T = np.zeros((16, 16))
+        A = np.zeros((16, 6))
+        for dealer_sum in range(1, 17):
+            for color, sign in ((self.BLACK, 1), (self.RED, -1)):
+                p = self.COLOR_PROB[color] / len(self.CARDS)
+                for card_value in self.CARDS:
+                    next_sum = dealer_sum + sign * card_value
+                    if next_sum < 1 or next_sum > 21:
+                        A[dealer_sum - 1, self.DEALER_BUST] += p
+                    elif next_sum >= 17:
+                        A[dealer_sum - 1, next_sum - 17] += p
+                    else:
+                        T[dealer_sum - 1, next_sum - 1] += p
+
+        B = np.linalg.solve(np.eye(16) - T, A)
+        return B[:len(self.CARDS)]
 
     def _draw_card(self, sample_color=True):
-        color = np.random.choice(self.COLORS, p=self.COLOR_PROB) if sample_color else self.BLACK
-        card = np.random.choice(self.CARDS)
-        return card, color
+        card = self.deck.draw()
+        if sample_color:
+            return card
+        return card[0], self.BLACK  # The value of a card does not depend on its color.
+
+    def _seed(self, seed=None):
+        """ Seed the deck of the environment.
+
+        :param seed: An integer, a SeedSequence (e.g. one of SeedSequence.spawn for parallel workers) or None
+        :return: A list with the entropy of the seed, which reproduces the deck
+        """
+        entropy = self.deck.seed(seed)
+        self.np_random = self.deck.np_random
+        return [entropy]
 
     def _get_obs(self):
         return self.player_sum, self.dealer_card_value
@@ -1,34 +1,108 @@
+import numpy as np
 from gym import Env, spaces
+from rl_envs.array_transitions import ArrayTransitions
 
 
 class GamblerEnv(Env):
 
-    def __init__(self, ph):
+    def __init__(self, ph, goal=100):
 
         self.ph = ph
+        self.goal = goal
 
-        self.nS = 101 # There are 101 states: having a total capital of 0, 1, ..., 100$
-        self.nA = 100 # There are 100 actions: staking 0, 1, 2, ..., 99$.
+        self.nS = goal + 1  # There are goal+1 states: having a total capital of 0, 1, ..., goal$
+        self.nA = goal      # There are goal actions: staking 0, 1, 2, ..., (goal-1)$.
 
         self.observation_space = spaces.Discrete(self.nS)
         self.action_space = spaces.Discrete(self.nA)
 
-        # The transition probability matrix, P[s][a] == [(probability, nextstate, reward, done), ...]
-        self.P = {state: {action: [] for action in range(self.nA)} for state in range(self.nS)}
+        # The largest stake of each capital. The non-zero stakes cannot exceed the capital or the amount that is missing
+        # to reach the goal, so the stake a is valid for the capital s if and only if a <= max_stakes[s].
+        capital = np.arange(self.nS)
+        self.max_stakes = np.minimum(capital, goal - capital)
 
-        for state in range(1, 100):                                 # non-terminal states
-            self.P[state][0].append((1.0, state, 0.0, False))       # no stake
-            for action in range(1, min(state, 100-state) + 1):      # non-zero stake
+        self._P = None
 
-                if state + action == 100:
-                    self.P[state][action].append((self.ph, 100, 1.0, True))
-                else:
-                    self.P[state][action].append((self.ph, state + action, 0.0, False))
+    @property
+    def P(self):
+        """ The transition probability matrix, P[s][a] == [(probability, nextstate, reward, done), ...], is a view of
+            compact transition arrays. The arrays need O(goal^2) memory, so they are built the first time P is used.
+            The first outcome of a non-zero stake is a win and the second one is a loss.
+        """
+        if self._P is None:
+            self._P = ArrayTransitions(*self._build_transitions())
+        return self._P
 
-                if state - action == 0:
-                    self.P[state][action].append((1 - self.ph, 0, 0.0, True))
-                else:
-                    self.P[state][action].append((1 - self.ph, state - action, 0.0, False))
+    def transition_arrays(self):
+        """ :return: The next states, probabilities, rewards, done flags and the outcome mask as (nS, nA, 2) arrays. """
+        return self.P.arrays()
 
-        self.P[0][0].append((1.0, 0, 0.0, True))            #terminal states 0 and 100 (staking is not possible)
-        self.P[100][0].append((1.0, 100, 0.0, True))
\ No newline at end of file
+    def stake_values(self, V, gamma, stake, ph=None):
+        """ The action value function Q(s, stake) of all the capitals s that can place the given stake. The capitals
+            form the contiguous range [stake, goal - stake] (or [0, goal] for the zero stake), so the winning and losing
+            capitals are slices of V. A batch of K value functions can be given as a (K, nS) array, together with
+            (K, 1) arrays of discount factors and heads probabilities.
+
+        :param V: The state value function
+        :param gamma: The discount factor
+        :param stake: The stake
+        :param ph: The probability of heads (DEFAULT=the probability of the environment)
+        :return: The first capital of the range and the action values of the capitals in the range
+        """
+        ph = self.ph if ph is None else ph
+        if stake == 0:
+            return 0, gamma * V
+
+        lose, win = gamma * V[..., :self.nS - 2 * stake], gamma * V[..., 2 * stake:]
+        if win.shape[-1]:
+            win[..., -1] += 1.0         # The reward of reaching the goal.
+        return stake, ph * win + (1 - ph) * lose
+
+    def greedy_backup(self, V, gamma, ph=None):
+        """ A Bellman optimality backup of all the capitals, which iterates over the stakes instead of the capitals.
+            A batch of K value functions can be given as a (K, nS) array, together with (K, 1) arrays of discount
+            factors and heads probabilities.
+
+        :param V: The state value function
+        :param gamma: The discount factor
+        :param ph: The probability of heads (DEFAULT=the probability of the environment)
+        :return: The backed-up state value function
+        """
+        ph = self.ph if ph is None else ph
+        _, V_upd = self.stake_values(V, gamma, 0)
+
+        # The (scaled) values of the winning and the losing capitals, computed once per sweep.
+        win = ph * gamma * V
+        win[..., -1:] += ph         # The reward of reaching the goal.
+        lose = (1 - ph) * gamma * V
+
+        q = np.empty(V.shape)
+        for stake in range(1, self.goal // 2 + 1):
+            n = self.nS - 2 * stake
+            np.add(win[..., 2 * stake:], lose[..., :n], out=q[..., :n])
+            np.maximum(V_upd[..., stake:stake + n], q[..., :n], out=V_upd[..., stake:stake + n])
+        return V_upd
+
+    def _build_transitions(self):
+        """ Build the transitions of all the capitals and stakes with array operations.
+
+        :return: The next states, probabilities, rewards, done flags and the outcome mask as (nS, nA, 2) arrays.
+        """
+        goal = self.goal
+        state = np.arange(self.nS)[:, None]
+        action = np.arange(self.nA)[None, :]
+
+        next_states = np.stack(np.broadcast_arrays(state + action, state - action), axis=2)
+        probs = np.stack(np.broadcast_arrays(np.full((self.nS, self.nA), self.ph), 1 - self.ph), axis=2)
+        rewards = (next_states == goal) * np.array([1.0, 0.0])
+        dones = (next_states == goal) | (next_states == 0)
+
+        mask = np.zeros((self.nS, self.nA, 2), dtype=bool)
+        mask[..., :] = ((action >= 1) & (action <= self.max_stakes[:, None]))[..., None]
+
+        # Staking nothing keeps the capital. The capitals 0 and goal are terminal (staking is not possible).
+        next_states[:, 0, 0], probs[:, 0, 0], rewards[:, 0, 0] = state[:, 0], 1.0, 0.0
+        dones[:, 0, 0] = (state[:, 0] == 0) | (state[:, 0] == goal)
+        mask[:, 0, 0] = True
+
+        return next_states, probs, rewards, dones, mask
@@ -0,0 +1,64 @@
+import numpy as np
+from gym import Env
+from gym.spaces import Discrete
+
+
+class GridWorldVecEnv(Env):
+    """ N independent agents in a deterministic grid world (e.g. WindyGridWorldEnv or CliffGridWorldEnv with any set of
+        moves), which are stepped in lockstep. The positions of the agents are an (N,) array of the integer states
+        y * WIDTH + x and a step looks up the next states, the rewards and the done flags of all the agents in flat
+        (nS * nA,) tables with one index array. The dynamics are the ones of the given environment, e.g. an agent that
+        falls off the cliff is sent back to the start without finishing its episode, and a finished agent is reset to
+        the start automatically, so the returned state of a finished agent is the first state of its next episode.
+    """
+
+    def __init__(self, env, n_envs):
+        """ Create the agents.
+
+        :param env: The grid world environment, whose (nS, nA, 1) transition arrays are the dynamics of the agents
+        :param n_envs: The number of agents
+        """
+        next_states, _, rewards, dones, _ = env.transition_arrays()
+        nS, nA = next_states.shape[:2]
+
+        self.num_envs = n_envs
+        self.nS, self.nA = nS, nA
+        self.next_state_table = next_states[:, :, 0].reshape(-1)
+        self.reward_table = rewards[:, :, 0].reshape(-1)
+        self.done_table = dones[:, :, 0].reshape(-1)
+        self.start_state = env.P.encode(env.START_POSITION)
+
+        self.states = np.full(n_envs, self.start_state, dtype=np.int64)
+        self.ep_moves = np.zeros(n_envs, dtype=np.int64)      # The number of steps of the current episode of each agent
+
+        self.action_space = Discrete(nA)
+        self.observation_space = Discrete(nS)
+
+    def reset(self):
+        """ Move all the agents to the start.
+
+        :return: The (N,) states of the agents
+        """
+        self.states[:] = self.start_state
+        self.ep_moves[:] = 0
+        return self.states.copy()
+
+    def step(self, actions):
+        """ Take one action with every agent.
+
+        :param actions: An (N,) integer array with the action of each agent
+        :return: The (N,) states (of the next episodes, for the finished agents), rewards and done flags and an info
+                 dictionary with the final states ('final_states') and the lengths ('episode_lengths') of the episodes
+                 of all the agents, which are meaningful for the finished ones
+        """
+        index = self.states * self.nA + actions
+        final_states = self.next_state_table[index]
+        rewards = self.reward_table[index]
+        dones = self.done_table[index]
+
+        self.ep_moves += 1
+        episode_lengths = self.ep_moves.copy()
+        self.states = np.where(dones, self.start_state, final_states)
+        self.ep_moves[dones] = 0
+
+        return self.states.copy(), rewards, dones, {'final_states': final_states, 'episode_lengths': episode_lengths}
@@ -1,6 +1,49 @@
+from collections.abc import Mapping
 import numpy as np
 from gym.envs.toy_text.discrete import DiscreteEnv
 
+
+class GridWorldTransitions(Mapping):
+    """ The transition probability matrix P[s][a] == [(probability, nextstate, reward, done), ...] of a GridWorld.
+        The transitions of a state are built the first time they are requested and are cached afterwards.
+    """
+
+    def __init__(self, env):
+        self.env = env
+        self.cache = dict()
+
+    def __getitem__(self, state):
+        if state in self.cache:
+            return self.cache[state]
+        if not 0 <= state < self.env.nS:
+            raise KeyError(state)
+
+        env = self.env
+        if env.is_done(state):
+            transitions = {action: [(1.0, state, 0.0, True)] for action in range(env.nA)}
+        else:
+            y, x = env.state_to_coords(state)
+
+            next_state_up = env.coords_to_state((max([0, y-1]), x))
+            next_state_down = env.coords_to_state((min([env.height-1, y+1]), x))
+            next_state_right = env.coords_to_state((y, min([env.width-1, x+1])))
+            next_state_left = env.coords_to_state((y, max([0, x-1])))
+
+            transitions = {env.UP: [(1.0, next_state_up, -1.0, env.is_done(next_state_up))],
+                           env.DOWN: [(1.0, next_state_down, -1.0, env.is_done(next_state_down))],
+                           env.RIGHT: [(1.0, next_state_right, -1.0, env.is_done(next_state_right))],
+                           env.LEFT: [(1.0, next_state_left, -1.0, env.is_done(next_state_left))]}
+
+        self.cache[state] = transitions
+        return transitions
+
+    def __iter__(self):
+        return iter(range(self.env.nS))
+
+    def __len__(self):
+        return self.env.nS
+
+
 class GridWorldEnv(DiscreteEnv):
 
     UP = 0
@@ -17,23 +60,9 @@ class GridWorldEnv(DiscreteEnv):
         self.nS = height * width    # Each cell of the grid is a different state.
         self.isd = np.ones((height, width))/self.nS  # The agent starts from a cell that is chosen uniformly at random.
 
-        self.P = {state: dict() for state in range(self.nS)}  # The transition probability matrix
-        for state in range(self.nS):                          # P[s][a] == [(probability, nextstate, reward, done), ...]
-            if self.is_done(state):
-                for action in range(self.nA):
-                    self.P[state][action] = [(1.0, state, 0.0, True)]
-            else:
-                y, x = self.state_to_coords(state)
-
-                next_state_up = self.coords_to_state((max([0, y-1]), x))
-                next_state_down = self.coords_to_state((min([self.height-1, y+1]), x))
-                next_state_right = self.coords_to_state((y, min([self.width-1, x+1])))
-                next_state_left = self.coords_to_state((y, max([0, x-1])))
-
-                self.P[state][self.UP] = [(1.0, next_state_up, -1.0, self.is_done(next_state_up))]
-                self.P[state][self.DOWN] = [(1.0, next_state_down, -1.0, self.is_done(next_state_down))]
-                self.P[state][self.RIGHT] = [(1.0, next_state_right, -1.0, self.is_done(next_state_right))]
-                self.P[state][self.LEFT] = [(1.0, next_state_left, -1.0, self.is_done(next_state_left))]
+        # The transition probability matrix, P[s][a] == [(probability, nextstate, reward, done), ...], is built lazily.
+        # The DP algorithms use the vectorized moves of the grid (or its compiled model) instead.
+        self.P = GridWorldTransitions(self)
 
         super().__init__(self.nS, self.nA, self.P, self.isd)
 
@@ -48,3 +77,78 @@ class GridWorldEnv(DiscreteEnv):
     def coords_to_state(self, coords):
         y, x = coords
         return y * self.width + x
+
+    def transition_arrays(self):
+        """ Build the transitions of all the states at once, without building P.
+
+        :return: The next states, probabilities, rewards, done flags and the outcome mask as (nS, nA, 1) arrays.
+        """
+        states = np.arange(self.nS)
+        y, x = self.state_to_coords(states)
+        terminal = (states == 0) | (states == self.nS - 1)
+
+        next_states = np.empty((self.nS, self.nA), dtype=np.int64)
+        next_states[:, self.UP] = self.coords_to_state((np.maximum(0, y - 1), x))
+        next_states[:, self.DOWN] = self.coords_to_state((np.minimum(self.height - 1, y + 1), x))
+        next_states[:, self.RIGHT] = self.coords_to_state((y, np.minimum(self.width - 1, x + 1)))
+        next_states[:, self.LEFT] = self.coords_to_state((y, np.maximum(0, x - 1)))
+        next_states[terminal] = states[terminal, None]
+
+        rewards = np.where(terminal[:, None], 0.0, np.full((self.nS, self.nA), -1.0))
+        dones = terminal[next_states]
+        probs = np.ones((self.nS, self.nA))
+        mask = np.ones((self.nS, self.nA), dtype=bool)
+
+        return next_states[..., None], probs[..., None], rewards[..., None], dones[..., None], mask[..., None]
+
+    def successor_values(self, V):
+        """ The value of the next cell for each move, computed as clamped shifts of the value grid.
+
+        :param V: The state value function as a (nS,) or a (height, width) array
+        :return: A (nA, height, width) array with the value of the next cell for each move
+        """
+        V = V.reshape(self.height, self.width)
+        succ = np.empty((self.nA, self.height, self.width))
+
+        succ[self.UP, 1:], succ[self.UP, 0] = V[:-1], V[0]
+        succ[self.DOWN, :-1], succ[self.DOWN, -1] = V[1:], V[-1]
+        succ[self.RIGHT, :, :-1], succ[self.RIGHT, :, -1] = V[:, 1:], V[:, -1]
+        succ[self.LEFT, :, 1:], succ[self.LEFT, :, 0] = V[:, :-1], V[:, 0]
+
+        return succ
+
+    def q_values(self, V, gamma):
+        """ The action value function Q(s, a) = -1 + gamma * V(s') of all the states. It is 0.0 for the terminal states.
+
+        :param V: The state value function
+        :param gamma: The discount factor
+        :return: A (nS, nA) array with the action value function
+        """
+        Q = (-1.0 + gamma * self.successor_values(V)).reshape(self.nA, self.nS).T.copy()
+        Q[[0, self.nS - 1]] = 0.0
+        return Q
+
+    def greedy_backup(self, V, gamma):
+        """ A Bellman optimality backup of all the states. The best next cell is found with element-wise maxima of the
+            clamped shifts of the value grid, so no (state, action) array is built. A batch of K value functions can be
+            given as a (K, nS) array, together with a (K,) array of discount factors.
+
+        :param V: The state value function
+        :param gamma: The discount factor
+        :return: The backed-up state value function as a (nS,) (or (K, nS)) array
+        """
+        V = V.reshape(V.shape[:-1] + (self.height, self.width))
+        best = np.empty_like(V)
+
+        best[..., 1:, :], best[..., 0, :] = V[..., :-1, :], V[..., 0, :]                    # up
+        np.maximum(best[..., :-1, :], V[..., 1:, :], out=best[..., :-1, :])                 # down
+        np.maximum(best[..., -1, :], V[..., -1, :], out=best[..., -1, :])
+        np.maximum(best[..., :, :-1], V[..., :, 1:], out=best[..., :, :-1])                 # right
+        np.maximum(best[..., :, -1], V[..., :, -1], out=best[..., :, -1])
+        np.maximum(best[..., :, 1:], V[..., :, :-1], out=best[..., :, 1:])                  # left
+        np.maximum(best[..., :, 0], V[..., :, 0], out=best[..., :, 0])
+
+        gamma = np.asarray(gamma)[..., None, None]
+        V_upd = (-1.0 + gamma * best).reshape(V.shape[:-2] + (self.nS,))
+        V_upd[..., [0, self.nS - 1]] = 0.0
+        return V_upd
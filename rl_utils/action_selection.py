@@ -0,0 +1,110 @@
+import numpy as np
+
+
+class EpsilonGreedy:
+    """ An epsilon-greedy action selection kernel. Each selection uses one uniform number from a pre-drawn block,
+        instead of building a probability array and calling np.random.choice: if u < epsilon, the action is selected
+        uniformly at random with u / epsilon, otherwise the greedy action is selected. So, every action has a
+        probability of epsilon / nA and the greedy action an extra 1 - epsilon, which is the distribution of
+        np.random.choice(nA, p=prob).
+
+        Optionally, the selector keeps the number of updates of each state for a GLIE policy, whose epsilon decays as
+        n0 / (n0 + N(s)) with the number of updates N(s) of the state.
+    """
+
+    def __init__(self, nA, random_ties=False, block_size=4096, rng=None, nS=None, n0=10):
+        """ Create an action selector.
+
+        :param nA: The number of actions
+        :param random_ties: Whether the ties of the greedy action are broken uniformly at random. Otherwise, the first
+                            greedy action is selected, like np.argmax.
+        :param block_size: The number of uniform numbers that are drawn at once
+        :param rng: The random number generator, a np.random.RandomState or the np.random module (DEFAULT=np.random)
+        :param nS: The number of states, or the shape of the counts, e.g. (K, nS) for K agents, if the selector keeps
+                   the number of updates of each state (DEFAULT=None, no counts)
+        :param n0: The constant n0 of the decaying epsilon
+        """
+        self.nA = nA
+        self.random_ties = random_ties
+        self.block_size = block_size
+        self.rng = rng
+        self.n0 = n0
+        self.n_state = None if nS is None else np.zeros(nS)   # The number of updates N(s) of each state.
+
+        self._block = []
+        self._next = 0
+
+    def __getstate__(self):
+        # A copy of the selector (e.g. in a worker process) must not replay the uniform numbers of the original one.
+        state = self.__dict__.copy()
+        state['_block'], state['_next'] = [], 0
+        return state
+
+    def uniform(self):
+        """ :return: The next pre-drawn uniform number in [0, 1). """
+        if self._next == len(self._block):
+            rng = np.random if self.rng is None else self.rng
+            self._block = rng.random_sample(self.block_size).tolist()
+            self._next = 0
+        u = self._block[self._next]
+        self._next += 1
+        return u
+
+    def epsilon(self, state):
+        """ :return: The decaying epsilon n0 / (n0 + N(s)) of a state, or of an array (or a tuple) index of states. """
+        return self.n0 / (self.n0 + self.n_state[state])
+
+    def count(self, state):
+        """ Count an update of a state, or of the states of an index without repetitions, e.g. (agents, states). """
+        self.n_state[state] += 1
+
+    def count_batch(self, states):
+        """ Count the updates of a (1-D) array of states, which may repeat. """
+        self.n_state += np.bincount(states, minlength=len(self.n_state))
+
+    def select_decaying(self, q_s, state):
+        """ Select an action epsilon-greedily with the decaying epsilon of the state.
+
+        :param q_s: The (nA,) action values of the state
+        :param state: The state
+        :return: The selected action
+        """
+        return self.select(q_s, self.epsilon(state))
+
+    def select(self, q_s, epsilon):
+        """ Select an action epsilon-greedily.
+
+        :param q_s: The (nA,) action values of the current state
+        :param epsilon: The probability of selecting an action uniformly at random
+        :return: The selected action
+        """
+        u = self.uniform()
+        if u < epsilon:             # Explore. u / epsilon is uniform in [0, 1).
+            return min(int(u / epsilon * self.nA), self.nA - 1)
+        if not self.random_ties:
+            return int(q_s.argmax())
+        greedy = np.flatnonzero(q_s == q_s.max())   # (u - epsilon) / (1 - epsilon) is uniform in [0, 1).
+        return int(greedy[int((u - epsilon) / (1 - epsilon) * len(greedy))])
+
+    def select_with_prob(self, q_s, epsilon):
+        """ Select an action epsilon-greedily and return its probability, e.g. for importance sampling.
+
+        :param q_s: The (nA,) action values of the current state
+        :param epsilon: The probability of selecting an action uniformly at random
+        :return: The selected action and its probability under the epsilon-greedy policy
+        """
+        u = self.uniform()
+        if self.random_ties:
+            greedy = np.flatnonzero(q_s == q_s.max())
+        else:
+            greedy = [int(q_s.argmax())]
+
+        if u < epsilon:
+            action = min(int(u / epsilon * self.nA), self.nA - 1)
+        else:
+            action = int(greedy[int((u - epsilon) / (1 - epsilon) * len(greedy))])
+
+        prob = epsilon / self.nA
+        if action in greedy:
+            prob += (1 - epsilon) / len(greedy)
+        return action, prob
@@ -0,0 +1,323 @@
+import heapq
+import numpy as np
+from rl_utils.history import HistoryRecorder
+
+
+def expected_next_values(model, V):
+    """ Compute the expected value of the next state, sum_s' P(s'|s, a) V(s'), for every (state, action) pair at once.
+
+    :param model: The compiled model of the environment
+    :param V: The state value function
+    :return: A (nS, nA) array with the expected value of the next state
+    """
+    return np.bincount(model.rows, weights=model.probs * V[model.next_states],
+                       minlength=model.nS * model.nA).reshape(model.nS, model.nA)
+
+
+def q_values(model, V, gamma):
+    """ The one-step lookahead Q = R + gamma * P.V for all the (state, action) pairs. Unavailable actions get a value
+        of 0.0.
+
+    :param model: The compiled model of the environment
+    :param V: The state value function
+    :param gamma: The discount factor
+    :return: A (nS, nA) array with the action value function
+    """
+    return model.R + gamma * expected_next_values(model, V)
+
+
+def greedy_backup(model, V, gamma):
+    """ A Bellman optimality backup of all the states. Unavailable actions are ignored (their value is -inf).
+
+    :param model: The compiled model of the environment
+    :param V: The state value function
+    :param gamma: The discount factor
+    :return: The backed-up state value function and the action value function it was computed from
+    """
+    Q = np.where(model.valid, q_values(model, V, gamma), -np.inf)
+    return np.max(Q, axis=1), Q
+
+
+def policy_backup(model, V, pi, gamma):
+    """ A Bellman expectation backup of all the states for the given policy.
+
+    :param model: The compiled model of the environment
+    :param V: The state value function
+    :param pi: A (nS, nA) array with the probability of each action in each state
+    :param gamma: The discount factor
+    :return: The backed-up state value function
+    """
+    return np.sum(pi * q_values(model, V, gamma), axis=1)
+
+
+def policy_matrix(model, policy):
+    """ Convert a policy from the 2-level dictionary format of the DP scripts to a (nS, nA) probability array.
+
+    :param model: The compiled model of the environment
+    :param policy: A 2-level dictionary with (state, action) as key and a probability as the value
+    :return: A (nS, nA) array with the probability of each action in each state
+    """
+    pi = np.zeros((model.nS, model.nA))
+    for state, actions in policy.items():
+        s = model.encode(state)
+        for action, probability in actions.items():
+            pi[s, action] = probability
+    return pi
+
+
+def value_iteration(model, gamma, eps, V0=None, V_history=None):
+    """ Synchronous value iteration with vectorized sweeps.
+
+    :param model: The compiled model of the environment
+    :param gamma: The discount factor
+    :param eps: The algorithm terminates once the value function change is less than eps for all states
+    :param V0: The initial state value function (DEFAULT=zeros)
+    :param V_history: The history recorder of the state value functions (DEFAULT=a recorder that keeps all of them)
+    :return: The history of the state value function of each sweep and the action value function of the last one
+    """
+    V = np.zeros(model.nS) if V0 is None else np.array(V0, dtype=float)
+    V_history = HistoryRecorder() if V_history is None else V_history
+    V_history.append(V)
+    diff = np.inf
+
+    while diff > eps:
+        V_upd, Q = greedy_backup(model, V, gamma)
+        diff = np.max(np.abs(V_upd - V))
+        V = V_upd
+        V_history.append(V)
+
+    V_history.close()
+    return V_history, Q
+
+
+def policy_evaluation(model, pi, gamma, eps, V_history=None):
+    """ Iterative policy evaluation with vectorized sweeps.
+
+    :param model: The compiled model of the environment
+    :param pi: A (nS, nA) array with the probability of each action in each state
+    :param gamma: The discount factor
+    :param eps: The algorithm terminates once the value function change is less than eps for all states
+    :param V_history: The history recorder of the state value functions (DEFAULT=a recorder that keeps all of them)
+    :return: The history of the state value function of each sweep
+    """
+    V = np.zeros(model.nS)
+    V_history = HistoryRecorder() if V_history is None else V_history
+    V_history.append(V)
+    diff = np.inf
+
+    while diff > eps:
+        V_upd = policy_backup(model, V, pi, gamma)
+        diff = np.max(np.abs(V_upd - V))
+        V = V_upd
+        V_history.append(V)
+
+    V_history.close()
+    return V_history
+
+
+def policy_actions(pi):
+    """ Convert a (nS, nA) policy array to an integer array with the action of each state, where the states with a
+        stochastic policy get the action -1.
+
+    :param pi: A (nS, nA) array with the probability of each action in each state
+    :return: A (nS,) integer array with the action of each state
+    """
+    actions = np.argmax(pi, axis=1)
+    actions[np.max(pi, axis=1) < 1.0] = -1
+    return actions
+
+
+def greedy_policy(model, Q, policy=None, tol=0.0):
+    """ Select a greedy action in each state. When a previous policy is given, its action is kept in the states where
+        it is still within tol of the best one, so that ties (and round-off noise) do not change the policy.
+
+    :param model: The compiled model of the environment
+    :param Q: A (nS, nA) array with the action value function
+    :param policy: A (nS,) integer array with the action of the previous policy in each state or None
+    :param tol: The tolerance within which the action of the previous policy is considered optimal
+    :return: A (nS,) integer array with the greedy action in each state
+    """
+    Q = np.where(model.valid, Q, -np.inf)
+    greedy = np.argmax(Q, axis=1)
+    if policy is not None:
+        keep = Q[np.arange(model.nS), policy] >= Q[np.arange(model.nS), greedy] - tol
+        greedy = np.where(keep, policy, greedy)
+    return greedy
+
+
+def modified_policy_iteration(model, pi, gamma, n_sweeps, eps, tol=None, policy_history=None, V_history=None):
+    """ Modified policy iteration. Each policy is evaluated with (at most) n_sweeps sweeps, which start from the value
+        function of the previous policy, and then it is improved greedily. The algorithm terminates once the policy is
+        stable (the same integer actions) and its evaluation has converged.
+
+    :param model: The compiled model of the environment
+    :param pi: A (nS, nA) array with the probability of each action in each state of the initial policy
+    :param gamma: The discount factor
+    :param n_sweeps: The maximum number of evaluation sweeps per policy
+    :param eps: The evaluation of a policy stops once the value function change is less than eps for all states
+    :param tol: The tolerance within which the action of the previous policy is kept (DEFAULT=eps)
+    :param policy_history: The history recorder of the policies (DEFAULT=a recorder that keeps all of them)
+    :param V_history: The history recorder of the state value functions (DEFAULT=a recorder that keeps all of them)
+    :return: The histories of the policy (as integer actions, see policy_actions) and of the state value function of
+             each step and the total number of evaluation sweeps
+    """
+    tol = eps if tol is None else tol
+    V = np.zeros(model.nS)
+    policy = None
+    policy_history = HistoryRecorder() if policy_history is None else policy_history
+    V_history = HistoryRecorder() if V_history is None else V_history
+    total_sweeps = 0
+
+    while True:
+        diff = np.inf
+        for _ in range(n_sweeps):
+            V_upd = policy_backup(model, V, pi, gamma)
+            diff = np.max(np.abs(V_upd - V))
+            V = V_upd
+            total_sweeps += 1
+            if diff <= eps:
+                break
+        policy_history.append(policy_actions(pi) if policy is None else policy)
+        V_history.append(V)
+
+        new_policy = greedy_policy(model, q_values(model, V, gamma), policy, tol)
+        if policy is not None and diff <= eps and np.array_equal(new_policy, policy):
+            break
+        policy = new_policy
+        pi = np.zeros((model.nS, model.nA))
+        pi[np.arange(model.nS), policy] = 1.0
+
+    policy_history.close()
+    V_history.close()
+    return policy_history, V_history, total_sweeps
+
+
+def predecessors(model):
+    """ Find the predecessors of every state, i.e. the states with an action that may lead to it, from the CSR arrays of
+        the compiled model. The predecessors of the state s' are stored in the slice indptr[s']:indptr[s' + 1].
+
+    :param model: The compiled model of the environment
+    :return: The (nS + 1,) offsets, the predecessor states and the probability of the transition of each predecessor
+    """
+    order = np.argsort(model.next_states, kind='stable')
+    indptr = np.zeros(model.nS + 1, dtype=np.int64)
+    np.cumsum(np.bincount(model.next_states, minlength=model.nS), out=indptr[1:])
+    return indptr, model.rows[order] // model.nA, model.probs[order]
+
+
+def state_ordering(model, ordering):
+    """ The order in which the non-terminal states are backed up by Gauss-Seidel value iteration.
+
+    :param model: The compiled model of the environment
+    :param ordering: 'index' (0, 1, ..., nS-1), 'reverse' (nS-1, ..., 0) or 'distance' (increasing number of moves
+                     to a terminal state, so that values flow away from the terminal states within a single sweep)
+    :return: An integer array with the non-terminal states in the order of their backups
+    """
+    if ordering == 'index':
+        order = np.arange(model.nS)
+    elif ordering == 'reverse':
+        order = np.arange(model.nS)[::-1]
+    elif ordering == 'distance':
+        # Breadth-first search from the terminal states, over the reversed transitions. The states that never reach a
+        # terminal state are backed up last.
+        indptr, pred_states, _ = predecessors(model)
+        distance = np.full(model.nS, np.iinfo(np.int64).max)
+        frontier = np.flatnonzero(model.terminal)
+        distance[frontier] = 0
+        depth = 0
+        while frontier.size:
+            depth += 1
+            preds = np.unique(np.concatenate([pred_states[indptr[s]:indptr[s + 1]] for s in frontier]))
+            frontier = preds[distance[preds] > depth]
+            distance[frontier] = depth
+        order = np.argsort(distance, kind='stable')
+    else:
+        raise ValueError(f"Unknown state ordering: {ordering}")
+    return order[~model.terminal[order]]
+
+
+def _state_backup(model, V, gamma, s, actions):
+    """ A Bellman optimality backup of a single state.
+
+    :param model: The compiled model of the environment
+    :param V: The state value function
+    :param gamma: The discount factor
+    :param s: The state
+    :param actions: The action of each outcome of the compiled model (model.rows % model.nA)
+    :return: The backed-up value of the state
+    """
+    lo, hi = model.indptr[s * model.nA], model.indptr[(s + 1) * model.nA]
+    q = model.R[s] + gamma * np.bincount(actions[lo:hi], weights=model.probs[lo:hi] * V[model.next_states[lo:hi]],
+                                         minlength=model.nA)
+    return np.max(q[model.valid[s]])
+
+
+def gauss_seidel_value_iteration(model, gamma, eps, ordering='index', V0=None):
+    """ Value iteration with in-place (Gauss-Seidel) sweeps. Each backup reads the values that were already updated
+        during the current sweep, so values can flow through many states in a single sweep.
+
+    :param model: The compiled model of the environment
+    :param gamma: The discount factor
+    :param eps: The algorithm terminates once the value function change of a sweep is less than eps for all states
+    :param ordering: The order of the backups, see state_ordering
+    :param V0: The initial state value function (DEFAULT=zeros)
+    :return: The state value function and the number of (single state) backups
+    """
+    order = state_ordering(model, ordering).tolist()
+    actions = model.rows % model.nA
+    V = np.zeros(model.nS) if V0 is None else np.array(V0, dtype=float)
+    n_backups = 0
+    diff = np.inf
+
+    while diff > eps:
+        diff = 0.0
+        for s in order:
+            v = _state_backup(model, V, gamma, s, actions)
+            diff = max(diff, abs(v - V[s]))
+            V[s] = v
+        n_backups += len(order)
+
+    return V, n_backups
+
+
+def prioritized_sweeping_value_iteration(model, gamma, tol, V0=None):
+    """ Value iteration with prioritized sweeping. A heap holds the states keyed by their Bellman error and the state
+        with the largest error is backed up first. When the value of a state changes, the priority of each predecessor
+        is raised to gamma * P(s'|s, a) * |change|, and it is pushed to the heap only if the priority exceeds tol.
+
+    :param model: The compiled model of the environment
+    :param gamma: The discount factor
+    :param tol: The smallest priority of a state that is backed up
+    :param V0: The initial state value function (DEFAULT=zeros)
+    :return: The state value function and the number of (single state) backups
+    """
+    pred_indptr, pred_states, pred_probs = predecessors(model)
+    actions = model.rows % model.nA
+    V = np.zeros(model.nS) if V0 is None else np.array(V0, dtype=float)
+
+    # The initial priorities are the Bellman errors of all the states.
+    priority = np.abs(greedy_backup(model, V, gamma)[0] - V)
+    priority[model.terminal] = 0.0
+    heap = [(-p, s) for s, p in enumerate(priority.tolist()) if p > tol]
+    heapq.heapify(heap)
+    n_backups = 0
+
+    while heap:
+        p, s = heapq.heappop(heap)
+        if -p != priority[s]:       # A stale entry. The state was pushed again with a higher priority.
+            continue
+        priority[s] = 0.0
+
+        v = _state_backup(model, V, gamma, s, actions)
+        change = abs(v - V[s])
+        V[s] = v
+        n_backups += 1
+
+        lo, hi = pred_indptr[s], pred_indptr[s + 1]
+        for pred, prob in zip(pred_states[lo:hi].tolist(), pred_probs[lo:hi].tolist()):
+            p = gamma * prob * change
+            if p > tol and p > priority[pred] and not model.terminal[pred]:
+                priority[pred] = p
+                heapq.heappush(heap, (-p, pred))
+
+    return V, n_backups
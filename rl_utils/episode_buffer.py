@@ -0,0 +1,229 @@
+import numpy as np
+
+
+class EpisodeBuffer:
+    """ A struct-of-arrays buffer of the steps of many episodes. The (encoded) states, the actions, the rewards and the
+        probabilities of the actions under the behavior policy are recorded into preallocated arrays, which grow when
+        they are full, and the returns, the first-visit masks and the importance sampling ratios of all the recorded
+        episodes are computed with array operations. The step arrays are concatenated in episode order, so the steps of
+        an episode are the slice between its start and its end.
+    """
+
+    def __init__(self, capacity=1024):
+        """ Create an empty buffer.
+
+        :param capacity: The initial number of steps of the arrays
+        """
+        self._states = np.empty(capacity, dtype=np.int64)
+        self._actions = np.empty(capacity, dtype=np.int64)
+        self._rewards = np.empty(capacity)
+        self._probs = np.empty(capacity)
+        self._ends = []         # The end (exclusive) of each finished episode.
+        self.n_steps = 0
+
+    @classmethod
+    def from_arrays(cls, states, actions, rewards, probs, ends):
+        """ Wrap existing step arrays (e.g. the memory-mapped arrays of an episode log) in a buffer without copying
+            them. The steps of the arrays must be finished episodes.
+
+        :param states: The states of the steps
+        :param actions: The actions of the steps
+        :param rewards: The rewards of the steps
+        :param probs: The probabilities of the actions under the behavior policy
+        :param ends: The end (exclusive) of each episode
+        :return: The buffer
+        """
+        buffer = cls(capacity=0)
+        buffer._states, buffer._actions, buffer._rewards, buffer._probs = states, actions, rewards, probs
+        buffer._ends = list(ends)
+        buffer.n_steps = len(states)
+        return buffer
+
+    @property
+    def n_episodes(self):
+        """ :return: The number of finished episodes. """
+        return len(self._ends)
+
+    @property
+    def states(self):
+        """ :return: The states of the recorded steps. """
+        return self._states[:self.n_steps]
+
+    @property
+    def actions(self):
+        """ :return: The actions of the recorded steps. """
+        return self._actions[:self.n_steps]
+
+    @property
+    def rewards(self):
+        """ :return: The rewards of the recorded steps. """
+        return self._rewards[:self.n_steps]
+
+    @property
+    def probs(self):
+        """ :return: The probabilities of the actions of the recorded steps under the behavior policy. """
+        return self._probs[:self.n_steps]
+
+    def append(self, state, action, reward, prob=1.0):
+        """ Record a step of the current episode.
+
+        :param state: The (encoded) state
+        :param action: The action that was taken in the state
+        :param reward: The reward of the transition
+        :param prob: The probability of the action under the behavior policy
+        """
+        n = self.n_steps
+        if n == len(self._states):
+            self._grow()
+        self._states[n] = state
+        self._actions[n] = action
+        self._rewards[n] = reward
+        self._probs[n] = prob
+        self.n_steps = n + 1
+
+    def end_episode(self):
+        """ Mark the recorded steps since the previous episode as a finished episode. """
+        self._ends.append(self.n_steps)
+
+    def clear(self):
+        """ Discard all the recorded steps and episodes, keeping the allocated arrays. """
+        self._ends = []
+        self.n_steps = 0
+
+    def bounds(self):
+        """ :return: The start and the (exclusive) end of each finished episode. """
+        ends = np.array(self._ends, dtype=np.int64)
+        starts = np.zeros_like(ends)
+        starts[1:] = ends[:-1]
+        return starts, ends
+
+    def episode_ids(self):
+        """ :return: The index of the episode of each step. """
+        starts, ends = self.bounds()
+        return np.repeat(np.arange(len(ends)), ends - starts)
+
+    def returns(self, gamma):
+        """ Compute the discounted return G(t) = R(t+1) + gamma * G(t+1) of every step. The recursion runs backwards
+            over the steps of all the episodes at once, one step from the end of each episode per iteration, so the
+            number of iterations is the length of the longest episode and the arithmetic is the one of the
+            reversed loop over a single episode.
+
+        :param gamma: The discount factor
+        :return: The return of each step
+        """
+        starts, ends = self.bounds()
+        lengths = ends - starts
+        g = self.rewards.astype(np.float64)
+        for k in range(1, lengths.max(initial=0)):
+            live = ends[lengths > k]
+            g[live - 1 - k] += gamma * g[live - k]
+        return g
+
+    def suffix_sums(self, values, exclusive=False):
+        """ Sum the given values of each step and of the following steps of its episode.
+
+        :param values: A value for each step, or an array of them along the last axis, e.g. one row per policy
+        :param exclusive: Whether the value of the step itself is excluded from its sum
+        :return: The sum of each step
+        """
+        values = np.asarray(values)
+        sums = np.zeros(values.shape[:-1] + (self.n_steps + 1,), dtype=np.result_type(values, np.float64))
+        sums[..., :-1] = np.cumsum(values[..., ::-1], axis=-1)[..., ::-1]
+        starts, ends = self.bounds()
+        suffix = sums[..., :-1] - sums[..., np.repeat(ends, ends - starts)]
+        return suffix - values if exclusive else suffix
+
+    def prefix_sums(self, values, exclusive=False):
+        """ Sum the given values of each step and of the previous steps of its episode.
+
+        :param values: A value for each step, or an array of them along the last axis, e.g. one row per policy
+        :param exclusive: Whether the value of the step itself is excluded from its sum
+        :return: The sum of each step
+        """
+        values = np.asarray(values)
+        sums = np.zeros(values.shape[:-1] + (self.n_steps + 1,), dtype=np.result_type(values, np.float64))
+        sums[..., 1:] = np.cumsum(values, axis=-1)
+        starts, ends = self.bounds()
+        prefix = sums[..., 1:] - sums[..., np.repeat(starts, ends - starts)]
+        return prefix - values if exclusive else prefix
+
+    def first_visit_mask(self, *keys):
+        """ Find the first visits of each key, e.g. a state or a (state, action) pair, in each episode.
+
+        :param keys: One or more integer arrays with a component of the key of each step, e.g. buffer.states
+        :return: A boolean array, which is True for the first step of each key in each episode
+        """
+        flat = self.episode_ids()
+        for key in keys:
+            key = np.asarray(key, dtype=np.int64)
+            flat = flat * (int(key.max(initial=0)) + 1) + key
+        _, first = np.unique(flat, return_index=True)
+        mask = np.zeros(self.n_steps, dtype=bool)
+        mask[first] = True
+        return mask
+
+    def first_visit_returns(self, gamma):
+        """ :return: The states, the actions and the returns of the first visit of each (state, action) pair in each
+                 episode, e.g. for the first-visit Monte Carlo control algorithms.
+        """
+        first = self.first_visit_mask(self.states, self.actions)
+        return self.states[first], self.actions[first], self.returns(gamma)[first]
+
+    def importance_ratios(self, target_probs, exclusive=False, prefix=False):
+        """ Compute the cumulative importance sampling ratio of each step, the product of the ratios
+            target_prob / behavior_prob of the step and of the following steps of its episode (or of the previous
+            steps, with prefix=True). The products are computed as sums of logarithms, so a zero target probability
+            truncates the products that contain it to zero.
+
+        :param target_probs: The probability of the action of each step under the target policy, or an array of them
+                             along the last axis, e.g. one row per target policy
+        :param exclusive: Whether the ratio of the step itself is excluded, e.g. for the state-action values
+        :param prefix: Whether the products run from the start of the episode to the step, e.g. for per-decision
+                       importance sampling, instead of from the step to the end of the episode
+        :return: The cumulative ratio of each step
+        """
+        with np.errstate(divide='ignore'):
+            log_ratios = np.log(target_probs) - np.log(self.probs)
+        # An impossible action (-inf) is counted separately, so that the sums of the logarithms stay finite.
+        impossible = np.isneginf(log_ratios)
+        log_ratios[impossible] = 0.0
+        cumulative_sums = self.prefix_sums if prefix else self.suffix_sums
+        ratios = np.exp(cumulative_sums(log_ratios, exclusive))
+        ratios[cumulative_sums(impossible, exclusive) > 0] = 0.0
+        return ratios
+
+    def _grow(self):
+        """ Double the capacity of the step arrays. """
+        capacity = max(2 * len(self._states), 1024)
+        for name in ('_states', '_actions', '_rewards', '_probs'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+
+def scatter_mean(Q, N, index, values, weights=None):
+    """ Add a batch of (weighted) samples to running averages with a single scatter-add. Each sample is added to the
+        entry of its index, so that every entry is the (weighted) average of all its samples:
+        Q <- Q + (sum(w * g) - sum(w) * Q) / (N + sum(w)) and N <- N + sum(w).
+
+    :param Q: The array of the averages, which is updated in place
+    :param N: The array of the (weighted) counts, with the shape of Q, which is updated in place. Integer counts need
+              integer weights.
+    :param index: The flat indices of the samples, or a tuple of index arrays into Q, e.g. (states, actions)
+    :param values: The values of the samples
+    :param weights: The weights of the samples (DEFAULT=1 for every sample)
+    :return: The flat indices of the updated entries
+    """
+    if isinstance(index, tuple):
+        index = np.ravel_multi_index(index, Q.shape)
+    weights = np.ones(len(index)) if weights is None else weights
+
+    dN = np.bincount(index, weights, minlength=Q.size)
+    dS = np.bincount(index, weights * values, minlength=Q.size)
+    updated = np.flatnonzero(dN)
+
+    q, n = Q.reshape(-1), N.reshape(-1)
+    n[updated] += dN[updated].astype(n.dtype, copy=False)      # e.g. integer visit counts
+    q[updated] += (dS[updated] - dN[updated] * q[updated]) / n[updated]
+    return updated
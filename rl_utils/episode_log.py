@@ -0,0 +1,203 @@
+import os
+import json
+import numpy as np
+from rl_utils.episode_buffer import EpisodeBuffer
+
+
+class EpisodeLogWriter:
+    """ A recorder of episodes into an on-disk episode log. The log is a directory of chunks, each one a set of .npy
+        files with the flat step arrays (states, actions, rewards and behavior probabilities) of a number of episodes
+        and an index with the offset of the first step of each episode, plus a meta.json file with the number of
+        episodes and steps of each chunk. The states and the actions are stored in the smallest integer type that fits
+        them and the rewards in single precision, when they are exactly representable, so e.g. a Blackjack step takes
+        14 bytes.
+    """
+
+    ARRAYS = ('states', 'actions', 'rewards', 'probs')
+
+    def __init__(self, path, chunk_episodes=100000, metadata=None):
+        """ Create an empty log.
+
+        :param path: The directory of the log, which is created if it does not exist
+        :param chunk_episodes: The number of episodes of each chunk
+        :param metadata: A JSON serializable dictionary that is stored with the log, e.g. the environment and the
+                         behavior policy
+        """
+        self.path = path
+        self.chunk_episodes = chunk_episodes
+        self.metadata = dict() if metadata is None else metadata
+
+        self.chunks = []        # The number of episodes and steps of each written chunk.
+        self._buffer = EpisodeBuffer()
+        os.makedirs(path, exist_ok=True)
+
+    def append(self, state, action, reward, prob=1.0):
+        """ Record a step of the current episode.
+
+        :param state: The (encoded) state
+        :param action: The action that was taken in the state
+        :param reward: The reward of the transition
+        :param prob: The probability of the action under the behavior policy
+        """
+        self._buffer.append(state, action, reward, prob)
+
+    def end_episode(self):
+        """ Finish the current episode and write a chunk, when it has chunk_episodes episodes. """
+        self._buffer.end_episode()
+        if self._buffer.n_episodes == self.chunk_episodes:
+            self._write_chunk()
+
+    def close(self):
+        """ Write the last chunk and the meta.json file of the log. """
+        if self._buffer.n_episodes > 0:
+            self._write_chunk()
+        meta = {'n_episodes': sum(n for n, _ in self.chunks), 'n_steps': sum(n for _, n in self.chunks),
+                'chunks': [{'n_episodes': n_episodes, 'n_steps': n_steps} for n_episodes, n_steps in self.chunks],
+                'metadata': self.metadata}
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write_chunk(self):
+        """ Write the recorded episodes as the next chunk and clear the buffer. """
+        buffer = self._buffer
+        arrays = {'states': _compact_int(buffer.states), 'actions': _compact_int(buffer.actions),
+                  'rewards': _compact_float(buffer.rewards), 'probs': buffer.probs,
+                  'offsets': np.concatenate(([0], buffer.bounds()[1]))}
+        for name, array in arrays.items():
+            np.save(_chunk_file(self.path, len(self.chunks), name), array)
+        self.chunks.append((buffer.n_episodes, buffer.n_steps))
+        buffer.clear()
+
+
+class EpisodeLog:
+    """ A reader of an episode log, whose files are memory-mapped, so the episodes are read from the disk on demand
+        and the batches of episodes are views of the mapped arrays.
+    """
+
+    def __init__(self, path):
+        """ Open a log.
+
+        :param path: The directory of the log
+        """
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        self.path = path
+        self.n_episodes = meta['n_episodes']
+        self.n_steps = meta['n_steps']
+        self.chunks = [(chunk['n_episodes'], chunk['n_steps']) for chunk in meta['chunks']]
+        self.metadata = meta['metadata']
+
+        self._arrays = dict()   # The memory-mapped arrays of the opened chunks.
+
+    def batches(self, batch_size, n_episodes=None):
+        """ Iterate over the episodes of the log in batches. A batch does not span two chunks, so it ends at a
+            multiple of batch_size episodes or at the end of a chunk, and its step arrays are views of the mapped
+            files.
+
+        :param batch_size: The maximum number of episodes of a batch
+        :param n_episodes: The number of episodes to read from the start of the log (DEFAULT=all of them)
+        :return: A generator of episode buffers
+        """
+        n_episodes = self.n_episodes if n_episodes is None else n_episodes
+        if n_episodes > self.n_episodes:
+            raise ValueError(f"The episode log {self.path} has {self.n_episodes} episodes, not {n_episodes}")
+        first = 0               # The index of the first episode of the chunk in the log.
+        for chunk, (chunk_episodes, _) in enumerate(self.chunks):
+            if first >= n_episodes:
+                break
+            arrays = self._chunk(chunk)
+            offsets = arrays['offsets']
+
+            start = 0
+            while start < chunk_episodes and first + start < n_episodes:
+                # The batch ends at the next multiple of batch_size, at the end of the chunk or at the last episode.
+                stop = ((first + start) // batch_size + 1) * batch_size
+                end = min(chunk_episodes, n_episodes - first, stop - first)
+                steps = slice(offsets[start], offsets[end])
+                yield EpisodeBuffer.from_arrays(*(arrays[name][steps] for name in EpisodeLogWriter.ARRAYS),
+                                                offsets[start + 1:end + 1] - offsets[start])
+                start = end
+            first += chunk_episodes
+
+    def _chunk(self, chunk):
+        """ :return: A dictionary with the memory-mapped arrays of a chunk. """
+        if chunk not in self._arrays:
+            self._arrays[chunk] = {name: np.load(_chunk_file(self.path, chunk, name), mmap_mode='r')
+                                   for name in EpisodeLogWriter.ARRAYS + ('offsets',)}
+        return self._arrays[chunk]
+
+
+def record_episodes(env, encoder, behavior_fn, n_episodes, path, exploring_starts=False, chunk_episodes=100000,
+                    metadata=None):
+    """ Sample episodes from an environment with a behavior policy and record them into an episode log.
+
+    :param env: The environment, e.g. BlackjackEnv or Easy21Env
+    :param encoder: The encoder of the observations of the environment
+    :param behavior_fn: The behavior policy, a function of an observation that returns an action and its probability
+    :param n_episodes: The number of episodes to record
+    :param path: The directory of the log
+    :param exploring_starts: Whether each episode starts from a random state of the observation space
+    :param chunk_episodes: The number of episodes of each chunk
+    :param metadata: A JSON serializable dictionary that is stored with the log
+    :return: A reader of the recorded log
+    """
+    with EpisodeLogWriter(path, chunk_episodes, metadata) as writer:
+        for _ in range(n_episodes):
+            done = False
+            curr_obs = env.reset(env.observation_space.sample()) if exploring_starts else env.reset()
+            while not done:
+                action, prob = behavior_fn(curr_obs)
+                next_obs, r, done, _ = env.step(action)
+                writer.append(encoder.encode(curr_obs), action, r, prob)
+                curr_obs = next_obs
+            writer.end_episode()
+    return EpisodeLog(path)
+
+
+def open_or_record_episodes(env, encoder, behavior_fn, n_episodes, path, exploring_starts=False, metadata=None):
+    """ Open an episode log, or record it with record_episodes, if it does not exist yet. So, the episodes are sampled
+        once and replayed by the following runs. An existing log must have at least n_episodes episodes.
+
+    :param env: The environment, e.g. BlackjackEnv or Easy21Env
+    :param encoder: The encoder of the observations of the environment
+    :param behavior_fn: The behavior policy, a function of an observation that returns an action and its probability
+    :param n_episodes: The number of episodes to record, or to replay from an existing log
+    :param path: The directory of the log
+    :param exploring_starts: Whether each episode starts from a random state of the observation space
+    :param metadata: A JSON serializable dictionary, which describes the environment and the behavior policy. An
+                     existing log must have been recorded with the same metadata.
+    :return: A reader of the log
+    """
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        return record_episodes(env, encoder, behavior_fn, n_episodes, path, exploring_starts, metadata=metadata)
+
+    log = EpisodeLog(path)
+    if metadata is not None and log.metadata != metadata:
+        raise ValueError(f"The episode log {path} was recorded with {log.metadata}, not with {metadata}")
+    if log.n_episodes < n_episodes:
+        raise ValueError(f"The episode log {path} has {log.n_episodes} episodes, fewer than the {n_episodes} requested")
+    return log
+
+
+def _chunk_file(path, chunk, name):
+    """ :return: The path of an array of a chunk. """
+    return os.path.join(path, f'chunk_{chunk:05d}_{name}.npy')
+
+
+def _compact_int(array):
+    """ :return: The array in the smallest integer type that fits its values. """
+    if len(array) == 0:
+        return array
+    return array.astype(np.result_type(np.min_scalar_type(array.min()), np.min_scalar_type(array.max())))
+
+
+def _compact_float(array):
+    """ :return: The array in single precision, if it is exactly representable, otherwise the array. """
+    single = array.astype(np.float32)
+    return single if np.array_equal(single, array) else array
@@ -0,0 +1,138 @@
+import struct
+from collections import deque
+import numpy as np
+
+
+class HistoryRecorder:
+    """ A history of the arrays (e.g. the value functions) of the iterations of an algorithm, with bounded memory.
+
+        The recorder behaves like a read-only list of the kept arrays. The modes are:
+            'all': every iteration is kept in memory,
+            'stride': every n-th iteration is kept in memory,
+            'last': the last n iterations are kept in memory,
+            'disk': every iteration is streamed to a .npy file, which is read back as a memory-mapped array, and
+            'off': only the final iteration is kept.
+        The final iteration is always kept, so history[-1] is the result of the algorithm in every mode. The recorder
+        keeps references to the appended arrays, so they should not be modified in place afterwards.
+    """
+
+    MODES = ('all', 'stride', 'last', 'disk', 'off')
+
+    # The .npy header of the disk mode has a fixed size, so that it can be rewritten with the final number of
+    # iterations without moving the data.
+    HEADER_SIZE = 128
+
+    def __init__(self, mode='all', n=10, path=None):
+        """ Create an empty history.
+
+        :param mode: The recording mode, one of 'all', 'stride', 'last', 'disk' and 'off'
+        :param n: The stride of the 'stride' mode or the number of kept iterations of the 'last' mode
+        :param path: The .npy file of the 'disk' mode
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown history mode: {mode}")
+        if mode == 'disk' and path is None:
+            raise ValueError("The 'disk' history mode needs a file path")
+
+        self.mode = mode
+        self.n = n
+        self.path = path
+        self.count = 0          # The number of appended iterations.
+
+        self._entries = deque(maxlen=n) if mode == 'last' else []
+        self._tail = None       # The final iteration, when it is not one of the kept entries.
+
+        self._file = None
+        self._shape = None
+        self._dtype = None
+        self._data = None       # The memory-mapped array of the disk mode.
+
+    def append(self, item):
+        """ Record the array of the next iteration.
+
+        :param item: The array of the iteration
+        """
+        item = np.asarray(item)
+        iteration = self.count
+        self.count += 1
+
+        if self.mode == 'disk':
+            self._write(item)
+        elif self.mode in ('all', 'last') or (self.mode == 'stride' and iteration % self.n == 0):
+            self._entries.append((iteration, item))
+            self._tail = None
+        else:
+            self._tail = (iteration, item)
+
+    @property
+    def iterations(self):
+        """ :return: The iteration number of each kept array. """
+        if self.mode == 'disk':
+            return list(range(self.count))
+        return [iteration for iteration, _ in self._kept()]
+
+    def __len__(self):
+        if self.mode == 'disk':
+            return self.count
+        return len(self._entries) + (self._tail is not None)
+
+    def __getitem__(self, index):
+        if self.mode == 'disk':
+            return self._array()[index]
+        return self._kept()[index][1]
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def close(self):
+        """ Write the final header of the .npy file of the disk mode and close it. The history can still be read. """
+        if self._file is not None:
+            self._write_header()
+            self._file.close()
+            self._file = None
+
+    def _kept(self):
+        """ :return: A list with the (iteration, array) pairs that are kept in memory. """
+        entries = list(self._entries)
+        if self._tail is not None:
+            entries.append(self._tail)
+        return entries
+
+    def _write(self, item):
+        """ Append the array of an iteration to the .npy file of the disk mode.
+
+        :param item: The array of the iteration
+        """
+        if self._file is None:
+            if self._shape is not None:
+                raise ValueError("The history file is closed")
+            self._shape, self._dtype = item.shape, item.dtype
+            self._file = open(self.path, 'wb+')
+            self._write_header()
+        if item.shape != self._shape:
+            raise ValueError(f"Expected an array of shape {self._shape}, got {item.shape}")
+        self._file.write(np.ascontiguousarray(item, dtype=self._dtype).tobytes())
+        self._data = None
+
+    def _write_header(self):
+        """ (Re)write the fixed-size .npy header with the current number of iterations. """
+        header = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (
+            np.lib.format.dtype_to_descr(self._dtype), (self.count,) + self._shape)
+        prefix = np.lib.format.magic(1, 0)
+        padding = self.HEADER_SIZE - len(prefix) - 2 - len(header) - 1
+        if padding < 0:
+            raise ValueError(f"The shape {self._shape} does not fit in the history file header")
+        header = header + ' ' * padding + '\n'
+
+        self._file.seek(0)
+        self._file.write(prefix + struct.pack('<H', len(header)) + header.encode('latin1'))
+        self._file.seek(0, 2)
+
+    def _array(self):
+        """ :return: The memory-mapped array of the disk mode. """
+        if self._data is None:
+            if self._file is not None:
+                self._write_header()
+                self._file.flush()
+            self._data = np.load(self.path, mmap_mode='r') if self.count else np.empty((0,))
+        return self._data
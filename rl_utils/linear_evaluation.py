@@ -0,0 +1,54 @@
+import numpy as np
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
+
+
+def policy_transition_matrix(model, pi):
+    """ Build the state transition matrix P_pi(s, s') = sum_a pi(a|s) P(s'|s, a) and the expected reward
+        r_pi(s) = sum_a pi(a|s) R(s, a) of the given policy. The rows of the terminal states are left empty and their
+        reward is 0.0, so that they are absorbing states with a value of 0.0.
+
+    :param model: The compiled model of the environment
+    :param pi: A (nS, nA) array with the probability of each action in each state
+    :return: A (nS, nS) sparse CSR matrix with the transition probabilities and a (nS,) array with the expected rewards
+    """
+    states = model.rows // model.nA
+    weights = pi.ravel()[model.rows] * model.probs
+    weights[model.terminal[states]] = 0.0
+
+    P_pi = sp.csr_matrix((weights, (states, model.next_states)), shape=(model.nS, model.nS))
+    P_pi.eliminate_zeros()
+    r_pi = np.sum(pi * model.R, axis=1)
+    r_pi[model.terminal] = 0.0
+    return P_pi, r_pi
+
+
+def solve_policy_evaluation(model, pi, gamma, method='direct', V0=None, tol=1e-10):
+    """ Evaluate the given policy exactly, by solving the linear system (I - gamma * P_pi) V = r_pi instead of
+        sweeping until the value function converges.
+
+    :param model: The compiled model of the environment
+    :param pi: A (nS, nA) array with the probability of each action in each state
+    :param gamma: The discount factor
+    :param method: 'direct' for a sparse LU factorization or 'gmres' for the GMRES Krylov solver
+    :param V0: An initial guess of the state value function for the Krylov solver (DEFAULT=zeros)
+    :param tol: The (relative and absolute) residual tolerance of the Krylov solver
+    :return: The state value function of the policy
+    """
+    P_pi, r_pi = policy_transition_matrix(model, pi)
+    A = (sp.identity(model.nS, format='csr') - gamma * P_pi).tocsc()
+
+    if method == 'direct':
+        V = spla.spsolve(A, r_pi)
+    elif method == 'gmres':
+        V, info = spla.gmres(A, r_pi, x0=V0, rtol=tol, atol=tol)
+        if info != 0:
+            raise ValueError(f"GMRES did not converge (info={info})")
+    else:
+        raise ValueError(f"Unknown policy evaluation method: {method}")
+
+    # With gamma = 1 the system is singular when the policy never reaches a terminal state from some states.
+    if not np.all(np.isfinite(V)):
+        raise ValueError("The policy evaluation system is singular. Does the policy reach a terminal state from every "
+                         "state?")
+    return V
@@ -0,0 +1,157 @@
+import numpy as np
+import scipy.stats as st
+from rl_utils.action_selection import EpsilonGreedy
+from rl_envs.grid_vec import GridWorldVecEnv
+
+
+def epsilon_greedy(q, states, epsilon, rng):
+    """ Select the actions of K agents epsilon-greedily at once. Like EpsilonGreedy, each selection uses one uniform
+        number u: if u < epsilon, the action is selected uniformly at random with u / epsilon, otherwise the first
+        greedy action is selected.
+
+    :param q: The (K, nS, nA) state-action value functions of the agents
+    :param states: The (K,) current state of each agent
+    :param epsilon: The probability of selecting an action uniformly at random, a scalar or a (K,) array
+    :param rng: The random number generator, a np.random.Generator
+    :return: The (K,) selected action of each agent
+    """
+    K, _, nA = q.shape
+    u = rng.random(K)
+    greedy = q[np.arange(K), states].argmax(axis=1)
+    explore = np.minimum((u / epsilon * nA).astype(np.int64), nA - 1)
+    return np.where(u < epsilon, explore, greedy)
+
+
+def lockstep_sarsa(env, n_runs, n_episodes, gamma, seed=None):
+    """ Run the SARSA algorithm of windy_gridworld_sarsa.py for K independent agents in lockstep. The agents are the
+        agents of a vector environment, their Q functions and visit counts are (K, nS, nA) arrays, an EpsilonGreedy
+        keeps the (K, nS) counts of the decaying epsilon(s) = 10 / (10 + N(s)) and the epsilon-greedy selection and
+        the TD update, with alpha = (10 / (10 + N(s, a)))^(2/3), are array operations over the agents. Each agent
+        counts its own episodes and stops learning after n_episodes of them.
+
+    :param env: The grid world environment, e.g. WindyGridWorldEnv
+    :param n_runs: The number of independent agents K
+    :param n_episodes: The number of episodes of each agent
+    :param gamma: The discount factor of the SARSA algorithm
+    :param seed: The seed of the random number generator of the action selection
+    :return: The (K, nS, nA) state-action value functions of the agents and an info dictionary with the (K, n_episodes)
+             arrays of the timesteps and the cumulative reward of each episode of each agent
+    """
+    vec_env = GridWorldVecEnv(env, n_runs)
+    n = np.zeros((n_runs, vec_env.nS, vec_env.nA))
+    selector = EpsilonGreedy(vec_env.nA, nS=(n_runs, vec_env.nS), n0=10)
+    q = np.zeros((n_runs, vec_env.nS, vec_env.nA))
+    rng = np.random.default_rng(seed)
+    runs = np.arange(n_runs)
+    recorder = _EpisodeRecorder(n_runs, n_episodes)
+
+    curr_states = vec_env.reset()
+    curr_actions = epsilon_greedy(q, curr_states, selector.epsilon((runs, curr_states)), rng)
+    while recorder.active.any():
+        next_states, rewards, dones, info = vec_env.step(curr_actions)
+        # The next state of a finished agent is the start of its next episode and its next action is the first one.
+        next_actions = epsilon_greedy(q, next_states, selector.epsilon((runs, next_states)), rng)
+        sarsa_targets = rewards + gamma * np.where(dones, 0.0, q[runs, next_states, next_actions])
+
+        k = np.flatnonzero(recorder.active)
+        s, a = curr_states[k], curr_actions[k]
+        alpha = (10 / (n[k, s, a] + 10))**(2/3)
+        q[k, s, a] += alpha * (sarsa_targets[k] - q[k, s, a])
+        n[k, s, a] += 1
+        selector.count((k, s))
+
+        recorder.record(rewards, dones, info['episode_lengths'])
+        curr_states, curr_actions = next_states, next_actions
+
+    return q, recorder.info()
+
+
+def lockstep_qlearning(env, n_runs, n_episodes, gamma, epsilon, seed=None):
+    """ Run the Q-Learning algorithm of cliff_gridworld_qlearning.py for K independent agents in lockstep. The agents
+        are the agents of a vector environment, their Q functions are a (K, nS, nA) array and the epsilon-greedy
+        selection and the TD update are array operations over the agents. Each agent counts its own episodes and stops
+        learning after n_episodes of them.
+
+    :param env: The grid world environment, e.g. CliffGridWorldEnv
+    :param n_runs: The number of independent agents K
+    :param n_episodes: The number of episodes of each agent
+    :param gamma: The discount factor gamma of the Q-Learning algorithm
+    :param epsilon: The epsilon parameter of the epsilon greedy behavior policy b
+    :param seed: The seed of the random number generator of the action selection
+    :return: The (K, nS, nA) state-action value functions of the agents and an info dictionary with the (K, n_episodes)
+             arrays of the timesteps and the cumulative reward of each episode of each agent
+    """
+    vec_env = GridWorldVecEnv(env, n_runs)
+    q = np.zeros((n_runs, vec_env.nS, vec_env.nA))
+    rng = np.random.default_rng(seed)
+    runs = np.arange(n_runs)
+    recorder = _EpisodeRecorder(n_runs, n_episodes)
+
+    curr_states = vec_env.reset()
+    while recorder.active.any():
+        actions = epsilon_greedy(q, curr_states, epsilon, rng)
+        next_states, rewards, dones, info = vec_env.step(actions)
+        # The value of the final state of an episode is zero. The next state of a finished agent is already the start
+        # of its next episode.
+        targets = rewards + gamma * np.where(dones, 0.0, q[runs, next_states].max(axis=1))
+
+        # The learning rate of qlearning() is (10 / (N(s, a) + 10))^(2/3) with counts that are never incremented,
+        # so alpha = 1 and the value is replaced by its target.
+        k = np.flatnonzero(recorder.active)
+        q[k, curr_states[k], actions[k]] = targets[k]
+
+        recorder.record(rewards, dones, info['episode_lengths'])
+        curr_states = next_states
+
+    return q, recorder.info()
+
+
+def run_info(info, run):
+    """ :return: The info dictionary of a single run, in the format of the info of sarsa() and qlearning(), e.g. for
+                 plot_windy_gridworld_results and plot_cliff_gridworld_results.
+    """
+    return {'timesteps': info['timesteps'][run].tolist(), 'rewards': info['rewards'][run].tolist()}
+
+
+def learning_curves(values, confidence=0.95):
+    """ Average the learning curves of K runs and compute the confidence band of the mean of each episode, from the
+        t-distribution with K-1 degrees of freedom.
+
+    :param values: A (K, n_episodes) array with a value of each episode of each run, e.g. info['rewards']
+    :param confidence: The confidence level of the band
+    :return: A dictionary with the (n_episodes,) mean curve ('mean') and the lower and upper curves of the band
+             ('lower' and 'upper')
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_runs = values.shape[0]
+    mean = values.mean(axis=0)
+    if n_runs > 1:
+        half_width = st.t.ppf((1 + confidence) / 2, n_runs - 1) * values.std(axis=0, ddof=1) / np.sqrt(n_runs)
+    else:
+        half_width = np.zeros_like(mean)
+    return {'mean': mean, 'lower': mean - half_width, 'upper': mean + half_width}
+
+
+class _EpisodeRecorder:
+    """ The episode counters and the timesteps and cumulative rewards of the episodes of K agents in lockstep. """
+
+    def __init__(self, n_runs, n_episodes):
+        self.n_episodes = n_episodes
+        self.timesteps = np.zeros((n_runs, n_episodes), dtype=np.int64)
+        self.rewards = np.zeros((n_runs, n_episodes))
+        self.episodes = np.zeros(n_runs, dtype=np.int64)       # The number of finished episodes of each agent.
+        self.returns = np.zeros(n_runs)                         # The cumulative reward of the current episodes.
+        self.active = np.ones(n_runs, dtype=bool)               # Whether each agent has episodes left.
+
+    def record(self, rewards, dones, episode_lengths):
+        """ Add the rewards of a step of the agents and record the episodes of the active agents that finished. """
+        self.returns += rewards
+        finished = np.flatnonzero(dones & self.active)
+        self.timesteps[finished, self.episodes[finished]] = episode_lengths[finished]
+        self.rewards[finished, self.episodes[finished]] = self.returns[finished]
+        self.returns[dones] = 0.0
+        self.episodes[finished] += 1
+        self.active = self.episodes < self.n_episodes
+
+    def info(self):
+        return {'timesteps': self.timesteps, 'rewards': self.rewards}
@@ -0,0 +1,92 @@
+import numpy as np
+
+# The importance sampling estimators of the value of a target policy.
+METHODS = ('ordinary', 'weighted', 'per_decision')
+
+
+def greedy_probabilities(actions, nA, epsilon=0.0):
+    """ Convert deterministic policies to the action probabilities of their epsilon-greedy versions.
+
+    :param actions: The (nS,) action of each state of a policy, or a (K, nS) array with one policy per row
+    :param nA: The number of actions
+    :param epsilon: The probability of selecting an action uniformly at random
+    :return: The (K, nS, nA) action probabilities of the policies
+    """
+    actions = np.atleast_2d(actions)
+    pi = np.full(actions.shape + (nA,), epsilon / nA)
+    np.put_along_axis(pi, actions[..., None], 1.0 - epsilon + epsilon / nA, axis=-1)
+    return pi
+
+
+def episode_statistics(buffer, pi, gamma):
+    """ Compute the importance-weighted returns of the episodes of a buffer for K target policies at once. The
+        cumulative ratios are prefix products over the steps of each episode, so an action that a target policy never
+        selects truncates the ratios of its step and of the following steps to zero.
+
+    :param buffer: An episode buffer with the (encoded) states, the actions, the rewards and the behavior probabilities
+                   of finished episodes, e.g. a batch of an episode log
+    :param pi: The (K, nS, nA) action probabilities of the target policies, or the (nS, nA) ones of a single policy
+    :param gamma: The discount factor
+    :return: A dictionary with the (E,) return of each episode 'G', the (K, E) ratio of each whole episode 'rho' and
+             the (K, E) per-decision importance sampling return of each episode 'pdis'
+    """
+    pi = pi if pi.ndim == 3 else pi[None]
+    starts, ends = buffer.bounds()
+
+    target_probs = pi[:, buffer.states, buffer.actions]                         # (K, n_steps)
+    rho = buffer.importance_ratios(target_probs, prefix=True)                   # rho(0:t) of each step
+
+    # The discount of each reward is gamma to the power of its step in the episode.
+    t = np.arange(buffer.n_steps) - np.repeat(starts, ends - starts)
+    discounted_rewards = gamma ** t * buffer.rewards
+
+    return {'G': buffer.returns(gamma)[starts],
+            'rho': rho[:, ends - 1],
+            'pdis': np.add.reduceat(rho * discounted_rewards, starts, axis=-1)}
+
+
+def evaluate_policies(batches, pi, gamma):
+    """ Estimate the values of K target policies from the logged episodes of a behavior policy, with ordinary,
+        weighted and per-decision importance sampling. The value of a policy is its expected return from the start
+        states of the logged episodes. The batches are reduced to running sums, so the memory does not depend on the
+        number of episodes.
+
+    :param batches: An iterable of episode buffers, e.g. episode_log.batches(batch_size) or [buffer]
+    :param pi: The (K, nS, nA) action probabilities of the target policies, or the (nS, nA) ones of a single policy
+    :param gamma: The discount factor
+    :return: A dictionary with the (K,) estimates of each method of METHODS, the (K,) standard errors of the ordinary
+             and the per-decision estimates ('ordinary_se' and 'per_decision_se'), the (K,) effective sample size of
+             the weighted estimates ('ess'), the (K,) fraction of episodes with a nonzero ratio ('coverage') and the
+             number of episodes ('n_episodes')
+    """
+    K = pi.shape[0] if pi.ndim == 3 else 1
+    n_episodes = 0
+    sums = {name: np.zeros(K) for name in ('rho', 'rho2', 'rho_g', 'rho_g2', 'pdis', 'pdis2', 'covered')}
+    for batch in batches:
+        stats = episode_statistics(batch, pi, gamma)
+        rho_g = stats['rho'] * stats['G']
+        n_episodes += batch.n_episodes
+        sums['rho'] += stats['rho'].sum(axis=-1)
+        sums['rho2'] += np.sum(stats['rho'] ** 2, axis=-1)
+        sums['rho_g'] += rho_g.sum(axis=-1)
+        sums['rho_g2'] += np.sum(rho_g ** 2, axis=-1)
+        sums['pdis'] += stats['pdis'].sum(axis=-1)
+        sums['pdis2'] += np.sum(stats['pdis'] ** 2, axis=-1)
+        sums['covered'] += np.sum(stats['rho'] > 0, axis=-1)
+
+    def standard_error(total, total2):
+        mean = total / n_episodes
+        return np.sqrt(np.maximum(total2 / n_episodes - mean ** 2, 0.0) / n_episodes)
+
+    with np.errstate(invalid='ignore', divide='ignore'):    # A policy without covered episodes has no estimate.
+        weighted = np.where(sums['rho'] > 0, sums['rho_g'] / sums['rho'], np.nan)
+        ess = np.where(sums['rho2'] > 0, sums['rho'] ** 2 / sums['rho2'], 0.0)
+
+    return {'ordinary': sums['rho_g'] / n_episodes,
+            'weighted': weighted,
+            'per_decision': sums['pdis'] / n_episodes,
+            'ordinary_se': standard_error(sums['rho_g'], sums['rho_g2']),
+            'per_decision_se': standard_error(sums['pdis'], sums['pdis2']),
+            'ess': ess,
+            'coverage': sums['covered'] / n_episodes,
+            'n_episodes': n_episodes}
@@ -0,0 +1,114 @@
+import multiprocessing as mp
+import numpy as np
+from rl_utils.episode_buffer import EpisodeBuffer
+
+# The state of a worker process: its environment, the episode function and its extra arguments.
+_worker = dict()
+
+
+def _init_worker(make_env, episode_fn, args, gamma, batch_size, selector, seeds):
+    """ Create the environment of a worker process and seed all of its random number generators from an independent
+        stream.
+
+    :param make_env: A picklable callable that creates the environment
+    :param episode_fn: The episode function of the algorithm
+    :param args: The extra arguments of the episode function
+    :param gamma: The discount factor of the returns
+    :param batch_size: The number of episodes between two updates of the local Q
+    :param selector: The epsilon-greedy selector of args that counts the updates of each state, or None
+    :param seeds: A queue with a SeedSequence for each worker
+    """
+    seed_seq = seeds.get()
+    words = seed_seq.generate_state(3)
+    np.random.seed(words)
+
+    env = make_env()
+    if hasattr(env, '_seed'):
+        env._seed(seed_seq.spawn(1)[0])
+    for i, space in enumerate((env.action_space, env.observation_space)):
+        if hasattr(space, 'seed'):
+            space.seed(int(words[1 + i]))
+
+    _worker.update(env=env, episode_fn=episode_fn, args=args, gamma=gamma, batch_size=batch_size, selector=selector)
+
+
+def _run_episodes(S, N, n_episodes):
+    """ Sample episodes in a worker process, starting from the merged returns of all the workers.
+
+    :param S: The (nS, nA) sums of the returns of all the workers
+    :param N: The (nS, nA) counts of the returns of all the workers
+    :param n_episodes: The number of episodes to sample
+    :return: The sums and the counts of the returns of the sampled episodes
+    """
+    env, episode_fn, args = _worker['env'], _worker['episode_fn'], _worker['args']
+    gamma, batch_size, selector = _worker['gamma'], _worker['batch_size'], _worker['selector']
+
+    dS = np.zeros_like(S)
+    dN = np.zeros_like(N)
+    q = np.divide(S, N, out=np.zeros_like(S), where=N > 0)
+    if selector is not None:
+        selector.n_state[:] = np.sum(N, axis=1)
+    buffer = EpisodeBuffer()
+    for e in range(n_episodes):
+        episode_fn(env, q, buffer, *args)
+
+        if buffer.n_episodes == batch_size or e + 1 == n_episodes:
+            states, actions, returns = buffer.first_visit_returns(gamma)
+            index = np.ravel_multi_index((states, actions), S.shape)
+            dS += np.bincount(index, returns, minlength=S.size).reshape(S.shape)
+            dN += np.bincount(index, minlength=S.size).reshape(S.shape)
+            if selector is not None:
+                selector.count_batch(states)
+            q.flat[index] = (S.flat[index] + dS.flat[index]) / (N.flat[index] + dN.flat[index])
+            buffer.clear()
+    return dS, dN
+
+
+def parallel_mc_control(make_env, episode_fn, args, nS, nA, gamma, n_episodes, n_workers, sync_every, batch_size=1000,
+                        seed=None, selector=None):
+    """ Monte Carlo control with W worker processes. Each worker has its own environment and independent random number
+        streams, and samples sync_every episodes per round with its local estimate of Q. At the end of a round, the
+        coordinator adds the return sums and the counts of all the workers, so that the merged Q is the count-weighted
+        average of their returns, and sends the merged Q (and therefore the updated greedy policy) back to them.
+
+        The episode function episode_fn(env, q, buffer, *args) samples one episode with the (encoded) action values q
+        and records it into the episode buffer. A worker updates its local Q with the first-visit returns of every
+        batch_size episodes. The serial algorithms use the same function, so with one worker the algorithm is the
+        serial one.
+
+    :param make_env: A picklable callable that creates the environment, e.g. its class
+    :param episode_fn: A picklable (module-level) episode function
+    :param args: A tuple with the extra arguments of the episode function, which are copied to every worker
+    :param nS: The number of (encoded) states
+    :param nA: The number of actions
+    :param gamma: The discount factor of the returns
+    :param n_episodes: The total number of episodes to sample
+    :param n_workers: The number of worker processes
+    :param sync_every: The number of episodes that each worker samples between two merges
+    :param batch_size: The number of episodes between two updates of the local Q of a worker
+    :param seed: The seed of the random number streams of the workers (DEFAULT=fresh entropy)
+    :param selector: The EpsilonGreedy of args, whose counts of the updates of each state the episode function uses,
+                     e.g. for an epsilon-greedy policy whose epsilon decays with them, so the workers set them from the
+                     merged counts and keep them up to date (DEFAULT=None, no counts)
+    :return: The merged (nS, nA) state-action value function and the counts of the returns
+    """
+    S = np.zeros((nS, nA))
+    N = np.zeros((nS, nA))
+
+    seeds = mp.Queue()
+    for seed_seq in np.random.SeedSequence(seed).spawn(n_workers):
+        seeds.put(seed_seq)
+
+    initargs = (make_env, episode_fn, args, gamma, batch_size, selector, seeds)
+    with mp.Pool(n_workers, initializer=_init_worker, initargs=initargs) as pool:
+        remaining = n_episodes
+        while remaining > 0:
+            counts = [min(sync_every, remaining - w * sync_every) for w in range(n_workers)]
+            counts = [count for count in counts if count > 0]
+            for dS, dN in pool.starmap(_run_episodes, [(S, N, count) for count in counts], chunksize=1):
+                S += dS
+                N += dN
+            remaining -= sum(counts)
+
+    Q = np.divide(S, N, out=np.zeros_like(S), where=N > 0)
+    return Q, N
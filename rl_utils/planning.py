@@ -0,0 +1,225 @@
+import heapq
+import numpy as np
+from rl_utils.action_selection import EpsilonGreedy
+
+
+class TransitionModel:
+    """ A learned model of the transitions of a tabular environment, stored in flat arrays that are indexed by the
+        (state, action) pair s * nA + a. A deterministic model keeps the last observed outcome of each pair. A
+        stochastic model counts the observed next states of each pair, samples them in proportion to their counts and
+        averages their rewards, and it assumes that an episode ends when it reaches a terminal next state.
+    """
+
+    def __init__(self, nS, nA, stochastic=False):
+        """ Create an empty model.
+
+        :param nS: The number of states
+        :param nA: The number of actions
+        :param stochastic: Whether the model keeps the distribution of the next states instead of the last one
+        """
+        self.nS, self.nA = nS, nA
+        self.stochastic = stochastic
+        self.seen = np.zeros(nS * nA, dtype=bool)         # Whether each pair has been observed.
+        if stochastic:
+            self.counts = np.zeros((nS * nA, nS))
+            self.reward_sums = np.zeros((nS * nA, nS))
+            self.terminal = np.zeros(nS, dtype=bool)
+        else:
+            self.next_states = np.zeros(nS * nA, dtype=np.int64)
+            self.rewards = np.zeros(nS * nA)
+            self.dones = np.zeros(nS * nA, dtype=bool)
+
+    def update(self, state, action, reward, next_state, done):
+        """ Add an observed transition to the model. """
+        sa = state * self.nA + action
+        self.seen[sa] = True
+        if self.stochastic:
+            self.counts[sa, next_state] += 1
+            self.reward_sums[sa, next_state] += reward
+            self.terminal[next_state] = done
+        else:
+            self.next_states[sa] = next_state
+            self.rewards[sa] = reward
+            self.dones[sa] = done
+
+    def sample(self, state, action):
+        """ Sample the outcome of an observed (state, action) pair.
+
+        :return: The next state, the reward and the done flag
+        """
+        sa = state * self.nA + action
+        if not self.stochastic:
+            return self.next_states[sa], self.rewards[sa], self.dones[sa]
+        cumulative_counts = np.cumsum(self.counts[sa])
+        next_state = int(np.searchsorted(cumulative_counts, np.random.random_sample() * cumulative_counts[-1],
+                                         side='right'))
+        return next_state, self.reward(sa, next_state), self.terminal[next_state]
+
+    def reward(self, sa, next_state):
+        """ :return: The (mean) reward of the transitions of the flat pair sa to the next state. """
+        if self.stochastic:
+            return self.reward_sums[sa, next_state] / self.counts[sa, next_state]
+        return self.rewards[sa]
+
+    def predecessors(self, state):
+        """ :return: The flat indices s * nA + a of the observed pairs that lead to the given state. """
+        if self.stochastic:
+            return np.flatnonzero(self.counts[:, state])
+        return np.flatnonzero(self.seen & (self.next_states == state))
+
+
+class ReplayBuffer:
+    """ A fixed-size ring buffer of past transitions, stored in preallocated arrays. When the buffer is full, each new
+        transition overwrites the oldest one.
+    """
+
+    def __init__(self, capacity):
+        """ Create an empty buffer.
+
+        :param capacity: The maximum number of transitions
+        """
+        self.capacity = capacity
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int64)
+        self.rewards = np.zeros(capacity)
+        self.next_states = np.zeros(capacity, dtype=np.int64)
+        self.dones = np.zeros(capacity, dtype=bool)
+        self.n_transitions = 0              # The total number of added transitions.
+
+    def __len__(self):
+        return min(self.n_transitions, self.capacity)
+
+    def add(self, state, action, reward, next_state, done):
+        """ Add a transition, overwriting the oldest one, when the buffer is full. """
+        i = self.n_transitions % self.capacity
+        self.states[i], self.actions[i], self.rewards[i] = state, action, reward
+        self.next_states[i], self.dones[i] = next_state, done
+        self.n_transitions += 1
+
+    def sample(self, n):
+        """ :return: The indices of n transitions, which are sampled uniformly at random with replacement. """
+        return np.random.randint(len(self), size=n)
+
+
+def dyna_q(env, n_episodes, gamma, epsilon, n_planning, alpha=1.0, stochastic_model=False, buffer_size=10000):
+    """ An implementation of the Dyna-Q algorithm. The agent follows an epsilon-greedy behavior policy and every real
+        transition updates Q with the Q-Learning rule, the learned model and the replay buffer. Then, n_planning
+        (state, action) pairs of past transitions are sampled from the replay buffer, so that recent and frequent
+        pairs are planned more often, their outcomes are sampled from the model and Q is updated with the Q-Learning
+        rule on the simulated transitions.
+
+    :param env: The environment in training mode, whose states are integer indices, e.g. CliffGridWorldEnv
+    :param n_episodes: The number of real episodes
+    :param gamma: The discount factor
+    :param epsilon: The epsilon of the epsilon-greedy behavior policy
+    :param n_planning: The number of planning updates per real step
+    :param alpha: The learning rate, e.g. 1 for a deterministic environment
+    :param stochastic_model: Whether the model keeps the distribution of the next states of each pair
+    :param buffer_size: The capacity of the replay buffer
+    :return: The (nS, nA) state-action value function and an info dictionary with the timesteps and the cumulative
+             reward of each episode
+    """
+    nS, nA = env.observation_space.n, env.action_space.n
+    q = np.zeros((nS, nA))
+    model = TransitionModel(nS, nA, stochastic_model)
+    buffer = ReplayBuffer(buffer_size)
+    selector = EpsilonGreedy(nA)
+    info = {'timesteps': [], 'rewards': []}
+
+    for e in range(n_episodes):
+
+        info['timesteps'].append(0)
+        info['rewards'].append(0)
+
+        curr_state = env.reset()
+        done = False
+        while not done:
+            action = selector.select(q[curr_state], epsilon)
+            next_state, reward, done, _ = env.step(action)
+            target = reward if done else reward + gamma * q[next_state].max()
+            q[curr_state, action] += alpha * (target - q[curr_state, action])
+            model.update(curr_state, action, reward, next_state, done)
+            buffer.add(curr_state, action, reward, next_state, done)
+
+            for i in buffer.sample(n_planning):
+                s, a = buffer.states[i], buffer.actions[i]
+                s2, r, d = model.sample(s, a)
+                target = r if d else r + gamma * q[s2].max()
+                q[s, a] += alpha * (target - q[s, a])
+
+            curr_state = next_state
+            info['timesteps'][-1] += 1
+            info['rewards'][-1] += reward
+
+    return q, info
+
+
+def prioritized_sweeping(env, n_episodes, gamma, epsilon, n_planning, alpha=1.0, theta=1e-4, stochastic_model=False):
+    """ An implementation of the prioritized sweeping algorithm. The agent follows an epsilon-greedy behavior policy
+        and every real transition updates the learned model and queues its (state, action) pair with the magnitude of
+        its Q-Learning error as the priority, if it exceeds theta. Then, up to n_planning pairs are popped from the
+        priority queue in order of priority and updated with the Q-Learning rule on outcomes of the model. After the
+        update of a pair, the predecessor pairs of its state, whose errors may have changed, are queued with their new
+        errors. A pair is queued once with its highest priority, since the stale entries of the heap are skipped.
+
+    :param env: The environment in training mode, whose states are integer indices, e.g. CliffGridWorldEnv
+    :param n_episodes: The number of real episodes
+    :param gamma: The discount factor
+    :param epsilon: The epsilon of the epsilon-greedy behavior policy
+    :param n_planning: The maximum number of planning updates per real step
+    :param alpha: The learning rate, e.g. 1 for a deterministic environment
+    :param theta: The smallest priority that is queued
+    :param stochastic_model: Whether the model keeps the distribution of the next states of each pair
+    :return: The (nS, nA) state-action value function and an info dictionary with the timesteps and the cumulative
+             reward of each episode
+    """
+    nS, nA = env.observation_space.n, env.action_space.n
+    q = np.zeros((nS, nA))
+    model = TransitionModel(nS, nA, stochastic_model)
+    selector = EpsilonGreedy(nA)
+    info = {'timesteps': [], 'rewards': []}
+
+    queue = []                      # A max-heap of (-priority, flat pair) entries.
+    priorities = np.zeros(nS * nA)  # The priority of each queued pair, or 0.
+
+    def push(sa, priority):
+        if priority > theta and priority > priorities[sa]:
+            priorities[sa] = priority
+            heapq.heappush(queue, (-priority, sa))
+
+    for e in range(n_episodes):
+
+        info['timesteps'].append(0)
+        info['rewards'].append(0)
+
+        curr_state = env.reset()
+        done = False
+        while not done:
+            action = selector.select(q[curr_state], epsilon)
+            next_state, reward, done, _ = env.step(action)
+            model.update(curr_state, action, reward, next_state, done)
+            target = reward if done else reward + gamma * q[next_state].max()
+            push(curr_state * nA + action, abs(target - q[curr_state, action]))
+
+            n_updates = 0
+            while queue and n_updates < n_planning:
+                priority, sa = heapq.heappop(queue)
+                if -priority != priorities[sa]:     # A stale entry of a pair that was queued again.
+                    continue
+                priorities[sa] = 0.0
+                s, a = divmod(sa, nA)
+                s2, r, d = model.sample(s, a)
+                target = r if d else r + gamma * q[s2].max()
+                q[s, a] += alpha * (target - q[s, a])
+                n_updates += 1
+
+                v = q[s].max()
+                for pred in model.predecessors(s):
+                    ps, pa = divmod(pred, nA)
+                    push(pred, abs(model.reward(pred, s) + gamma * v - q[ps, pa]))
+
+            curr_state = next_state
+            info['timesteps'][-1] += 1
+            info['rewards'][-1] += reward
+
+    return q, info
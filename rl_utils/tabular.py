@@ -0,0 +1,116 @@
+from operator import mul
+import numpy as np
+
+
+class StateEncoder:
+    """ A perfect encoder of tuple observations, whose components are integers (or booleans) in known ranges, to the
+        integers 0, 1, ..., nS-1. The components are the digits of a mixed-radix number, e.g. a Blackjack observation
+        (player_sum, dealer_card, usable_ace) is encoded as ((player_sum - 12) * 10 + dealer_card - 1) * 2 + usable_ace.
+    """
+
+    def __init__(self, lows, sizes, types=None):
+        """ Create an encoder.
+
+        :param lows: The smallest value of each component of the observations
+        :param sizes: The number of values of each component of the observations
+        :param types: The type of each decoded component, e.g. bool for a flag (DEFAULT=int for every component)
+        """
+        self.lows = tuple(lows)
+        self.sizes = tuple(sizes)
+        self.types = tuple(types) if types is not None else (int,) * len(self.sizes)
+        self.nS = int(np.prod(self.sizes))
+
+        # The place value of each component and the index offset of the smallest values, so that an observation is
+        # encoded with a single dot product.
+        self.strides = tuple(int(np.prod(self.sizes[i + 1:])) for i in range(len(self.sizes)))
+        self.offset = sum(map(mul, self.lows, self.strides))
+
+    def encode(self, obs):
+        """ Map an observation to its integer index.
+
+        :param obs: The observation tuple
+        :return: The index of the observation
+        """
+        return int(sum(map(mul, obs, self.strides))) - self.offset
+
+    def decode(self, index):
+        """ Map an integer index back to the observation tuple.
+
+        :param index: The index of the observation
+        :return: The observation tuple
+        """
+        components = []
+        for low, size, cast in zip(reversed(self.lows), reversed(self.sizes), reversed(self.types)):
+            index, digit = divmod(int(index), size)
+            components.append(cast(low + digit))
+        return tuple(reversed(components))
+
+    def states(self):
+        """ :return: A list with the observation tuple of each index. """
+        return [self.decode(index) for index in range(self.nS)]
+
+
+# The encoders of the observation spaces of the card games.
+BLACKJACK_ENCODER = StateEncoder(lows=(12, 1, 0), sizes=(10, 10, 2), types=(int, int, bool))
+EASY21_ENCODER = StateEncoder(lows=(1, 1), sizes=(21, 10))
+
+
+class QTable:
+    """ A state-action value function Q and the (weighted) visit counts N of its (state, action) pairs, stored in
+        contiguous (nS, nA) arrays that are indexed by the encoded states.
+    """
+
+    def __init__(self, encoder, nA):
+        """ Create a table with zero values and counts.
+
+        :param encoder: The encoder of the observations
+        :param nA: The number of actions
+        """
+        self.encoder = encoder
+        self.Q = np.zeros((encoder.nS, nA))
+        self.N = np.zeros((encoder.nS, nA))
+
+    def visited(self):
+        """ :return: A (nS,) boolean array, which is True for the states with at least one update. """
+        return np.any(self.N > 0, axis=1)
+
+    def to_dict(self, array):
+        """ Convert an (nS, ...) array to a dictionary with a row for each visited observation.
+
+        :param array: An array that is indexed by the encoded states, e.g. Q or N
+        :return: A dictionary that maps each visited observation tuple to its row of the array
+        """
+        return {self.encoder.decode(s): array[s].copy() for s in np.flatnonzero(self.visited())}
+
+    def to_dicts(self):
+        """ Convert the table to the dictionaries of the Monte Carlo control algorithms.
+
+        :return: The greedy policy, its state value function and the state-action value function of the visited states
+        """
+        q = self.to_dict(self.Q)
+        policy = {state: np.argmax(q[state]) for state in q}
+        v = {state: np.max(q[state]) for state in q}
+        return policy, v, q
+
+    def save(self, path):
+        """ Save the table to a .npz file.
+
+        :param path: The path of the file
+        """
+        np.savez(path, Q=self.Q, N=self.N, lows=self.encoder.lows, sizes=self.encoder.sizes)
+
+    @classmethod
+    def load(cls, path, encoder):
+        """ Load a table that was saved with save.
+
+        :param path: The path of the file
+        :param encoder: The encoder of the observations, which must have the ranges of the saved table
+        :return: The table
+        """
+        data = np.load(path)
+        if tuple(data['lows']) != encoder.lows or tuple(data['sizes']) != encoder.sizes:
+            raise ValueError("The saved table was built with a different state encoder")
+        table = cls(encoder, data['Q'].shape[1])
+        table.Q[:] = data['Q']
+        table.N[:] = data['N']
+        return table
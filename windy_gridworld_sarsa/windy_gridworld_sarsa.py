@@ -7,6 +7,7 @@ import pprint
 import matplotlib.pyplot as plt
 import matplotlib.animation as an
 from rl_envs.windy_gridworld import WindyGridWorldEnv
+from rl_utils.action_selection import EpsilonGreedy
 
 
 def check_positive_int(value):
@@ -125,20 +126,16 @@ def plot_windy_gridworld_results(env, moves, n_episodes, final_policy, info):
     plt.show(block=True)
 
 
-def eps_greedy_policy(env, n, q, curr_state):
+def eps_greedy_policy(selector, q, curr_state):
     """ The epsilon-greedy policy of the agent. The epsilon parameter is selected to satisfy the GLIE convergence
         criteria.
 
-    :param env: The Windy Gridworld environment
-    :param n: The number of times the Q function of a (state, action) has been updated
+    :param selector: The epsilon-greedy action selector, which counts the updates of each state
     :param q: The state-action value function
     :param curr_state: The current state of the agent
     :return: The action of the agent.
     """
-    epsilon = 10 / (10 + np.sum(n[curr_state]))
-    prob = np.full(env.action_space.n, epsilon / env.action_space.n)
-    prob[np.argmax(q[curr_state])] += 1 - epsilon
-    return np.random.choice(env.action_space.n, p=prob)
+    return selector.select_decaying(q[curr_state], curr_state)
 
 
 def sarsa(env, n_episodes, gamma):
@@ -146,15 +143,18 @@ def sarsa(env, n_episodes, gamma):
         satisfies the GLIE criteria. The TD learning rate alpha satisfies the Robbins-Monro criteria. Given that, the
         algorithm converges to the optimal policy of the agent in the given environment.
 
-    :param env: The Windy Gridworld environment
+    :param env: The Windy Gridworld environment in training mode, whose states are integer indices
     :param n_episodes: The number of episodes to sample for the SARSA algorithm
     :param gamma: The discount factor of the SARSA algorithm
     :return: The optimal policy, its state value function V* and its state-action value function Q* and additional info
              regarding the cumulative reward and timesteps per episode.
     """
-    n = dict()
-    q = dict()
+    nS, nA = env.observation_space.n, env.action_space.n
+    n = np.zeros((nS, nA))
+    q = np.zeros((nS, nA))
+    visited = np.zeros(nS, dtype=bool)
     info = {'timesteps': [], 'rewards': [], }
+    selector = EpsilonGreedy(nA, nS=nS, n0=10)
 
     for e in range(n_episodes):
 
@@ -162,22 +162,19 @@ def sarsa(env, n_episodes, gamma):
         info['rewards'].append(0)
 
         curr_state = env.reset()
-        if curr_state not in q:
-            q[curr_state] = np.zeros(env.action_space.n)
-            n[curr_state] = np.zeros(env.action_space.n)
-        curr_action = eps_greedy_policy(env, n, q, curr_state)
+        visited[curr_state] = True
+        curr_action = eps_greedy_policy(selector, q, curr_state)
         done = False
         while not done:
 
             next_state, reward, done, _ = env.step(curr_action)
-            if next_state not in q:
-                q[next_state] = np.zeros(env.action_space.n)
-                n[next_state] = np.zeros(env.action_space.n)
-            next_action = eps_greedy_policy(env, n, q, next_state)
-            sarsa_target = reward + gamma * q[next_state][next_action]
-            alpha = (10 / (n[curr_state][curr_action] + 10))**(2/3)
-            q[curr_state][curr_action] += alpha * (sarsa_target - q[curr_state][curr_action])
-            n[curr_state][curr_action] += 1
+            visited[next_state] = True
+            next_action = eps_greedy_policy(selector, q, next_state)
+            sarsa_target = reward + gamma * q[next_state, next_action]
+            alpha = (10 / (n[curr_state, curr_action] + 10))**(2/3)
+            q[curr_state, curr_action] += alpha * (sarsa_target - q[curr_state, curr_action])
+            n[curr_state, curr_action] += 1
+            selector.count(curr_state)
 
             curr_state = next_state
             curr_action = next_action
@@ -185,8 +182,11 @@ def sarsa(env, n_episodes, gamma):
             info['timesteps'][-1] += 1
             info['rewards'][-1] += reward
 
-    v = {state: np.max(q[state]) for state in q}
-    policy = {state: np.argmax(q[state]) for state in q}
+    # The results are keyed by the (y, x) positions of the visited states.
+    states = np.flatnonzero(visited)
+    v = {env.states[s]: np.max(q[s]) for s in states}
+    policy = {env.states[s]: np.argmax(q[s]) for s in states}
+    q = {env.states[s]: q[s] for s in states}
 
     return policy, v, q, info
 
@@ -199,7 +199,7 @@ def main():
     the optimal trajectory, according to the optimal policy.
     """
     moves, n_episodes, gamma, plot = parse_args()
-    env = WindyGridWorldEnv(moves)
+    env = WindyGridWorldEnv(moves, training=True)
     final_policy, v, q, info = sarsa(env, n_episodes, gamma)
 
     pp = pprint.PrettyPrinter(indent=2)
@@ -213,7 +213,7 @@ def main():
     pp.pprint(q)
 
     if plot:
-        plot_windy_gridworld_results(env, moves, n_episodes, final_policy, info)
+        plot_windy_gridworld_results(WindyGridWorldEnv(moves), moves, n_episodes, final_policy, info)
 
 
 if __name__ == '__main__':